@@ -0,0 +1,217 @@
+import asyncio
+import os
+import weakref
+from contextlib import asynccontextmanager
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+from lib.db import DEFAULT_DATABASE_URL, engine_options, install_pragmas
+from lib.models import User, Series, Season, Episode, Review, Status, WatchStatus
+from lib import instrument
+
+# Async counterparts of lib/db.py and the model classmethods, for serving the
+# tracker from an asyncio service: SQLAlchemy's AsyncSession over aiosqlite.
+# Flushes run the same mapper events as the sync path, so the series
+# aggregates, caches and search index stay current either way.
+
+
+def async_url(url):
+    # sqlite:///tv_series.db -> sqlite+aiosqlite:///tv_series.db
+    if url.startswith("sqlite:"):
+        return "sqlite+aiosqlite:" + url[len("sqlite:"):]
+    return url
+
+
+def make_async_engine(url=None, echo=None, pragmas=None):
+    url = async_url(url or os.environ.get("TV_TRACKER_DATABASE_URL", DEFAULT_DATABASE_URL))
+    engine = create_async_engine(url, **engine_options(url, echo))
+    install_pragmas(engine.sync_engine, pragmas)
+    instrument.install(engine.sync_engine)
+    return engine
+
+
+_engine = None
+
+# Same settings as lib.db.Session, bound by get_async_engine().
+AsyncSession = async_sessionmaker(expire_on_commit=False)
+
+
+def get_async_engine():
+    global _engine
+    if _engine is None:
+        _engine = make_async_engine()
+        AsyncSession.configure(bind=_engine)
+    return _engine
+
+
+@asynccontextmanager
+async def async_session_scope():
+    # The async session_scope(): commit on success, roll back on error, close.
+    get_async_engine()
+    session = AsyncSession()
+    try:
+        yield session
+        await session.commit()
+    except Exception:
+        await session.rollback()
+        raise
+    finally:
+        await session.close()
+
+
+# SQLite runs one writer at a time. Left alone, concurrent writers spin in
+# SQLite's busy handler (sleeping up to 100ms per retry) while holding pooled
+# connections; queueing them on an asyncio lock keeps the single writer busy
+# and leaves reads fully concurrent. One lock per event loop.
+_write_locks = weakref.WeakKeyDictionary()
+
+
+def write_lock():
+    loop = asyncio.get_running_loop()
+    if loop not in _write_locks:
+        _write_locks[loop] = asyncio.Lock()
+    return _write_locks[loop]
+
+
+@asynccontextmanager
+async def writing(session):
+    # Ends the session's read transaction before queueing, so a waiting
+    # writer holds no pooled connection and writes from a fresh snapshot.
+    await session.commit()
+    async with write_lock():
+        yield
+
+
+class Repository:
+    # get_by_id/delete for one model; subclasses add create() with the same
+    # arguments as the model's classmethod.
+    model = None
+
+    @classmethod
+    async def _add(cls, session, instance):
+        async with writing(session):
+            session.add(instance)
+            await session.commit()
+        return instance
+
+    @classmethod
+    async def get_by_id(cls, session, object_id):
+        return await session.get(cls.model, object_id)
+
+    @classmethod
+    async def delete(cls, session, object_id):
+        async with writing(session):
+            instance = await cls.get_by_id(session, object_id)
+            if instance is None:
+                return False
+            await session.delete(instance)
+            await session.commit()
+        return True
+
+
+class UserRepository(Repository):
+    model = User
+
+    @classmethod
+    async def create(cls, session, username):
+        return await cls._add(session, User(username=username))
+
+    @classmethod
+    async def get_by_username(cls, session, username):
+        return await session.scalar(select(User).where(User.username == username))
+
+    @classmethod
+    async def delete(cls, session, user_id):
+        return await cls.delete_many(session, [user_id]) == 1
+
+    @classmethod
+    async def delete_many(cls, session, user_ids):
+        # User.delete_many also recounts the aggregates the cascaded reviews
+        # and statuses fed.
+        async with writing(session):
+            return await session.run_sync(lambda sync_session: User.delete_many(sync_session, user_ids))
+
+
+class SeriesRepository(Repository):
+    model = Series
+
+    @classmethod
+    async def create(cls, session, title, genre, description, user_id):
+        return await cls._add(session, Series(title=title, genre=genre, description=description, user_id=user_id))
+
+    @classmethod
+    async def list_page(cls, session, **kwargs):
+        return await session.run_sync(lambda sync_session: Series.list_page(sync_session, **kwargs))
+
+    @classmethod
+    async def load_detail(cls, session, series_id, reviews=True):
+        return await session.run_sync(lambda sync_session: Series.load_detail(sync_session, series_id, reviews))
+
+    @classmethod
+    async def delete(cls, session, series_id):
+        return await cls.delete_many(session, [series_id]) == 1
+
+    @classmethod
+    async def delete_many(cls, session, series_ids):
+        # Series.delete_many lets SQLite cascade to the children and tells the
+        # caches and search index which series went.
+        async with writing(session):
+            return await session.run_sync(lambda sync_session: Series.delete_many(sync_session, series_ids))
+
+
+class SeasonRepository(Repository):
+    model = Season
+
+    @classmethod
+    async def create(cls, session, season_number, series_id):
+        return await cls._add(session, Season(season_number=season_number, series_id=series_id))
+
+
+class EpisodeRepository(Repository):
+    model = Episode
+
+    @classmethod
+    async def create(cls, session, title, episode_number, duration_mins, season_id):
+        return await cls._add(session, Episode(title=title, episode_number=episode_number,
+                                               duration_mins=duration_mins, season_id=season_id))
+
+
+class ReviewRepository(Repository):
+    model = Review
+
+    @classmethod
+    async def create(cls, session, content, rating, user_id, series_id):
+        return await cls._add(session, Review(content=content, rating=rating, user_id=user_id, series_id=series_id))
+
+
+class StatusRepository(Repository):
+    model = Status
+
+    @classmethod
+    async def create(cls, session, watch_status, user_id, series_id):
+        return await cls._add(session, Status(watch_status=watch_status, user_id=user_id, series_id=series_id))
+
+    # Watchlist operations. The Core upserts keep their aggregate bookkeeping
+    # by running the model classmethods on the session's sync side.
+
+    @classmethod
+    async def watchlist(cls, session, user_id, watch_status=None):
+        # (series_id, title, watch_status) rows in the order they were added.
+        rows = await session.execute(Status.watchlist_query(user_id, watch_status))
+        return rows.all()
+
+    @classmethod
+    async def add_to_watchlist(cls, session, user_id, series_id, watch_status=WatchStatus.PLAN_TO_WATCH):
+        async with writing(session):
+            return await session.run_sync(
+                lambda sync_session: Status.add_to_watchlist(sync_session, user_id, series_id, watch_status))
+
+    @classmethod
+    async def upsert(cls, session, user_id, series_id, watch_status):
+        async with writing(session):
+            await session.run_sync(lambda sync_session: Status.upsert(sync_session, user_id, series_id, watch_status))
+
+    @classmethod
+    async def remove_from_watchlist(cls, session, user_id, series_id):
+        async with writing(session):
+            return await session.run_sync(
+                lambda sync_session: Status.remove_from_watchlist(sync_session, user_id, series_id))
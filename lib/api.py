@@ -0,0 +1,416 @@
+import sys
+import os
+import argparse
+import gzip
+import hashlib
+import json
+import re
+import time
+from email.utils import formatdate, parsedate_to_datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit, parse_qsl, urlencode
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from sqlalchemy import select
+from lib.db import get_engine, session_scope
+from lib.models import User, Series, Review, Status, SeriesStats, WatchStatus
+from lib import cache, instrument, search
+
+# A small JSON API over the same models as the CLI, on the standard library's
+# threading HTTP server. Every request gets its own session from the pooled
+# engine (see TV_TRACKER_POOL_* in lib/db.py).
+#
+#   GET    /series?after=&before=&limit=&genre=&title=   one page of the catalog
+#   GET    /series/search?q=&limit=                       full-text search
+#   GET    /series/<id>                                   seasons, episodes and rating summary
+#   GET    /series/<id>/reviews?after=&limit=
+#   POST   /series/<id>/reviews                           {"user_id", "rating", "content"}
+#   GET    /users/<id>/watchlist?watch_status=
+#   POST   /users/<id>/watchlist                          {"series_id", "watch_status"?}
+#   PUT    /users/<id>/watchlist/<series_id>              {"watch_status"}
+#   DELETE /users/<id>/watchlist/<series_id>
+#   GET    /users/<id>/dashboard?limit=                   watch-time totals, series with most time left
+#
+# Catalog (GET /series...) responses are rendered once and kept in
+# cache.response_cache with an ETag and Last-Modified, so revalidations are
+# answered with 304 without touching the database. Bodies over
+# GZIP_MIN_BYTES are gzipped for clients that accept it.
+MAX_LIMIT = 100
+GZIP_MIN_BYTES = 1024
+
+
+class ApiError(Exception):
+
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+ROUTES = []
+
+
+def route(method, pattern, catalog=False):
+    def register(func):
+        ROUTES.append((method, re.compile(f"^{pattern}$"), func, catalog))
+        return func
+    return register
+
+
+def int_param(values, name, default=None, minimum=None, maximum=None):
+    value = values.get(name)
+    if value in (None, ""):
+        return default
+    try:
+        value = int(value)
+    except (TypeError, ValueError):
+        raise ApiError(400, f"'{name}' must be an integer.")
+    if minimum is not None and value < minimum:
+        raise ApiError(400, f"'{name}' must be at least {minimum}.")
+    if maximum is not None:
+        value = min(value, maximum)
+    return value
+
+
+def watch_status_param(values, default=None):
+    # Accepts a label in any case ("plan to watch") or its integer code.
+    try:
+        return WatchStatus.parse(values.get("watch_status", default))
+    except ValueError:
+        labels = ", ".join(status.label for status in WatchStatus)
+        raise ApiError(400, f"'watch_status' must be one of: {labels}.")
+
+
+def require_series(session, series_id):
+    series = cache.get_series(session, series_id)
+    if series is None:
+        raise ApiError(404, f"Series {series_id} not found.")
+    return series
+
+
+def require_user(session, user_id):
+    if session.get(User, user_id) is None:
+        raise ApiError(404, f"User {user_id} not found.")
+
+
+@route("GET", r"/series", catalog=True)
+def list_series(session, query, body):
+    limit = int_param(query, "limit", 20, minimum=1, maximum=MAX_LIMIT)
+    rows = cache.list_page(
+        session, after_id=int_param(query, "after"), before_id=int_param(query, "before"),
+        limit=limit, genre=query.get("genre"), title=query.get("title"),
+    )
+    items = [{"id": series_id, "title": title, "genre": genre} for series_id, title, genre in rows]
+    return 200, {
+        "items": items,
+        "next_after": items[-1]["id"] if len(items) == limit else None,
+        "prev_before": items[0]["id"] if items else None,
+    }
+
+
+@route("GET", r"/series/search", catalog=True)
+def search_series(session, query, body):
+    rows = search.search(session, query.get("q", ""), limit=int_param(query, "limit", 20, minimum=1, maximum=MAX_LIMIT))
+    return 200, {"items": [{"id": series_id, "title": title, "genre": genre} for series_id, title, genre in rows]}
+
+
+@route("GET", r"/series/(?P<series_id>\d+)", catalog=True)
+def series_detail(session, query, body, series_id):
+    # Reviews are paged by /series/<id>/reviews.
+    series = Series.load_detail(session, series_id, reviews=False)
+    if series is None:
+        raise ApiError(404, f"Series {series_id} not found.")
+    stats = SeriesStats.for_series(session, series_id)
+    return 200, {
+        "id": series.id, "title": series.title, "genre": series.genre, "description": series.description,
+        "rating": {
+            "average": stats.average if stats else None,
+            "review_count": stats.review_count if stats else 0,
+        },
+        "seasons": [
+            {
+                "id": season.id, "season_number": season.season_number,
+                "episodes": [
+                    {"id": episode.id, "episode_number": episode.episode_number, "title": episode.title,
+                     "duration_mins": episode.duration_mins}
+                    for episode in season.episodes
+                ],
+            }
+            for season in sorted(series.seasons, key=lambda season: season.season_number)
+        ],
+    }
+
+
+@route("GET", r"/series/(?P<series_id>\d+)/reviews", catalog=True)
+def list_reviews(session, query, body, series_id):
+    require_series(session, series_id)
+    limit = int_param(query, "limit", 20, minimum=1, maximum=MAX_LIMIT)
+    reviews = (
+        select(Review.id, User.username, Review.rating, Review.content)
+        .outerjoin(User, User.id == Review.user_id)
+        .where(Review.series_id == series_id, Review.id > int_param(query, "after", 0))
+        .order_by(Review.id)
+        .limit(limit)
+    )
+    items = [{"id": review_id, "username": username, "rating": rating, "content": content}
+             for review_id, username, rating, content in session.execute(reviews)]
+    return 200, {"items": items, "next_after": items[-1]["id"] if len(items) == limit else None}
+
+
+@route("POST", r"/series/(?P<series_id>\d+)/reviews")
+def add_review(session, query, body, series_id):
+    require_series(session, series_id)
+    user_id = int_param(body, "user_id", minimum=1)
+    if user_id is None:
+        raise ApiError(400, "'user_id' is required.")
+    require_user(session, user_id)
+    rating = int_param(body, "rating")
+    if rating is None or not 1 <= rating <= 10:
+        raise ApiError(400, "'rating' must be an integer from 1 to 10.")
+    review = Review.create(session, body.get("content") or "", rating, user_id, series_id)
+    return 201, {"id": review.id, "user_id": user_id, "series_id": series_id, "rating": rating,
+                 "content": review.content}
+
+
+def watchlist_items(session, user_id, watch_status=None):
+    query = (
+        select(Series.id, Series.title, Series.genre, Status.watch_status)
+        .join(Status, Status.series_id == Series.id)
+        .where(Status.user_id == user_id)
+        .order_by(Status.id)
+    )
+    if watch_status is not None:
+        query = query.where(Status.watch_status == watch_status)
+    return [{"series_id": series_id, "title": title, "genre": genre, "watch_status": watch_status.label}
+            for series_id, title, genre, watch_status in session.execute(query)]
+
+
+@route("GET", r"/users/(?P<user_id>\d+)/watchlist")
+def get_watchlist(session, query, body, user_id):
+    require_user(session, user_id)
+    watch_status = watch_status_param(query) if query.get("watch_status") else None
+    return 200, {"items": watchlist_items(session, user_id, watch_status)}
+
+
+@route("POST", r"/users/(?P<user_id>\d+)/watchlist")
+def add_to_watchlist(session, query, body, user_id):
+    require_user(session, user_id)
+    series_id = int_param(body, "series_id", minimum=1)
+    if series_id is None:
+        raise ApiError(400, "'series_id' is required.")
+    require_series(session, series_id)
+    watch_status = watch_status_param(body, WatchStatus.PLAN_TO_WATCH)
+    if not Status.add_to_watchlist(session, user_id, series_id, watch_status):
+        raise ApiError(409, f"Series {series_id} is already in the watchlist.")
+    return 201, {"series_id": series_id, "watch_status": watch_status.label}
+
+
+@route("PUT", r"/users/(?P<user_id>\d+)/watchlist/(?P<series_id>\d+)")
+def update_status(session, query, body, user_id, series_id):
+    require_user(session, user_id)
+    require_series(session, series_id)
+    watch_status = watch_status_param(body)
+    Status.upsert(session, user_id, series_id, watch_status)
+    return 200, {"series_id": series_id, "watch_status": watch_status.label}
+
+
+@route("DELETE", r"/users/(?P<user_id>\d+)/watchlist/(?P<series_id>\d+)")
+def remove_from_watchlist(session, query, body, user_id, series_id):
+    if not Status.remove_from_watchlist(session, user_id, series_id):
+        raise ApiError(404, f"Series {series_id} is not in the watchlist.")
+    return 204, None
+
+
+@route("GET", r"/users/(?P<user_id>\d+)/dashboard")
+def get_dashboard(session, query, body, user_id):
+    require_user(session, user_id)
+    limit = int_param(query, "limit", 10, minimum=1, maximum=MAX_LIMIT)
+    series = [
+        {"series_id": series_id, "title": title, "watch_status": watch_status.label, "episodes": episodes,
+         "total_mins": total_mins, "watched_episodes": watched, "watched_mins": watched_mins,
+         "remaining_mins": remaining_mins}
+        for series_id, title, watch_status, episodes, total_mins, watched, watched_mins, remaining_mins
+        in User.watch_time(session, user_id, limit=limit)
+    ]
+    return 200, {**User.dashboard(session, user_id)._asdict(), "series": series}
+
+
+def resolve(method, path):
+    allowed = []
+    for route_method, pattern, handler, catalog in ROUTES:
+        match = pattern.match(path)
+        if match:
+            if route_method == method:
+                return handler, catalog, {name: int(value) for name, value in match.groupdict().items()}
+            allowed.append(route_method)
+    if allowed:
+        raise ApiError(405, f"Method not allowed; use {', '.join(allowed)}.")
+    raise ApiError(404, "Not found.")
+
+
+def render(payload):
+    return json.dumps(payload, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def catalog_response(session, handler, query, params, key):
+    # (etag, last_modified, body, gzipped body or None), rendered once per key
+    # until the catalog changes.
+    def load():
+        status, payload = handler(session, query, None, **params)
+        body = render(payload)
+        etag = '"' + hashlib.blake2b(body, digest_size=12).hexdigest() + '"'
+        compressed = gzip.compress(body, 5) if len(body) >= GZIP_MIN_BYTES else None
+        return etag, int(time.time()), body, compressed
+    return cache.response_cache.get_or_load(key, load)
+
+
+def not_modified(headers, etag, last_modified):
+    # If-None-Match wins over If-Modified-Since when both are sent.
+    if_none_match = headers.get("If-None-Match")
+    if if_none_match is not None:
+        return if_none_match.strip() == "*" or etag in [tag.strip() for tag in if_none_match.split(",")]
+    if_modified_since = headers.get("If-Modified-Since")
+    if if_modified_since:
+        try:
+            return last_modified <= parsedate_to_datetime(if_modified_since).timestamp()
+        except (TypeError, ValueError):
+            return False
+    return False
+
+
+class ApiHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive, so load tests reuse connections
+    server_version = "TVTracker/1.0"
+    quiet = False
+
+    def do_GET(self):
+        self.dispatch("GET")
+
+    def do_POST(self):
+        self.dispatch("POST")
+
+    def do_PUT(self):
+        self.dispatch("PUT")
+
+    def do_DELETE(self):
+        self.dispatch("DELETE")
+
+    def log_message(self, format, *args):
+        if not self.quiet:
+            super().log_message(format, *args)
+
+    def accepts_gzip(self):
+        return "gzip" in self.headers.get("Accept-Encoding", "")
+
+    def send(self, status, body=b"", headers=None, compressed=None):
+        self.send_response(status)
+        headers = dict(headers or {})
+        if body:
+            headers.setdefault("Content-Type", "application/json; charset=utf-8")
+            if compressed is None and len(body) >= GZIP_MIN_BYTES and self.accepts_gzip():
+                compressed = gzip.compress(body, 5)
+            if compressed is not None and self.accepts_gzip():
+                body = compressed
+                headers["Content-Encoding"] = "gzip"
+            headers["Vary"] = "Accept-Encoding"
+        headers["Content-Length"] = str(len(body))
+        if self.close_connection:
+            headers["Connection"] = "close"
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.end_headers()
+        if body:
+            self.wfile.write(body)
+
+    def read_body(self):
+        # Read for every request, before routing, so a body nobody wanted is
+        # not taken for the next request on a keep-alive connection. Without
+        # a usable length it cannot be skipped, so the connection is closed.
+        try:
+            length = int(self.headers.get("Content-Length") or 0)
+        except ValueError:
+            length = -1
+        if length < 0:
+            self.close_connection = True
+            raise ApiError(400, "Invalid Content-Length header.")
+        return self.rfile.read(length) if length else b""
+
+    @staticmethod
+    def parse_body(raw):
+        if not raw:
+            return {}
+        try:
+            body = json.loads(raw)
+        except ValueError:
+            raise ApiError(400, "Request body must be JSON.")
+        if not isinstance(body, dict):
+            raise ApiError(400, "Request body must be a JSON object.")
+        return body
+
+    def dispatch(self, method):
+        url = urlsplit(self.path)
+        query = dict(parse_qsl(url.query))
+        try:
+            raw = self.read_body()
+            handler, catalog, params = resolve(method, url.path.rstrip("/") or "/")
+            body = self.parse_body(raw) if method in ("POST", "PUT") else {}
+            with instrument.action(f"{method} {handler.__name__}"), session_scope() as session:
+                if catalog:
+                    key = url.path + "?" + urlencode(sorted(query.items()))
+                    etag, last_modified, payload, compressed = catalog_response(session, handler, query, params, key)
+                else:
+                    status, result = handler(session, query, body, **params)
+        except ApiError as e:
+            self.send(e.status, render({"error": str(e)}))
+            return
+        except Exception as e:
+            self.log_error("%s %s failed: %r", method, self.path, e)
+            self.send(500, render({"error": "Internal server error."}))
+            return
+
+        if not catalog:
+            self.send(status, b"" if result is None else render(result))
+            return
+        validators = {
+            "ETag": etag,
+            "Last-Modified": formatdate(last_modified, usegmt=True),
+            "Cache-Control": "no-cache",
+        }
+        if not_modified(self.headers, etag, last_modified):
+            self.send(304, headers=validators)
+        else:
+            self.send(200, payload, headers=validators, compressed=compressed)
+
+
+class ApiServer(ThreadingHTTPServer):
+    daemon_threads = True
+    # The default listen backlog of 5 resets connections under a burst.
+    request_queue_size = 128
+
+
+def make_server(host="127.0.0.1", port=8000, quiet=False):
+    get_engine()
+    handler = type("Handler", (ApiHandler,), {"quiet": quiet})
+    return ApiServer((host, port), handler)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="TV Series Tracker HTTP API")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000, help="0 picks a free port")
+    parser.add_argument("--quiet", action="store_true", help="do not log each request")
+    args = parser.parse_args(argv)
+
+    server = make_server(args.host, args.port, quiet=args.quiet)
+    host, port = server.server_address[:2]
+    print(f"Serving on http://{host}:{port}", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,12 +1,6 @@
-from sqlalchemy import create_engine
-from sqlalchemy.orm import declarative_base, sessionmaker
+# Kept for older imports: the engine and sessions now come from lib.db, and
+# the declarative base from lib.models.
+from lib.db import Session, get_engine, session_scope
+from lib.models import Base
 
-# Set up engine
-engine = create_engine('sqlite:///tv_series.db', echo=True)
-
-# Declarative base class
-Base = declarative_base()
-
-#Configured session class
-Session = sessionmaker(bind=engine)
-session = Session()
+__all__ = ["Base", "Session", "get_engine", "session_scope"]
@@ -0,0 +1,1078 @@
+import sys
+import os
+import argparse
+import json
+import random
+import subprocess
+import tempfile
+import time
+import tracemalloc
+from contextlib import contextmanager, redirect_stdout
+from unittest import mock
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from sqlalchemy import select, func, text
+from lib.db import make_engine
+from lib.models import Base, User, Series, Season, Episode, Review, Status
+from lib import migrate
+from lib.seed import seed_bulk
+
+BENCHMARKS = {}
+
+
+def benchmark(name):
+    def register(func):
+        BENCHMARKS[name] = func
+        return func
+    return register
+
+
+def timed(func, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    return (time.perf_counter() - start) / repeat * 1000
+
+
+def build_synthetic_db(engine, scale, seed=42):
+    counts = {
+        "users": int(20_000 * scale),
+        "series": int(100_000 * scale),
+        "seasons_per_series": 3,
+        "episodes_per_season": 5,
+        "reviews": int(500_000 * scale),
+        "statuses": int(1_000_000 * scale),
+    }
+    seed_bulk(engine, seed=seed, batch_size=50_000, **counts)
+    return counts["users"], counts["series"], counts["series"] * counts["seasons_per_series"]
+
+
+@benchmark("indexes")
+def bench_indexes(args):
+    engine = make_engine(f"sqlite:///{args.db}")
+    Base.metadata.create_all(engine)
+    # Start from the pre-index schema: drop everything migrate.upgrade adds.
+    with engine.begin() as conn:
+        for table in Base.metadata.sorted_tables:
+            for index in table.indexes:
+                index.drop(conn, checkfirst=True)
+
+    start = time.perf_counter()
+    n_users, n_series, n_seasons = build_synthetic_db(engine, args.scale)
+    print(f"Generated synthetic database in {time.perf_counter() - start:.1f}s")
+
+    rng = random.Random(7)
+    lookups = {
+        "status by (user, series)": lambda: select(Status).where(
+            Status.user_id == rng.randint(1, n_users), Status.series_id == rng.randint(1, n_series)),
+        "series by user": lambda: select(Series.id).where(Series.user_id == rng.randint(1, n_users)),
+        "user by username": lambda: select(User).where(User.username == f"user{rng.randint(1, n_users)}"),
+        "reviews by series": lambda: select(Review).where(Review.series_id == rng.randint(1, n_series)),
+        "seasons by series": lambda: select(Season).where(Season.series_id == rng.randint(1, n_series)),
+        "episodes by season": lambda: select(Episode).where(Episode.season_id == rng.randint(1, n_seasons)),
+    }
+
+    def run_all(conn):
+        return {name: timed(lambda: conn.execute(build()).all(), args.repeat) for name, build in lookups.items()}
+
+    with engine.connect() as conn:
+        before = run_all(conn)
+    start = time.perf_counter()
+    migrate.upgrade(engine)
+    print(f"Migration took {time.perf_counter() - start:.1f}s")
+    with engine.connect() as conn:
+        conn.execute(text("ANALYZE"))
+        after = run_all(conn)
+
+    print(f"{'lookup':<28}{'before ms':>12}{'after ms':>12}")
+    for name in lookups:
+        print(f"{name:<28}{before[name]:>12.3f}{after[name]:>12.3f}")
+
+
+@benchmark("leaderboards")
+def bench_leaderboards(args):
+    from sqlalchemy.orm import Session
+    from lib import leaderboards
+
+    engine = make_engine(f"sqlite:///{args.db}")
+    Base.metadata.create_all(engine)
+    build_synthetic_db(engine, args.scale)
+
+    boards = {
+        "top rated": lambda session: leaderboards.top_rated(session, min_reviews=3),
+        "most watchlisted": leaderboards.most_watchlisted,
+        "most completed": leaderboards.most_completed,
+        "trending: drama": lambda session: leaderboards.trending_by_genre(session, "drama"),
+    }
+    print(f"{'leaderboard':<20}{'cold ms':>12}{'cached ms':>12}")
+    with Session(engine) as session:
+        for name, board in boards.items():
+            leaderboards.invalidate()
+            cold = timed(lambda: board(session), 1)
+            warm = timed(lambda: board(session), args.repeat)
+            print(f"{name:<20}{cold:>12.3f}{warm:>12.3f}")
+
+
+@benchmark("search")
+def bench_search(args):
+    from sqlalchemy.orm import Session
+    from lib import search
+
+    engine = make_engine(f"sqlite:///{args.db}")
+    Base.metadata.create_all(engine)
+    search.install(engine)
+    build_synthetic_db(engine, args.scale)
+
+    queries = ["vision", "synerg", "multi lay", "sci", "robust paradigm"]
+    with Session(engine) as session:
+        start = time.perf_counter()
+        search.fallback_index(session)
+        print(f"Built the fallback inverted index in {time.perf_counter() - start:.1f}s")
+        # LIKE has no notion of relevance, so it is timed as the full scan a
+        # ranked answer would need.
+        print(f"{'query':<20}{'fts5 ms':>12}{'inverted ms':>14}{'LIKE ms':>12}{'hits':>8}")
+        for query in queries:
+            fts = timed(lambda: search.search(session, query), args.repeat)
+            inverted = timed(lambda: search.fallback_index(session).search(query), args.repeat)
+            like = timed(lambda: search.search_like(session, query), max(1, args.repeat // 10))
+            hits = len(search.search(session, query, limit=1_000))
+            print(f"{query:<20}{fts:>12.3f}{inverted:>14.3f}{like:>12.3f}{hits:>8}")
+
+
+def table_bytes(conn, *names):
+    # On-disk size of tables and their indexes, via the dbstat virtual table.
+    try:
+        placeholders = ", ".join(f"'{name}'" for name in names)
+        return conn.execute(text(
+            f"SELECT SUM(pgsize) FROM dbstat WHERE name IN ({placeholders}) "
+            f"OR name IN (SELECT name FROM sqlite_master WHERE tbl_name IN ({placeholders}) AND type = 'index')"
+        )).scalar()
+    except Exception:
+        return None
+
+
+@benchmark("progress")
+def bench_progress(args):
+    from sqlalchemy import MetaData, Table, Column, Integer, func
+    from sqlalchemy.orm import Session
+    from lib.models import EpisodeProgress, set_bits
+
+    engine = make_engine(f"sqlite:///{args.db}")
+    Base.metadata.create_all(engine)
+    # The alternative being measured: one row per watched (user, episode).
+    naive = Table(
+        "watched_episodes", MetaData(),
+        Column("user_id", Integer, primary_key=True),
+        Column("episode_id", Integer, primary_key=True),
+    )
+    naive.create(engine)
+
+    n_users = int(200 * args.scale)
+    n_series, seasons_per_series, episodes_per_season = 2_000, 5, 20
+    seed_bulk(engine, users=n_users, series=n_series, seasons_per_series=seasons_per_series,
+              episodes_per_season=episodes_per_season, reviews=0, statuses=0)
+
+    # Heavy users: each has watched a random prefix of 300 series.
+    rng = random.Random(3)
+    tracked = []
+    with engine.begin() as conn:
+        for user_id in range(1, n_users + 1):
+            progress_rows, naive_rows = [], []
+            for series_id in rng.sample(range(1, n_series + 1), 300):
+                watched = rng.randint(0, seasons_per_series * episodes_per_season)
+                tracked.append((user_id, series_id))
+                for season in range(seasons_per_series):
+                    season_id = (series_id - 1) * seasons_per_series + season + 1
+                    count = min(max(watched - season * episodes_per_season, 0), episodes_per_season)
+                    if not count:
+                        continue
+                    bits = set_bits(0, 1, count)
+                    progress_rows.append({"user_id": user_id, "season_id": season_id, "watched_count": count,
+                                          "watched": bits.to_bytes((bits.bit_length() + 7) // 8, "little")})
+                    first_episode = (season_id - 1) * episodes_per_season + 1
+                    naive_rows.extend({"user_id": user_id, "episode_id": first_episode + e} for e in range(count))
+            conn.execute(EpisodeProgress.__table__.insert(), progress_rows)
+            conn.execute(naive.insert(), naive_rows)
+        conn.execute(text("ANALYZE"))
+        bitmap_size = table_bytes(conn, "episode_progress")
+        naive_size = table_bytes(conn, "watched_episodes")
+        rows = (conn.execute(select(func.count()).select_from(EpisodeProgress.__table__)).scalar(),
+                conn.execute(select(func.count()).select_from(naive)).scalar())
+
+    def naive_progress(session, user_id, series_id):
+        in_series = (
+            select(Episode.id).join(Season, Season.id == Episode.season_id).where(Season.series_id == series_id)
+        )
+        total = session.execute(select(func.count()).select_from(in_series.subquery())).scalar()
+        watched = session.execute(
+            select(func.count()).select_from(naive)
+            .where(naive.c.user_id == user_id, naive.c.episode_id.in_(in_series))
+        ).scalar()
+        return watched, total
+
+    def naive_next(session, user_id, series_id):
+        watched = select(naive.c.episode_id).where(naive.c.user_id == user_id)
+        return session.execute(
+            select(Season.season_number, Episode.episode_number)
+            .join(Season, Season.id == Episode.season_id)
+            .where(Season.series_id == series_id, Episode.id.not_in(watched))
+            .order_by(Season.season_number, Episode.episode_number)
+            .limit(1)
+        ).first()
+
+    samples = rng.sample(tracked, min(args.repeat, len(tracked)))
+
+    def each(func):
+        return lambda: [func(session, user_id, series_id) for user_id, series_id in samples]
+
+    with Session(engine) as session:
+        results = {
+            "percent complete": (timed(each(EpisodeProgress.series_progress), 1),
+                                 timed(each(naive_progress), 1)),
+            "next unwatched": (timed(each(EpisodeProgress.next_unwatched), 1),
+                               timed(each(naive_next), 1)),
+        }
+
+    def megabytes(size):
+        return "n/a" if size is None else f"{size / 1_000_000:.1f} MB"
+
+    print(f"storage: bitmaps {rows[0]:,} rows / {megabytes(bitmap_size)}, "
+          f"row-per-episode {rows[1]:,} rows / {megabytes(naive_size)}")
+    print(f"{'operation':<20}{'bitmap ms':>12}{'naive ms':>12}   (per {len(samples)} lookups)")
+    for name, (bitmap_ms, naive_ms) in results.items():
+        print(f"{name:<20}{bitmap_ms:>12.3f}{naive_ms:>12.3f}")
+
+
+@benchmark("create-series")
+def bench_create_series(args):
+    from sqlalchemy import event
+    from sqlalchemy.orm import Session
+    from lib.builder import SeriesBuilder
+
+    engine = make_engine(f"sqlite:///{args.db}")
+    Base.metadata.create_all(engine)
+    commits = [0]
+    event.listen(engine, "commit", lambda conn: commits.__setitem__(0, commits[0] + 1))
+    seasons, episodes = 30, 20
+
+    def per_season_commits():
+        # What create_series used to do: commit the series, then every season.
+        with Session(engine) as session:
+            series = Series(title="Long Runner", genre="Sitcom")
+            session.add(series)
+            session.commit()
+            for number in range(1, seasons + 1):
+                season = Season(series=series, season_number=number)
+                session.add(season)
+                session.commit()
+                for e in range(1, episodes + 1):
+                    session.add(Episode(season=season, episode_number=e, title=f"Episode {e}", duration_mins=22))
+            session.commit()
+
+    def builder():
+        spec = SeriesBuilder("Long Runner", "Sitcom")
+        for number in range(1, seasons + 1):
+            for e in range(1, episodes + 1):
+                spec.add_episode(number, f"Episode {e}", 22)
+        with Session(engine) as session:
+            spec.save(session)
+
+    print(f"{seasons} seasons x {episodes} episodes")
+    print(f"{'approach':<22}{'ms':>10}{'commits':>10}")
+    for name, run in (("commit per season", per_season_commits), ("SeriesBuilder", builder)):
+        commits[0] = 0
+        elapsed = timed(run, args.repeat)
+        print(f"{name:<22}{elapsed:>10.1f}{commits[0] // args.repeat:>10}")
+
+
+@benchmark("cache")
+def bench_cache(args):
+    from sqlalchemy.orm import Session
+    from lib import cache
+
+    engine = make_engine(f"sqlite:///{args.db}")
+    Base.metadata.create_all(engine)
+    n_series = int(100_000 * args.scale)
+    seed_bulk(engine, users=100, series=n_series, seasons_per_series=1, episodes_per_season=1,
+              reviews=0, statuses=0)
+
+    # Skewed access, like a catalog where a few shows get most of the views.
+    rng = random.Random(5)
+    lookups = [min(int(rng.paretovariate(1.2)), n_series) for _ in range(50_000)]
+    with Session(engine) as session:
+        uncached = timed(lambda: [session.execute(
+            select(Series.id, Series.title, Series.genre, Series.description, Series.user_id)
+            .where(Series.id == series_id)).first() for series_id in lookups], 1)
+        cached = timed(lambda: [cache.get_series(session, series_id) for series_id in lookups], 1)
+        pages = timed(lambda: [cache.list_page(session, after_id=(i % 50) * 20) for i in range(5_000)], 1)
+    print(f"{len(lookups):,} series lookups: {uncached:.0f}ms uncached, {cached:.0f}ms through the cache")
+    print(f"5,000 page loads over 50 pages: {pages:.0f}ms")
+    for name, stats in cache.cache_stats().items():
+        print(f"  {name:<14} size={stats['size']:<6} hits={stats['hits']:<7} misses={stats['misses']:<7} "
+              f"hit rate={stats['hit_rate']:.1%}")
+
+
+@benchmark("recommendations")
+def bench_recommendations(args):
+    from sqlalchemy.orm import Session
+    from lib import recommend
+
+    engine = make_engine(f"sqlite:///{args.db}")
+    Base.metadata.create_all(engine)
+    n_users, n_series, _ = build_synthetic_db(engine, args.scale)
+
+    with engine.connect() as conn:
+        start = time.perf_counter()
+        matrix = recommend.load_matrix(conn)
+        print(f"Loaded a {matrix.shape[0]:,} x {matrix.shape[1]:,} matrix ({matrix.nnz:,} signals) "
+              f"in {time.perf_counter() - start:.1f}s")
+    print(f"{'workers':<10}{'refresh s':>12}")
+    for workers in sorted({1, os.cpu_count() or 1}):
+        start = time.perf_counter()
+        recommend.refresh_neighbors(engine, workers=workers, report=lambda message: None)
+        print(f"{workers:<10}{time.perf_counter() - start:>12.1f}")
+
+    rng = random.Random(11)
+    users = [rng.randint(1, n_users) for _ in range(args.repeat)]
+    with Session(engine) as session:
+        latencies = sorted(timed(lambda: recommend.recommend(session, user_id), 1) for user_id in users)
+        changed = rng.sample(range(1, n_series + 1), 10)
+        start = time.perf_counter()
+        recommend.refresh_neighbors(engine, series_ids=changed, report=lambda message: None)
+        incremental = time.perf_counter() - start
+    print(f"incremental refresh of {len(changed)} series: {incremental:.1f}s")
+    print(f"recommend(): p50 {latencies[len(latencies) // 2]:.2f}ms, "
+          f"p99 {latencies[min(len(latencies) - 1, len(latencies) * 99 // 100)]:.2f}ms over {len(users)} users")
+
+
+def percentile(samples, fraction):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+@benchmark("async")
+def bench_async(args):
+    import asyncio
+    from concurrent.futures import ThreadPoolExecutor
+    from sqlalchemy.orm import Session
+    from lib import aio
+
+    engine = make_engine(f"sqlite:///{args.db}")
+    Base.metadata.create_all(engine)
+    n_users, n_series = int(2_000 * args.scale), int(10_000 * args.scale)
+    seed_bulk(engine, users=n_users, series=n_series, seasons_per_series=1, episodes_per_season=1,
+              reviews=0, statuses=0)
+
+    # Every simulated user makes --repeat visits; a visit is five operations
+    # (three of them writes) on a random series.
+    rng = random.Random(13)
+    plans = [[(rng.randint(1, n_users), rng.randint(1, n_series)) for _ in range(args.repeat)]
+             for _ in range(args.concurrency)]
+    operations = 5 * args.concurrency * args.repeat
+
+    def sync_visit(user_id, series_id):
+        start = time.perf_counter()
+        with Session(engine, expire_on_commit=False) as session:
+            Series.get_by_id(session, series_id)
+            Status.watchlist(session, user_id)
+            Status.add_to_watchlist(session, user_id, series_id)
+            Status.upsert(session, user_id, series_id, "Watching")
+            Status.remove_from_watchlist(session, user_id, series_id)
+        return (time.perf_counter() - start) * 1000
+
+    def sync_user(plan):
+        return [sync_visit(user_id, series_id) for user_id, series_id in plan]
+
+    async_engine = aio.make_async_engine(f"sqlite:///{args.db}")
+
+    async def async_visit(user_id, series_id):
+        start = time.perf_counter()
+        async with aio.AsyncSession(bind=async_engine) as session:
+            await aio.SeriesRepository.get_by_id(session, series_id)
+            await aio.StatusRepository.watchlist(session, user_id)
+            await aio.StatusRepository.add_to_watchlist(session, user_id, series_id)
+            await aio.StatusRepository.upsert(session, user_id, series_id, "Watching")
+            await aio.StatusRepository.remove_from_watchlist(session, user_id, series_id)
+        return (time.perf_counter() - start) * 1000
+
+    async def async_user(plan):
+        return [await async_visit(user_id, series_id) for user_id, series_id in plan]
+
+    async def async_run():
+        results = await asyncio.gather(*[async_user(plan) for plan in plans])
+        await async_engine.dispose()
+        return results
+
+    def sequential():
+        return [sync_user(plan) for plan in plans]
+
+    def threaded():
+        with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+            return list(pool.map(sync_user, plans))
+
+    print(f"{args.concurrency} simulated users x {args.repeat} visits x 5 operations")
+    print(f"{'path':<22}{'ops/sec':>10}{'p50 ms':>10}{'p99 ms':>10}")
+    for name, run in (("sync, one at a time", sequential), (f"sync, {args.concurrency} threads", threaded),
+                      (f"async, {args.concurrency} tasks", lambda: asyncio.run(async_run()))):
+        start = time.perf_counter()
+        latencies = [latency for visits in run() for latency in visits]
+        elapsed = time.perf_counter() - start
+        print(f"{name:<22}{operations / elapsed:>10,.0f}{percentile(latencies, 0.5):>10.1f}"
+              f"{percentile(latencies, 0.99):>10.1f}")
+
+
+@benchmark("api")
+def bench_api(args):
+    import http.client
+    import threading
+    from urllib.parse import urlsplit
+
+    engine = make_engine(f"sqlite:///{args.db}")
+    migrate.upgrade(engine)
+    n_users, n_series, _ = build_synthetic_db(engine, args.scale)
+    engine.dispose()
+
+    # The server runs in its own process, so the load generator's threads do
+    # not compete with it for the GIL.
+    env = dict(os.environ, TV_TRACKER_DATABASE_URL=f"sqlite:///{args.db}")
+    server = subprocess.Popen(
+        [sys.executable, os.path.join(os.path.dirname(os.path.abspath(__file__)), "api.py"), "--port", "0", "--quiet"],
+        env=env, stdout=subprocess.PIPE, text=True,
+    )
+    try:
+        address = urlsplit(server.stdout.readline().split()[-1])
+        words = ["vision", "synerg", "multi lay", "sci", "robust paradigm", "drama"]
+        statuses = ["Watching", "Completed", "Plan to Watch", "Dropped"]
+        # (weight, name, method, make path, make body)
+        mix = [
+            (40, "list page", "GET", lambda rng: f"/series?after={rng.randint(0, 50) * 20}", None),
+            (15, "search", "GET", lambda rng: f"/series/search?q={rng.choice(words).replace(' ', '+')}", None),
+            (20, "detail", "GET", lambda rng: f"/series/{min(int(rng.paretovariate(1.2)), n_series)}", None),
+            (5, "reviews", "GET", lambda rng: f"/series/{min(int(rng.paretovariate(1.2)), n_series)}/reviews", None),
+            (10, "watchlist", "GET", lambda rng: f"/users/{rng.randint(1, n_users)}/watchlist", None),
+            (10, "status update", "PUT",
+             lambda rng: f"/users/{rng.randint(1, n_users)}/watchlist/{rng.randint(1, n_series)}",
+             lambda rng: {"watch_status": rng.choice(statuses)}),
+        ]
+        weights = [entry[0] for entry in mix]
+        results = {entry[1]: [] for entry in mix}
+        counts = {"304": 0, "errors": 0, "bytes": 0}
+        lock = threading.Lock()
+
+        def client(seed):
+            # One keep-alive connection per simulated client, revalidating
+            # catalog URLs it has seen with If-None-Match like a browser would.
+            rng = random.Random(seed)
+            conn = http.client.HTTPConnection(address.hostname, address.port)
+            etags = {}
+            local = []
+            for _ in range(args.repeat):
+                _, name, method, make_path, make_body = rng.choices(mix, weights)[0]
+                path = make_path(rng)
+                headers = {"Accept-Encoding": "gzip"}
+                body = None
+                if make_body:
+                    body = json.dumps(make_body(rng))
+                    headers["Content-Type"] = "application/json"
+                elif path in etags:
+                    headers["If-None-Match"] = etags[path]
+                start = time.perf_counter()
+                conn.request(method, path, body=body, headers=headers)
+                response = conn.getresponse()
+                payload = response.read()
+                local.append((name, (time.perf_counter() - start) * 1000, response.status, len(payload)))
+                if response.getheader("ETag"):
+                    etags[path] = response.getheader("ETag")
+            conn.close()
+            with lock:
+                for name, latency, status, size in local:
+                    results[name].append(latency)
+                    counts["304"] += status == 304
+                    counts["errors"] += status >= 500
+                    counts["bytes"] += size
+
+        threads = [threading.Thread(target=client, args=(seed,)) for seed in range(args.concurrency)]
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - start
+    finally:
+        server.terminate()
+        server.wait()
+
+    total = sum(len(latencies) for latencies in results.values())
+    every = [latency for latencies in results.values() for latency in latencies]
+    print(f"{args.concurrency} clients x {args.repeat} requests: {total / elapsed:,.0f} requests/sec, "
+          f"{counts['304'] / total:.0%} answered 304, {counts['errors']} server errors, "
+          f"{counts['bytes'] / total:,.0f} bytes/response")
+    print(f"{'endpoint':<16}{'requests':>10}{'p50 ms':>10}{'p99 ms':>10}")
+    for name, latencies in list(results.items()) + [("all", every)]:
+        if latencies:
+            print(f"{name:<16}{len(latencies):>10}{percentile(latencies, 0.5):>10.1f}{percentile(latencies, 0.99):>10.1f}")
+
+
+@benchmark("delete")
+def bench_delete(args):
+    # Deleting long-running shows the way the ORM cascade used to (every
+    # child loaded, then deleted row by row) against ON DELETE CASCADE, plus
+    # the bulk deletes.
+    from sqlalchemy.orm import Session, selectinload
+    from lib.models import SeriesStats
+
+    engine = make_engine(f"sqlite:///{args.db}")
+    migrate.upgrade(engine)
+    n_users, n_series, _ = build_synthetic_db(engine, args.scale)
+
+    # 2 x --repeat shows of 40 seasons x 50 episodes, 2,000 reviews and
+    # min(users, 5,000) statuses each.
+    seasons, episodes, reviews, watchers = 40, 50, 2_000, min(n_users, 5_000)
+    rng = random.Random(19)
+    with engine.begin() as conn:
+        next_season = conn.scalar(select(func.max(Season.id))) + 1
+        shows = list(range(n_series + 1, n_series + 1 + 2 * args.repeat))
+        for series_id in shows:
+            conn.execute(Series.__table__.insert(), [{"id": series_id, "title": f"Long runner {series_id}",
+                                                      "genre": "drama", "user_id": 1}])
+            season_ids = list(range(next_season, next_season + seasons))
+            next_season += seasons
+            conn.execute(Season.__table__.insert(), [
+                {"id": season_id, "series_id": series_id, "season_number": number}
+                for number, season_id in enumerate(season_ids, 1)])
+            conn.execute(Episode.__table__.insert(), [
+                {"season_id": season_id, "episode_number": number, "title": f"Episode {number}", "duration_mins": 45}
+                for season_id in season_ids for number in range(1, episodes + 1)])
+            conn.execute(Review.__table__.insert(), [
+                {"series_id": series_id, "user_id": rng.randint(1, n_users), "rating": rng.randint(1, 10),
+                 "content": "Still going."} for _ in range(reviews)])
+            conn.execute(Status.__table__.insert(), [
+                {"series_id": series_id, "user_id": user_id, "watch_status": "Watching"}
+                for user_id in rng.sample(range(1, n_users + 1), watchers)])
+    with Session(engine) as session:
+        SeriesStats.rebuild(session, shows)
+
+    def orm_cascade(session, series_id):
+        series = session.scalars(select(Series).where(Series.id == series_id).options(
+            selectinload(Series.seasons).selectinload(Season.episodes),
+            selectinload(Series.reviews), selectinload(Series.statuses))).one()
+        session.delete(series)
+        session.commit()
+
+    def run(delete_one, series_ids):
+        samples = []
+        for index, series_id in enumerate(series_ids):
+            with Session(engine) as session:
+                traced = index == 0
+                if traced:
+                    tracemalloc.start()
+                start = time.perf_counter()
+                delete_one(session, series_id)
+                samples.append((time.perf_counter() - start) * 1000)
+                if traced:
+                    peak = tracemalloc.get_traced_memory()[1]
+                    tracemalloc.stop()
+        # The first (traced) call is left out of the timings.
+        return samples[1:] or samples, peak
+
+    print(f"{len(shows)} shows of {seasons * episodes:,} episodes, {reviews:,} reviews and {watchers:,} statuses")
+    print(f"{'single delete':<30}{'p50 ms':>10}{'p99 ms':>10}{'peak KiB':>11}")
+    for name, delete_one, series_ids in (
+            ("ORM cascade (children loaded)", orm_cascade, shows[:args.repeat]),
+            ("Series.delete", Series.delete, shows[args.repeat:])):
+        samples, peak = run(delete_one, series_ids)
+        print(f"{name:<30}{percentile(samples, 0.5):>10.1f}{percentile(samples, 0.99):>10.1f}{peak / 1024:>11,.0f}")
+
+    with Session(engine) as session:
+        ids = rng.sample(range(1, n_series + 1), min(n_series, 1_000))
+        start = time.perf_counter()
+        Series.delete_many(session, ids)
+        print(f"Series.delete_many of {len(ids):,} series: {(time.perf_counter() - start) * 1000:,.0f}ms")
+        ids = rng.sample(range(1, n_users + 1), min(n_users, 100))
+        start = time.perf_counter()
+        User.delete_many(session, ids)
+        print(f"User.delete_many of {len(ids):,} users (with stats recount): "
+              f"{(time.perf_counter() - start) * 1000:,.0f}ms")
+
+
+@benchmark("genres")
+def bench_genres(args):
+    # Genre filters on the free-text Series.genre (LIKE over every row) against
+    # the series_genres tags, and text watch statuses against WatchStatus
+    # integer codes: lookups and on-disk size of statuses plus its index.
+    from sqlalchemy.orm import Session
+    from lib.models import Genre, WatchStatus, WATCH_STATUS_LABELS, series_genres
+
+    engine = make_engine(f"sqlite:///{args.db}")
+    migrate.upgrade(engine)
+    _, n_series, _ = build_synthetic_db(engine, args.scale)
+
+    labels = " ".join(f"WHEN {int(status)} THEN '{label}'" for status, label in WATCH_STATUS_LABELS.items())
+    with engine.begin() as conn:
+        # The old representation, side by side with the new one.
+        conn.exec_driver_sql("DROP TABLE IF EXISTS text_statuses")
+        conn.exec_driver_sql("CREATE TABLE text_statuses (id INTEGER PRIMARY KEY, watch_status VARCHAR, "
+                             "user_id INTEGER, series_id INTEGER)")
+        conn.exec_driver_sql(f"INSERT INTO text_statuses SELECT id, CASE watch_status {labels} END, user_id, "
+                             f"series_id FROM statuses")
+        conn.exec_driver_sql("CREATE INDEX ix_text_statuses_series_status ON text_statuses (series_id, watch_status)")
+        conn.exec_driver_sql("ANALYZE")
+
+    def table_bytes(conn, *names):
+        return conn.exec_driver_sql(
+            f"SELECT sum(pgsize) FROM dbstat WHERE name IN ({', '.join('?' * len(names))})", names).scalar()
+
+    genre = "drama"
+    middle = n_series // 2
+    genre_id = Genre.id_of(genre)
+    like = f"%{genre}%"
+    def sql(build):
+        return lambda session: session.execute(build()).all()
+
+    queries = [
+        ("series in genre",
+         sql(lambda: select(func.count()).where(Series.genre.ilike(like))),
+         sql(lambda: select(func.count()).select_from(series_genres).where(series_genres.c.genre_id == genre_id))),
+        ("genre page (keyset, mid-catalog)",
+         sql(lambda: select(Series.id, Series.title, Series.genre).where(Series.genre.ilike(like), Series.id > middle)
+             .order_by(Series.id).limit(20)),
+         lambda session: Series.list_page(session, after_id=middle, genre=genre)),
+        ("watching, genre's series",
+         sql(lambda: text("SELECT count(*) FROM text_statuses JOIN series ON series.id = text_statuses.series_id "
+                          "WHERE series.genre LIKE :like AND text_statuses.watch_status = 'Watching'")
+             .bindparams(like=like)),
+         sql(lambda: select(func.count()).select_from(series_genres)
+             .join(Status, Status.series_id == series_genres.c.series_id)
+             .where(series_genres.c.genre_id == genre_id, Status.watch_status == WatchStatus.WATCHING))),
+        ("statuses of one series",
+         sql(lambda: text("SELECT watch_status, count(*) FROM text_statuses WHERE series_id = :series_id "
+                          "GROUP BY watch_status").bindparams(series_id=middle)),
+         sql(lambda: select(Status.watch_status, func.count()).where(Status.series_id == middle)
+             .group_by(Status.watch_status))),
+    ]
+
+    print(f"{'query':<34}{'text ms':>10}{'enum/tags ms':>14}")
+    with Session(engine) as session:
+        for name, old, new in queries:
+            before = timed(lambda: old(session), args.repeat)
+            after = timed(lambda: new(session), args.repeat)
+            print(f"{name:<34}{before:>10.3f}{after:>14.3f}")
+
+        conn = session.connection()
+        text_kib = table_bytes(conn, "text_statuses", "ix_text_statuses_series_status") / 1024
+        int_kib = table_bytes(conn, "statuses", "ix_statuses_series_status") / 1024
+        print(f"statuses + (series_id, watch_status) index: {text_kib:,.0f} KiB as text, {int_kib:,.0f} KiB as integers")
+        print(f"series_genres: {table_bytes(conn, 'series_genres', 'ix_series_genres_series_id') / 1024:,.0f} KiB "
+              f"for {conn.scalar(select(func.count()).select_from(series_genres)):,} tags")
+    with engine.begin() as conn:
+        conn.exec_driver_sql("DROP TABLE text_statuses")
+
+
+# --tier presets: build_synthetic_db scales for 1k, 100k and 1M series.
+TIERS = {"1k": 0.01, "100k": 1.0, "1m": 10.0}
+
+
+@contextmanager
+def scripted(answers):
+    # Feeds `answers` to input() in order and discards the output, so CLI
+    # actions run unattended. The CLI's cosmetic sleeps are skipped.
+    answers = iter(answers)
+
+    def fake_input(prompt=""):
+        try:
+            return next(answers)
+        except StopIteration:
+            raise RuntimeError(f"script ran out of answers at prompt {prompt!r}") from None
+
+    with open(os.devnull, "w") as devnull, redirect_stdout(devnull), \
+            mock.patch("builtins.input", fake_input), mock.patch("time.sleep"):
+        yield
+    leftover = list(answers)
+    if leftover:
+        raise RuntimeError(f"script has unused answers: {leftover!r}")
+
+
+def measure(name, setup, run, repeat):
+    # Times `repeat` calls of run(state), each after an untimed setup() and in
+    # its own session_scope() like a CLI menu action. One more call runs under
+    # tracemalloc for the peak; tracing slows allocation-heavy code several
+    # fold, so it stays out of the timed calls.
+    from lib.db import session_scope
+
+    def once():
+        state = setup()
+        start = time.perf_counter()
+        with session_scope() as session:
+            run(session, state)
+        return (time.perf_counter() - start) * 1000
+
+    samples = [once() for _ in range(repeat)]
+    tracemalloc.start()
+    try:
+        once()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {
+        "name": name, "calls": repeat, "mean_ms": sum(samples) / len(samples),
+        "p50_ms": percentile(samples, 0.5), "p99_ms": percentile(samples, 0.99), "peak_kb": peak / 1024,
+    }
+
+
+def traced(func):
+    # (result, elapsed ms, tracemalloc peak bytes) of one call.
+    tracemalloc.start()
+    start = time.perf_counter()
+    try:
+        result = func()
+        elapsed = (time.perf_counter() - start) * 1000
+        return result, elapsed, tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def snapshot_worker(path):
+    # One analytics worker: map the shared snapshot file and query it.
+    from lib.snapshot import CatalogSnapshot
+
+    def work():
+        with CatalogSnapshot.open(path) as snapshot:
+            snapshot.by_genre()
+            return snapshot.rows(snapshot.top("minutes", snapshot.where(genre="drama"), limit=10))
+    return traced(work)
+
+
+@benchmark("snapshot")
+def bench_snapshot(args):
+    # The catalog as an ORM graph (Series -> seasons -> episodes) against the
+    # column-oriented snapshot: load time and peak memory, the same filter,
+    # top-N and per-genre aggregate on each, and worker processes sharing
+    # one memory-mapped snapshot file.
+    from concurrent.futures import ProcessPoolExecutor
+    from sqlalchemy.orm import Session, selectinload
+    from lib.models import Genre
+    from lib.snapshot import CatalogSnapshot
+
+    engine = make_engine(f"sqlite:///{args.db}")
+    migrate.upgrade(engine)
+    with Session(engine) as session:
+        if not session.scalar(select(func.count()).select_from(Series)):
+            build_synthetic_db(engine, args.scale)
+
+    def orm_load():
+        with Session(engine) as session:
+            series = session.scalars(select(Series).options(
+                selectinload(Series.seasons).selectinload(Season.episodes))).all()
+            return [(s.id, s.title, s.genre, len(s.seasons), sum(len(season.episodes) for season in s.seasons),
+                     sum(e.duration_mins or 0 for season in s.seasons for e in season.episodes)) for s in series]
+
+    def orm_where(rows):
+        return [row for row in rows if "drama" in Genre.split(row[2]) and row[4] >= 10]
+
+    def orm_top(rows):
+        return sorted(orm_where(rows), key=lambda row: (-row[5], row[0]))[:10]
+
+    def orm_by_genre(rows):
+        result = {}
+        for row in rows:
+            for name in Genre.split(row[2]):
+                count, episodes, minutes = result.get(name, (0, 0, 0))
+                result[name] = (count + 1, episodes + row[4], minutes + row[5])
+        return result
+
+    rows, orm_ms, orm_peak = traced(orm_load)
+    built, build_ms, build_peak = traced(lambda: CatalogSnapshot.build(engine))
+    path = os.path.join(os.path.dirname(os.path.abspath(args.db)), "catalog.snapshot")
+    built.save(path)
+    snapshot, open_ms, open_peak = traced(lambda: CatalogSnapshot.open(path))
+
+    print(f"{len(rows):,} series, {sum(row[4] for row in rows):,} episodes")
+    print(f"{'load':<34}{'ms':>10}{'peak KiB':>12}")
+    print(f"{'ORM graph (selectinload)':<34}{orm_ms:>10,.0f}{orm_peak / 1024:>12,.0f}")
+    print(f"{'snapshot build (one pass)':<34}{build_ms:>10,.0f}{build_peak / 1024:>12,.0f}")
+    print(f"{'snapshot open (mmap)':<34}{open_ms:>10,.2f}{open_peak / 1024:>12,.0f}")
+    print(f"snapshot: {built.nbytes / 1024:,.0f} KiB of arrays, {os.path.getsize(path) / 1024:,.0f} KiB on disk")
+
+    assert [row[0] for row in orm_top(rows)] == [row[0] for row in snapshot.rows(
+        snapshot.top("minutes", snapshot.where(genre="drama", min_episodes=10), limit=10))]
+    operations = [
+        ("filter (drama, >= 10 episodes)", lambda: orm_where(rows),
+         lambda: snapshot.where(genre="drama", min_episodes=10)),
+        ("top 10 by minutes in that", lambda: orm_top(rows),
+         lambda: snapshot.rows(snapshot.top("minutes", snapshot.where(genre="drama", min_episodes=10), limit=10))),
+        ("totals per genre", lambda: orm_by_genre(rows), snapshot.by_genre),
+    ]
+    print(f"{'query':<34}{'ORM rows ms':>12}{'snapshot ms':>13}")
+    for name, on_rows, on_snapshot in operations:
+        print(f"{name:<34}{timed(on_rows, args.repeat):>12.2f}{timed(on_snapshot, args.repeat):>13.2f}")
+    snapshot.close()
+
+    workers = 4
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        results = list(pool.map(snapshot_worker, [path] * workers))
+    for index, (_, elapsed, peak) in enumerate(results, 1):
+        print(f"worker {index}: opened the shared snapshot and queried it in {elapsed:,.1f}ms, "
+              f"peak {peak / 1024:,.0f} KiB private")
+    os.remove(path)
+
+
+@benchmark("reports")
+def bench_reports(args):
+    # The nightly reports on 1/2/4/8 worker processes, each report timed on
+    # its own, against the genre distribution computed through the ORM on
+    # one core. Every worker count must produce identical rows.
+    from sqlalchemy.orm import Session
+    from lib.models import Genre
+    from lib import reports
+
+    engine = make_engine(f"sqlite:///{args.db}")
+    migrate.upgrade(engine)
+    with Session(engine) as session:
+        if not session.scalar(select(func.count()).select_from(Series)):
+            build_synthetic_db(engine, args.scale)
+        start = time.perf_counter()
+        genres = {}
+        for review in session.scalars(select(Review).where(Review.rating.between(1, 10))
+                                      .execution_options(yield_per=10_000)):
+            for name in Genre.split(review.series.genre):
+                genres.setdefault(name, [0] * 10)[review.rating - 1] += 1
+        orm_s = time.perf_counter() - start
+
+    url = f"sqlite:///{args.db}"
+    print(f"{os.cpu_count()} CPUs; ORM genre-ratings on one core: {orm_s:.2f}s")
+    print(f"{'workers':<10}" + "".join(f"{name:>20}" for name in reports.REPORTS) + f"{'speedup':>10}")
+    expected, first = None, None
+    for workers in (1, 2, 4, 8):
+        timings, results = [], {}
+        for name in reports.REPORTS:
+            start = time.perf_counter()
+            results.update(reports.run_reports(url, [name], workers=workers))
+            timings.append(time.perf_counter() - start)
+        if expected is None:
+            expected, first = results, sum(timings)
+            assert {row[0]: list(row[3:]) for row in results["genre-ratings"][1]} == genres
+        assert results == expected, f"{workers} workers disagree with 1"
+        print(f"{workers:<10}" + "".join(f"{elapsed:>19.2f}s" for elapsed in timings)
+              + f"{first / sum(timings):>9.2f}x")
+
+
+# Series tracked by the heavy user the cli benchmark times the dashboard for,
+# with progress on the first season of every other one.
+HEAVY_TRACKED = 5_000
+
+
+def heavy_user(session, n_series):
+    from lib.models import EpisodeProgress, SeriesStats, WatchStatus
+
+    user_id = session.scalar(select(User.id).where(User.username == "bench_heavy"))
+    if user_id is not None:
+        return user_id
+    user_id = User.create(session, "bench_heavy").id
+    rng = random.Random(23)
+    series_ids = rng.sample(range(1, n_series + 1), min(HEAVY_TRACKED, n_series))
+    session.execute(Status.__table__.insert(), [
+        {"user_id": user_id, "series_id": series_id, "watch_status": rng.choice(list(WatchStatus))}
+        for series_id in series_ids])
+    seasons = session.scalars(select(func.min(Season.id)).where(Season.series_id.in_(series_ids[::2]))
+                              .group_by(Season.series_id)).all()
+    session.execute(EpisodeProgress.__table__.insert(), [
+        {"user_id": user_id, "season_id": season_id, "watched": b"\x07", "watched_count": 3}
+        for season_id in seasons])
+    session.commit()
+    SeriesStats.rebuild(session, series_ids)
+    return user_id
+
+
+@benchmark("cli")
+def bench_cli(args):
+    # The run_cli menu actions (1-11, 16) through their functions with
+    # scripted input, then the model classmethods on their own. An existing --db is
+    # reused as is, so runs on different commits can share one dataset.
+    from lib import cli, db
+    from lib.builder import SeriesBuilder
+    from lib.models import EpisodeProgress, SeriesStats
+
+    os.environ["TV_TRACKER_DATABASE_URL"] = f"sqlite:///{args.db}"
+    engine = db.get_engine()
+    if os.path.exists(args.db) and os.path.getsize(args.db):
+        print(f"Reusing {args.db}")
+        migrate.upgrade(engine)
+    else:
+        migrate.upgrade(engine)
+        start = time.perf_counter()
+        build_synthetic_db(engine, args.scale)
+        print(f"Generated synthetic database in {time.perf_counter() - start:.1f}s")
+
+    with db.session_scope() as session:
+        n_series = session.scalar(select(func.max(Series.id)))
+        user = session.get(User, session.scalar(select(Series.user_id).where(Series.id == 1)))
+        genre = session.scalar(select(Series.genre).where(Series.id == 1))
+        heavy = heavy_user(session, n_series)
+        # Fewer than HEAVY_TRACKED on small tiers; the labels show the real count.
+        heavy_tracked = session.scalar(select(func.count()).select_from(Status).where(Status.user_id == heavy))
+        # Past the IDs of earlier runs, so a reused --db gets fresh usernames.
+        first = session.scalar(select(func.max(User.id))) + 1
+    rng = random.Random(17)
+    serial = iter(range(first, 10**9))
+
+    def any_series():
+        return rng.randint(1, n_series)
+
+    def own_series():
+        with db.session_scope() as session:
+            return session.scalars(select(Series.id).where(Series.user_id == user.id)).all()
+
+    def own_season():
+        with db.session_scope() as session:
+            return session.execute(
+                select(Season.series_id, Season.id).join(Series).where(Series.user_id == user.id).limit(1)).one()
+
+    def watchlisted():
+        series_id = any_series()
+        with db.session_scope() as session:
+            Status.add_to_watchlist(session, user.id, series_id)
+        return series_id
+
+    def throwaway_series():
+        builder = SeriesBuilder(f"Bench series {next(serial)}", genre, "Scratch series.", user_id=user.id)
+        for season_number in (1, 2, 3):
+            builder.add_season(season_number)
+            for episode_number in range(1, 6):
+                builder.add_episode(season_number, f"Episode {episode_number}", 30, episode_number=episode_number)
+        with db.session_scope() as session:
+            builder.save(session)
+            return session.scalar(select(func.max(Series.id)))
+
+    def by_hand(number):
+        answers = [f"Bench series {number}", genre, "Entered by hand.", "2"]
+        for _ in range(2):
+            answers += ["5"] + [value for episode in range(1, 6) for value in (f"Episode {episode}", "30")]
+        return answers
+
+    def menu(action, script, setup=lambda: None):
+        def run(session, state):
+            with scripted(script(state)):
+                action(session)
+        return setup, run
+
+    # (name, setup, run); setup's result is passed to run as `state`.
+    cli_actions = [
+        ("1 list series", *menu(cli.list_all_series, lambda _: ["", "", "n", "n", ""])),
+        ("1 list series by genre", *menu(cli.list_all_series, lambda _: [genre, "", "n", ""])),
+        ("2 series details", *menu(lambda s: cli.view_series_details(s, user), lambda id_: [str(id_)], any_series)),
+        ("3 add review", *menu(lambda s: cli.add_review(s, user),
+                               lambda id_: [str(id_), "8", "Solid."], any_series)),
+        ("4 update watch status", *menu(lambda s: cli.update_watch_status(s, user),
+                                        lambda id_: [str(id_), "Watching"], any_series)),
+        ("5 create series", *menu(lambda s: cli.create_series(s, user), lambda _: [""] + by_hand(next(serial)))),
+        ("6 add season", *menu(lambda s: cli.add_season_to_series(s, user),
+                               lambda ids: [str(rng.choice(ids)), str(100 + next(serial))], own_series)),
+        ("7 add episode", *menu(lambda s: cli.add_episode_to_season(s, user),
+                                lambda ids: [str(ids[0]), str(ids[1]), "Extra", str(100 + next(serial)), "42"],
+                                own_season)),
+        ("8 view watchlist", *menu(lambda s: cli.view_watchlist(s, user), lambda _: [])),
+        ("9 add to watchlist", *menu(lambda s: cli.add_series_to_watchlist(s, user),
+                                     lambda id_: [str(id_)], any_series)),
+        ("10 remove from watchlist", *menu(lambda s: cli.remove_series_from_watchlist(s, user),
+                                           lambda id_: [str(id_)], watchlisted)),
+        ("11 delete series", *menu(lambda s: cli.delete_series(s, user),
+                                   lambda id_: [str(id_), "yes"], throwaway_series)),
+        ("16 dashboard", *menu(lambda s: cli.show_dashboard(s, user), lambda _: [])),
+    ]
+
+    def direct(call, setup=lambda: None):
+        return setup, lambda session, state: call(session, state)
+
+    classmethods = [
+        ("User.create", *direct(lambda s, _: User.create(s, f"bench_user_{next(serial)}"))),
+        ("User.get_by_id", *direct(lambda s, _: User.get_by_id(s, user.id))),
+        ("Series.create", *direct(lambda s, _: Series.create(s, "Bench", genre, "Direct.", user.id))),
+        ("Series.get_by_id", *direct(Series.get_by_id, any_series)),
+        ("Series.list_page", *direct(lambda s, id_: Series.list_page(s, after_id=id_), any_series)),
+        ("Series.list_page by genre", *direct(lambda s, _: Series.list_page(s, genre=genre))),
+        ("Series.load_detail", *direct(Series.load_detail, any_series)),
+        ("Series.delete", *direct(Series.delete, throwaway_series)),
+        ("Season.create", *direct(lambda s, id_: Season.create(s, 100 + next(serial), id_), any_series)),
+        ("Episode.create", *direct(lambda s, ids: Episode.create(s, "Extra", 100 + next(serial), 42, ids[1]),
+                                   own_season)),
+        ("Review.create", *direct(lambda s, id_: Review.create(s, "Fine.", 7, user.id, id_), any_series)),
+        ("Status.upsert", *direct(lambda s, id_: Status.upsert(s, user.id, id_, "Completed"), any_series)),
+        ("Status.add_to_watchlist", *direct(lambda s, id_: Status.add_to_watchlist(s, user.id, id_), any_series)),
+        ("EpisodeProgress.mark_watched", *direct(
+            lambda s, ids: EpisodeProgress.mark_watched(s, user.id, ids[1], 1, 3), own_season)),
+        ("EpisodeProgress.series_progress", *direct(
+            lambda s, id_: EpisodeProgress.series_progress(s, user.id, id_), any_series)),
+        ("SeriesStats.for_series", *direct(SeriesStats.for_series, any_series)),
+        ("User.dashboard", *direct(lambda s, _: User.dashboard(s, user.id))),
+        (f"User.dashboard ({heavy_tracked:,} tracked)", *direct(lambda s, _: User.dashboard(s, heavy))),
+        (f"User.watch_time ({heavy_tracked:,} tracked)", *direct(lambda s, _: User.watch_time(s, heavy, limit=10))),
+    ]
+
+    results = []
+    print(f"{'operation':<34}{'mean ms':>10}{'p50 ms':>10}{'p99 ms':>10}{'peak KiB':>11}")
+    for name, setup, run in cli_actions + classmethods:
+        result = measure(name, setup, run, args.repeat)
+        results.append(result)
+        print(f"{name:<34}{result['mean_ms']:>10.2f}{result['p50_ms']:>10.2f}{result['p99_ms']:>10.2f}"
+              f"{result['peak_kb']:>11,.0f}")
+    return results
+
+
+def git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)), check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results, baseline_path):
+    # Per-operation change in p50 and peak memory against an earlier --json file.
+    with open(baseline_path, encoding="utf-8") as handle:
+        baseline = json.load(handle)
+    before = {result["name"]: result for result in baseline["results"]}
+    print(f"\nAgainst {baseline_path} ({baseline.get('revision') or 'unknown revision'}, tier {baseline.get('tier')}):")
+    print(f"{'operation':<34}{'p50 before':>12}{'p50 now':>10}{'change':>9}{'peak change':>13}")
+    for result in results:
+        old = before.get(result["name"])
+        if old is None:
+            continue
+        change = result["p50_ms"] / old["p50_ms"] - 1 if old["p50_ms"] else 0.0
+        peak = result["peak_kb"] / old["peak_kb"] - 1 if old["peak_kb"] else 0.0
+        print(f"{result['name']:<34}{old['p50_ms']:>12.2f}{result['p50_ms']:>10.2f}{change:>+9.0%}{peak:>+13.0%}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="TV Series Tracker benchmarks")
+    parser.add_argument("name", choices=sorted(BENCHMARKS))
+    parser.add_argument("--scale", type=float, default=1.0, help="multiplier for the synthetic row counts")
+    parser.add_argument("--repeat", type=int, default=20, help="timed iterations per measurement")
+    parser.add_argument("--concurrency", type=int, default=200, help="simulated concurrent users for load tests")
+    parser.add_argument("--tier", choices=sorted(TIERS), help="preset scale: 1k, 100k or 1m series (overrides --scale)")
+    parser.add_argument("--db", help="database file to build (defaults to a temporary file)")
+    parser.add_argument("--json", help="write the results to this file, for comparing commits")
+    parser.add_argument("--baseline", help="a previous --json file to compare the results against")
+    args = parser.parse_args(argv)
+
+    if args.tier:
+        args.scale = TIERS[args.tier]
+    if args.db is None:
+        args.db = os.path.join(tempfile.mkdtemp(), "bench.db")
+    results = BENCHMARKS[args.name](args)
+    if not results:
+        return
+    if args.baseline:
+        compare(results, args.baseline)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as handle:
+            json.dump({
+                "benchmark": args.name, "tier": args.tier, "scale": args.scale, "repeat": args.repeat,
+                "revision": git_revision(), "python": sys.version.split()[0],
+                "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"), "results": results,
+            }, handle, indent=2)
+        print(f"Wrote {args.json}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+import csv
+import json
+from lib.models import Series, Season, Episode
+
+DEFAULT_DURATION_MINS = 30
+
+
+class SeriesBuilder:
+    # Collects a series -> seasons -> episodes tree in memory; save() writes
+    # it in one transaction, with seasons and episodes inserted in batches.
+
+    def __init__(self, title, genre, description=None, user_id=None):
+        if not title or not genre:
+            raise ValueError("Title and Genre are required.")
+        self.title = title
+        self.genre = genre
+        self.description = description
+        self.user_id = user_id
+        self.seasons = {}
+
+    def add_season(self, season_number):
+        self.seasons.setdefault(season_number, [])
+        return self
+
+    def add_episode(self, season_number, title, duration_mins=None, episode_number=None):
+        episodes = self.seasons.setdefault(season_number, [])
+        if episode_number is None:
+            episode_number = len(episodes) + 1
+        if duration_mins in (None, ""):
+            duration_mins = DEFAULT_DURATION_MINS
+        episodes.append((episode_number, title, int(duration_mins)))
+        return self
+
+    @property
+    def episode_count(self):
+        return sum(len(episodes) for episodes in self.seasons.values())
+
+    def build(self):
+        series = Series(title=self.title, genre=self.genre, description=self.description, user_id=self.user_id)
+        for season_number in sorted(self.seasons):
+            season = Season(season_number=season_number)
+            season.episodes = [
+                Episode(episode_number=number, title=title, duration_mins=duration)
+                for number, title, duration in self.seasons[season_number]
+            ]
+            series.seasons.append(season)
+        return series
+
+    def save(self, session):
+        # One flush and one commit for the whole tree; the ORM batches the
+        # season and episode INSERTs, and nothing is written if any fail.
+        series = self.build()
+        session.add(series)
+        try:
+            session.commit()
+        except Exception:
+            session.rollback()
+            raise
+        return series
+
+    @classmethod
+    def from_dict(cls, spec, user_id=None):
+        # {"title", "genre", "description", "seasons": [{"season_number",
+        #  "episodes": [{"title", "duration_mins", "episode_number"?}]}]}
+        builder = cls(*_fields(spec, "The spec", "title", "genre", "description"), user_id=user_id)
+        for position, season in enumerate(_items(spec, "seasons", "The spec"), start=1):
+            season_number = _number(_fields(season, f"Season {position}", "season_number")[0],
+                                    f"Season {position} season_number")
+            if season_number is None:
+                season_number = position
+            builder.add_season(season_number)
+            for index, episode in enumerate(_items(season, "episodes", f"Season {season_number}"), start=1):
+                where = f"Season {season_number} episode {index}"
+                title, duration_mins, episode_number = _fields(episode, where, "title", "duration_mins", "episode_number")
+                builder.add_episode(season_number, title, _number(duration_mins, f"{where} duration_mins"),
+                                    _number(episode_number, f"{where} episode_number"))
+        return builder
+
+    @classmethod
+    def from_csv(cls, path, user_id=None):
+        # One row per episode: title, genre, description, season_number,
+        # episode_number, episode_title, duration_mins. Series fields come
+        # from the first row.
+        builder = None
+        with open(path, newline="", encoding="utf-8") as handle:
+            for row in csv.DictReader(handle):
+                if builder is None:
+                    builder = cls(row.get("title"), row.get("genre"), row.get("description"), user_id=user_id)
+                season_number = int(row["season_number"])
+                if row.get("episode_title") or row.get("episode_number"):
+                    episode_number = int(row["episode_number"]) if row.get("episode_number") else None
+                    builder.add_episode(season_number, row.get("episode_title"), row.get("duration_mins"), episode_number)
+                else:
+                    builder.add_season(season_number)
+        if builder is None:
+            raise ValueError(f"{path} has no rows.")
+        return builder
+
+    @classmethod
+    def from_file(cls, path, user_id=None):
+        if path.lower().endswith(".csv"):
+            return cls.from_csv(path, user_id=user_id)
+        with open(path, encoding="utf-8") as handle:
+            return cls.from_dict(json.load(handle), user_id=user_id)
+
+
+# Spec validation for from_dict: a malformed file is a ValueError, like a
+# missing title, rather than an AttributeError from deep inside the loop.
+def _fields(value, where, *names):
+    if not isinstance(value, dict):
+        raise ValueError(f"{where} must be a JSON object.")
+    return [value.get(name) for name in names]
+
+
+def _items(value, name, where):
+    items = value.get(name)
+    if items is None:
+        return []
+    if not isinstance(items, list):
+        raise ValueError(f"{where}: '{name}' must be a list.")
+    return items
+
+
+def _number(value, where):
+    if value in (None, ""):
+        return None
+    if isinstance(value, bool) or not isinstance(value, (int, str)):
+        raise ValueError(f"{where} must be a number.")
+    try:
+        return int(value)
+    except ValueError:
+        raise ValueError(f"{where} must be a number.")
@@ -0,0 +1,234 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from sqlalchemy import event, select
+from sqlalchemy.orm import Session
+from lib.models import Series, Season, Episode, Review, SeriesStats
+
+# Read-through caches for catalog lookups. Values are plain result rows, never
+# ORM instances, so they are safe to share between sessions and threads.
+# Series/Season/Episode mapper events drop affected entries, and drop them
+# again once the transaction commits; the TTL bounds how stale anything
+# written outside the ORM can get.
+DEFAULT_SIZE = int(os.environ.get("TV_TRACKER_CACHE_SIZE", 10_000))
+DEFAULT_TTL = float(os.environ.get("TV_TRACKER_CACHE_TTL", 300))
+
+_MISSING = object()
+
+
+class LRUCache:
+
+    def __init__(self, name, maxsize=DEFAULT_SIZE, ttl=DEFAULT_TTL):
+        self.name = name
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._entries.get(key, _MISSING)
+            if entry is not _MISSING and entry[1] > time.monotonic():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+            if entry is not _MISSING:
+                del self._entries[key]
+            self.misses += 1
+            return default
+
+    def put(self, key, value):
+        with self._lock:
+            self._entries[key] = (value, time.monotonic() + self.ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def get_or_load(self, key, loader):
+        value = self.get(key, _MISSING)
+        if value is _MISSING:
+            value = loader()
+            if value is not None:
+                self.put(key, value)
+        return value
+
+    def invalidate(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries), "maxsize": self.maxsize, "ttl": self.ttl,
+            "hits": self.hits, "misses": self.misses, "evictions": self.evictions,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+
+series_cache = LRUCache("series")
+season_cache = LRUCache("seasons")
+episode_cache = LRUCache("episodes")
+page_cache = LRUCache("series_pages", maxsize=1_000)
+# Rendered catalog responses for lib/api.py; dropped wholesale on any catalog
+# or rating change.
+response_cache = LRUCache("api_responses", maxsize=1_000)
+# lib/leaderboards.py rankings; dropped wholesale on any aggregate change.
+leaderboard_cache = LRUCache("leaderboards", maxsize=1_000)
+
+CACHES = (series_cache, season_cache, episode_cache, page_cache, response_cache, leaderboard_cache)
+
+
+def cache_stats():
+    return {cache.name: cache.stats() for cache in CACHES}
+
+
+def clear_all():
+    # For writes that bypass the ORM (bulk import, bulk delete).
+    for cache in CACHES:
+        cache.clear()
+
+
+def get_series(session, series_id):
+    # (id, title, genre, description, user_id) or None.
+    return series_cache.get_or_load(series_id, lambda: session.execute(
+        select(Series.id, Series.title, Series.genre, Series.description, Series.user_id)
+        .where(Series.id == series_id)
+    ).first())
+
+
+def get_season(session, season_id):
+    # (id, season_number, series_id) or None.
+    return season_cache.get_or_load(season_id, lambda: session.execute(
+        select(Season.id, Season.season_number, Season.series_id).where(Season.id == season_id)
+    ).first())
+
+
+def get_episode(session, episode_id):
+    # (id, title, episode_number, duration_mins, season_id) or None.
+    return episode_cache.get_or_load(episode_id, lambda: session.execute(
+        select(Episode.id, Episode.title, Episode.episode_number, Episode.duration_mins, Episode.season_id)
+        .where(Episode.id == episode_id)
+    ).first())
+
+
+def list_page(session, after_id=None, before_id=None, limit=20, genre=None, title=None):
+    key = (after_id, before_id, limit, genre, title)
+    return page_cache.get_or_load(key, lambda: Series.list_page(
+        session, after_id=after_id, before_id=before_id, limit=limit, genre=genre, title=title
+    ))
+
+
+# Invalidations made inside a transaction, repeated when it commits: between
+# the flush and the commit another thread still reads the old rows and can
+# cache them again. Kept per thread, because the aggregate listeners get no
+# session, and a transaction's flush, listeners and commit all run on the
+# thread that owns its session.
+_pending = threading.local()
+
+
+def _drop(cache, key):
+    # key None clears the whole cache.
+    if key is None:
+        cache.clear()
+    else:
+        cache.invalidate(key)
+
+
+def forget(cache, key=None):
+    _drop(cache, key)
+    if not hasattr(_pending, "entries"):
+        _pending.entries = set()
+    _pending.entries.add((cache, key))
+
+
+@event.listens_for(Session, "after_commit")
+def forget_committed(session):
+    entries = getattr(_pending, "entries", None)
+    if entries:
+        _pending.entries = set()
+        for cache, key in entries:
+            _drop(cache, key)
+
+
+@event.listens_for(Session, "after_rollback")
+def forget_rolled_back(session):
+    # Nothing changed, so whatever was cached meanwhile is still right.
+    _pending.entries = set()
+
+
+@event.listens_for(Series, "after_insert")
+@event.listens_for(Series, "after_update")
+@event.listens_for(Series, "after_delete")
+def forget_series(mapper, connection, series):
+    forget(series_cache, series.id)
+    forget(page_cache)
+    forget(response_cache)
+
+
+@event.listens_for(Season, "after_insert")
+@event.listens_for(Season, "after_update")
+@event.listens_for(Season, "after_delete")
+def forget_season(mapper, connection, season):
+    forget(season_cache, season.id)
+    forget(response_cache)
+
+
+@event.listens_for(Episode, "after_insert")
+@event.listens_for(Episode, "after_update")
+@event.listens_for(Episode, "after_delete")
+def forget_episode(mapper, connection, episode):
+    forget(episode_cache, episode.id)
+    forget(response_cache)
+
+
+@event.listens_for(Series, "after_delete")
+@event.listens_for(Season, "after_delete")
+def forget_children(mapper, connection, parent):
+    # Seasons and episodes below it went by ON DELETE CASCADE, unseen by
+    # the events above.
+    if isinstance(parent, Series):
+        forget(season_cache)
+    forget(episode_cache)
+
+
+@event.listens_for(Review, "after_insert")
+@event.listens_for(Review, "after_update")
+@event.listens_for(Review, "after_delete")
+def forget_reviews(mapper, connection, review):
+    forget(response_cache)
+
+
+def forget_ratings(series_id=None):
+    # Series detail and review responses carry the aggregates, including
+    # for reviews and statuses removed by ON DELETE CASCADE (User.delete_many).
+    forget(response_cache)
+
+
+SeriesStats.listeners.append(forget_ratings)
+
+
+def forget_bulk(series_ids, deleted=True):
+    # A bulk series delete takes seasons and episodes along by IDs we never
+    # see, so everything goes.
+    if deleted:
+        for cache in CACHES:
+            forget(cache)
+        return
+    for series_id in series_ids:
+        forget(series_cache, series_id)
+    forget(response_cache)
+
+
+Series.listeners.append(forget_bulk)
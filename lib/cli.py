@@ -4,8 +4,10 @@ import time
 
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
-from lib.models import Series, Season, Episode, User, Review, Status
-from lib.db import session
+from lib.models import Series, Season, Episode, User, Review, Status, SeriesStats, EpisodeProgress, WatchStatus
+from lib.db import session_scope
+from lib import cache, instrument, leaderboards, recommend, search
+from lib.builder import SeriesBuilder
 from tabulate import tabulate
 from colorama import Fore, Style, init
 init(autoreset=True)
@@ -14,7 +16,7 @@ def greet():
     print(Fore.MAGENTA + Style.BRIGHT + "\n🎬 Welcome to the TV Series Tracker CLI!")
     print(Fore.CYAN + "Track what you watch. Share what you think.\n")
 
-def select_user():
+def select_user(session):
     while True:
         users = session.query(User).all()
         if users:
@@ -29,9 +31,7 @@ def select_user():
         if choice.lower() == 'new':
             username = input("Enter new username: ").strip()
             if username:
-                user = User(username=username)
-                session.add(user)
-                session.commit()
+                user = User.create(session, username)
                 print(f"✅ User '{username}' created.\n")
                 return user
             else:
@@ -44,26 +44,51 @@ def select_user():
             else:
                 print("❌ User not found. Try again.")
 
-def list_all_series():
-    series = session.query(Series).all()
-    if not series:
+PAGE_SIZE = 20
+# Series listed under "Most time left" on the dashboard.
+DASHBOARD_ROWS = 10
+
+def browse_series(session, prompt, genre=None, title=None):
+    # Page through the catalog; 'n'/'p' move between pages, anything else is
+    # handed back to the caller (a series ID, 'b', ...).
+    rows = cache.list_page(session, limit=PAGE_SIZE, genre=genre, title=title)
+    if not rows:
         print("No series available.")
-        return
-    data = [(s.id, s.title, s.genre) for s in series]
-    print(tabulate(data, headers=["ID", "Title", "Genre"], tablefmt="fancy_grid"))
+        return 'b'
 
-def view_series_details(user):
     while True:
-        series_list = session.query(Series).all()
-        if not series_list:
-            print("No series to view.")
-            return
-        list_all_series()
-        selection = input("Enter series ID to view details or 'b' to go back: ").strip()
+        print(tabulate(rows, headers=["ID", "Title", "Genre"], tablefmt="fancy_grid"))
+        choice = input(f"('n' next page, 'p' previous page) {prompt}").strip()
+
+        if choice.lower() == 'n':
+            page = cache.list_page(session, after_id=rows[-1].id, limit=PAGE_SIZE, genre=genre, title=title)
+            if page:
+                rows = page
+            else:
+                print("Already on the last page.")
+        elif choice.lower() == 'p':
+            page = cache.list_page(session, before_id=rows[0].id, limit=PAGE_SIZE, genre=genre, title=title)
+            if page:
+                rows = page
+            else:
+                print("Already on the first page.")
+        else:
+            return choice
+
+@instrument.track
+def list_all_series(session):
+    genre = input("Filter by genre (leave blank for all): ").strip() or None
+    title = input("Filter by title (leave blank for all): ").strip() or None
+    browse_series(session, "Press Enter to go back: ", genre=genre, title=title)
+
+@instrument.track
+def view_series_details(session, user):
+    while True:
+        selection = browse_series(session, "Enter series ID to view details or 'b' to go back: ")
         if selection.lower() == 'b':
             return
         try:
-            selected = session.get(Series, int(selection))
+            selected = Series.load_detail(session, int(selection))
         except (ValueError, TypeError):
             selected = None
         if not selected:
@@ -81,6 +106,13 @@ def view_series_details(user):
         status = session.query(Status).filter_by(user_id=user.id, series_id=selected.id).first()
         if status:
             print(f"📌 Your status: {status.watch_status}")
+        watched, total, percent = EpisodeProgress.series_progress(session, user.id, selected.id)
+        if watched:
+            print(f"🎞️ Progress: {watched}/{total} episodes ({percent:.0f}%)")
+
+        stats = SeriesStats.for_series(session, selected.id)
+        if stats and stats.review_count:
+            print(f"⭐ Average rating: {stats.average:.1f}/10 from {stats.review_count} reviews")
 
         print("\n📝 Reviews:")
         for r in selected.reviews:
@@ -88,14 +120,14 @@ def view_series_details(user):
             print(f"{r.user.username}: {stars} ({r.rating}/10) – {r.content}")
         break
 
-def add_review(user):
+@instrument.track
+def add_review(session, user):
     while True:
-        list_all_series()
-        selection = input("Enter series ID to review or 'b' to go back: ").strip()
+        selection = browse_series(session, "Enter series ID to review or 'b' to go back: ")
         if selection.lower() == 'b':
             return
         try:
-            selected = session.get(Series, int(selection))
+            selected = cache.get_series(session, int(selection))
         except (ValueError, TypeError):
             selected = None
         if not selected:
@@ -117,78 +149,84 @@ def add_review(user):
         if content.lower() == 'b':
             return
 
-        review = Review(user=user, series=selected, rating=rating, content=content)
+        review = Review(user_id=user.id, series_id=selected.id, rating=rating, content=content)
         session.add(review)
         session.commit()
         print("✅ Review added!")
         break
 
-def update_watch_status(user):
+@instrument.track
+def update_watch_status(session, user):
     while True:
-        list_all_series()
-        selection = input("Enter series ID to update status or 'b' to go back: ").strip()
+        selection = browse_series(session, "Enter series ID to update status or 'b' to go back: ")
         if selection.lower() == 'b':
             return
         try:
-            selected = session.get(Series, int(selection))
+            selected = cache.get_series(session, int(selection))
         except (ValueError, TypeError):
             selected = None
         if not selected:
             print("Invalid selection.")
             continue
 
-        new_status = input("Enter new status (Watching / Completed / Dropped / Plan to Watch) or 'b' to cancel: ").strip()
-        if new_status.lower() == 'b':
-            return
-
-        status = session.query(Status).filter_by(user_id=user.id, series_id=selected.id).first()
-        if status:
-            status.watch_status = new_status.title()
-        else:
-            status = Status(user=user, series=selected, watch_status=new_status.title())
-            session.add(status)
-
-        session.commit()
+        labels = " / ".join(status.label for status in WatchStatus)
+        while True:
+            new_status = input(f"Enter new status ({labels}) or 'b' to cancel: ").strip()
+            if new_status.lower() == 'b':
+                return
+            try:
+                new_status = WatchStatus.parse(new_status)
+                break
+            except ValueError:
+                print(f"❌ Unknown status. Choose one of: {labels}.")
+
+        Status.upsert(session, user.id, selected.id, new_status)
         print("✅ Status updated!")
         break
 
-def create_series(user):
-    title = input("Enter series title: ").strip()
-    genre = input("Enter genre: ").strip()
-    description = input("Enter description: ").strip()
+@instrument.track
+def create_series(session, user):
+    # Everything is collected first and saved in one transaction, so an
+    # aborted entry leaves nothing half-written behind.
+    spec_path = input("Path to a JSON/CSV series spec (leave blank to enter it by hand): ").strip()
+    if spec_path:
+        try:
+            builder = SeriesBuilder.from_file(spec_path, user_id=user.id)
+        except (OSError, ValueError, KeyError) as e:
+            print(f"❌ Could not read spec: {e}")
+            return
+    else:
+        title = input("Enter series title: ").strip()
+        genre = input("Enter genre: ").strip()
+        description = input("Enter description: ").strip()
 
-    if not title or not genre:
-        print("❌ Title and Genre are required.")
-        return
+        if not title or not genre:
+            print("❌ Title and Genre are required.")
+            return
 
-    new_series = Series(title=title, genre=genre, description=description, user=user)
-    session.add(new_series)
-    session.commit()
-    print(f"✅ '{title}' added.")
+        builder = SeriesBuilder(title, genre, description, user_id=user.id)
+        try:
+            num_seasons = int(input("How many seasons does this series have? "))
+            for s_num in range(1, num_seasons + 1):
+                builder.add_season(s_num)
+                num_episodes = int(input(f"  How many episodes in Season {s_num}? "))
+                for e_num in range(1, num_episodes + 1):
+                    ep_title = input(f"    Title for Episode {e_num}: ").strip()
+                    ep_duration = input(f"    Duration in minutes for Episode {e_num}: ").strip()
+                    try:
+                        ep_duration = int(ep_duration)
+                    except ValueError:
+                        ep_duration = 30
+                    builder.add_episode(s_num, ep_title, ep_duration, episode_number=e_num)
+        except ValueError:
+            print("❌ Invalid input. Series not saved.")
+            return
 
-    try:
-        num_seasons = int(input("How many seasons does this series have? "))
-        for s_num in range(1, num_seasons + 1):
-            season = Season(series=new_series, season_number=s_num)
-            session.add(season)
-            session.commit()
-
-            num_episodes = int(input(f"  How many episodes in Season {s_num}? "))
-            for e_num in range(1, num_episodes + 1):
-                ep_title = input(f"    Title for Episode {e_num}: ").strip()
-                ep_duration = input(f"    Duration in minutes for Episode {e_num}: ").strip()
-                try:
-                    ep_duration = int(ep_duration)
-                except ValueError:
-                    ep_duration = 30
-                episode = Episode(season=season, episode_number=e_num, title=ep_title, duration_mins=ep_duration)
-                session.add(episode)
-        session.commit()
-        print("✅ Seasons and episodes added.")
-    except ValueError:
-        print("Invalid input. Skipping season/episode creation.")
+    builder.save(session)
+    print(f"✅ '{builder.title}' added with {len(builder.seasons)} seasons and {builder.episode_count} episodes.")
 
-def add_season_to_series(user):
+@instrument.track
+def add_season_to_series(session, user):
     user_series = session.query(Series).filter_by(user_id=user.id).all()
     if not user_series:
         print("❌ You haven't created any series.")
@@ -201,7 +239,7 @@ def add_season_to_series(user):
     if selection.lower() == 'b':
         return
     try:
-        selected = session.get(Series, int(selection))
+        selected = cache.get_series(session, int(selection))
     except:
         selected = None
 
@@ -211,14 +249,15 @@ def add_season_to_series(user):
 
     try:
         season_number = int(input("Enter the new season number: "))
-        season = Season(series=selected, season_number=season_number)
+        season = Season(series_id=selected.id, season_number=season_number)
         session.add(season)
         session.commit()
         print(f"✅ Season {season_number} added to '{selected.title}'")
     except ValueError:
         print("❌ Invalid season number.")
 
-def add_episode_to_season(user):
+@instrument.track
+def add_episode_to_season(session, user):
     user_series = session.query(Series).filter_by(user_id=user.id).all()
     if not user_series:
         print("❌ You haven't created any series.")
@@ -275,28 +314,25 @@ def add_episode_to_season(user):
     print(f"✅ Episode '{ep_title}' added to Season {selected_season.season_number}")
 
 
-def add_series_to_watchlist(user):
+@instrument.track
+def add_series_to_watchlist(session, user):
     print("\nAvailable Series:")
-    all_series = session.query(Series).all()
-    for series in all_series:
-        print(f"{series.id}. {series.title}")
+    selection = browse_series(session, "Enter the ID of the series to add to your watchlist or 'b' to go back: ")
+    if selection.lower() == 'b':
+        return
 
     try:
-        series_id = int(input("Enter the ID of the series to add to your watchlist: "))
-        selected_series = session.query(Series).filter_by(id=series_id).first()
+        series_id = int(selection)
+        selected_series = cache.get_series(session, series_id)
 
         if not selected_series:
             print("❌ Series not found.")
             return
 
-        existing = session.query(Status).filter_by(user_id=user.id, series_id=selected_series.id).first()
-        if existing:
+        if not Status.add_to_watchlist(session, user.id, selected_series.id):
             print("⚠️ This series is already in your watchlist.")
             return
 
-        new_status = Status(user_id=user.id, series_id=selected_series.id, watch_status="Plan to Watch")
-        session.add(new_status)
-        session.commit()
         print(f"✅ '{selected_series.title}' has been added to your watchlist!")
 
     except ValueError:
@@ -305,45 +341,39 @@ def add_series_to_watchlist(user):
         session.rollback()
         print(f"❌ An error occurred: {e}")
 
-def view_watchlist(user):
-    statuses = session.query(Status).filter_by(user_id=user.id).all()
-    if not statuses:
+@instrument.track
+def view_watchlist(session, user):
+    rows = Status.watchlist(session, user.id)
+    if not rows:
         print("\n📭 Your watchlist is empty.")
         return
 
-    data = [(s.series.id, s.series.title, s.watch_status) for s in statuses]
     print("\n👓 Your Watchlist:")
-    print(tabulate(data, headers=["Series ID", "Title", "Watch Status"], tablefmt="fancy_grid"))
-
-def remove_series_from_watchlist(user):
-    statuses = (
-        session.query(Status)
-        .join(Series)
-        .filter(Status.user_id == user.id)
-        .all()
-    )
+    rows = [(series_id, title, watch_status.label) for series_id, title, watch_status in rows]
+    print(tabulate(rows, headers=["Series ID", "Title", "Watch Status"], tablefmt="fancy_grid"))
 
-    if not statuses:
+@instrument.track
+def remove_series_from_watchlist(session, user):
+    rows = Status.watchlist(session, user.id)
+    if not rows:
         print("\n📭 Your watchlist is empty.")
         return
 
     print("\n👓 Your Watchlist:")
-    for status in statuses:
-        print(f"{status.series.id}. {status.series.title} - {status.watch_status}")
+    titles = {}
+    for series_id, title, watch_status in rows:
+        titles[series_id] = title
+        print(f"{series_id}. {title} - {watch_status}")
 
     try:
         series_id = int(input("Enter the Series ID to remove from your watchlist: "))
-        status = session.query(Status).filter_by(user_id=user.id, series_id=series_id).first()
-
-        if not status:
+        if not Status.remove_from_watchlist(session, user.id, series_id):
             print("❌ This series is not in your watchlist.")
             return
 
-        session.delete(status)
-        session.commit()
         print(Fore.RED + "🗑️ Deleting series...")
         time.sleep(1)
-        print(f"🗑️ '{status.series.title}' has been removed from your watchlist.")
+        print(f"🗑️ '{titles[series_id]}' has been removed from your watchlist.")
 
     except ValueError:
         print("❌ Invalid input. Please enter a number.")
@@ -351,7 +381,8 @@ def remove_series_from_watchlist(user):
         session.rollback()
         print(f"❌ An error occurred: {e}")
 
-def delete_series(user):
+@instrument.track
+def delete_series(session, user):
     user_series = session.query(Series).filter_by(user_id=user.id).all()
     if not user_series:
         print(Fore.YELLOW + "⚠️ You haven't created any series to delete.")
@@ -375,15 +406,140 @@ def delete_series(user):
 
     confirm = input(f"⚠️ Are you sure you want to delete '{selected_series.title}' and all its data? (yes/no): ").strip().lower()
     if confirm == 'yes':
-        session.delete(selected_series)
-        session.commit()
+        title = selected_series.title
+        # One DELETE; seasons, episodes, reviews and statuses cascade in SQLite.
+        Series.delete(session, selected_series.id)
         print(Fore.RED + "🗑️ Deleting series...")
         time.sleep(1)
-        print(f"✅ '{selected_series.title}' has been permanently removed.\n")
+        print(f"✅ '{title}' has been permanently removed.\n")
 
     else:
         print("❌ Deletion cancelled.")
 
+@instrument.track
+def track_progress(session, user):
+    selection = browse_series(session, "Enter series ID to track progress or 'b' to go back: ")
+    if selection.lower() == 'b':
+        return
+    try:
+        series_id = int(selection)
+    except ValueError:
+        print("❌ Invalid selection.")
+        return
+
+    seasons = EpisodeProgress.season_overview(session, user.id, series_id)
+    if not seasons:
+        print("⚠️ This series has no seasons yet.")
+        return
+
+    rows = [(number, f"{bin(bits & ((1 << count) - 1)).count('1')}/{count}") for _, number, count, bits in seasons]
+    print(tabulate(rows, headers=["Season", "Watched"], tablefmt="fancy_grid"))
+    next_episode = EpisodeProgress.next_unwatched(session, user.id, series_id)
+    if next_episode:
+        print(f"▶️ Up next: Season {next_episode[0]}, Episode {next_episode[1]}")
+    else:
+        print("🏁 You've watched every episode!")
+
+    season_input = input("Season number to update or 'b' to go back: ").strip()
+    if season_input.lower() == 'b':
+        return
+    episodes_input = input("Episodes watched (e.g. 3 or 1-5): ").strip()
+    try:
+        season_number = int(season_input)
+        first, _, last = episodes_input.partition("-")
+        first, last = int(first), int(last or first)
+        season_id, _, count, _ = next(row for row in seasons if row[1] == season_number)
+        if not 1 <= first <= last <= count:
+            raise ValueError
+    except (ValueError, StopIteration):
+        print("❌ Invalid season or episode range.")
+        return
+
+    EpisodeProgress.mark_watched(session, user.id, season_id, first, last)
+    watched, total, percent = EpisodeProgress.series_progress(session, user.id, series_id)
+    print(f"✅ Progress saved: {watched}/{total} episodes ({percent:.0f}%)")
+
+@instrument.track
+def search_series(session):
+    query = input("Search titles, genres and descriptions: ").strip()
+    rows = search.search(session, query)
+    if not rows:
+        print("No matching series.")
+        return
+    print(tabulate(rows, headers=["ID", "Title", "Genre"], tablefmt="fancy_grid"))
+
+@instrument.track
+def show_recommendations(session, user):
+    rows = recommend.recommend(session, user.id)
+    if rows:
+        print(Fore.LIGHTGREEN_EX + "✨ Recommended for you, based on what you watch and rate:")
+        rows = [(i, t, g, f"{score:.2f}") for i, t, g, score in rows]
+        print(tabulate(rows, headers=["Series ID", "Title", "Genre", "Match"], tablefmt="fancy_grid"))
+        return
+    # New users (or a neighbour table that has not been built yet).
+    rows = [(i, t, g, f"{avg:.1f}") for i, t, g, avg in leaderboards.top_rated(session)]
+    if not rows:
+        print("Nothing to recommend yet.")
+        return
+    print("Not enough activity to personalise yet; here are the top rated series:")
+    print(tabulate(rows, headers=["Series ID", "Title", "Genre", "Avg Rating"], tablefmt="fancy_grid"))
+
+@instrument.track
+def show_leaderboards(session):
+    print(Fore.CYAN + "1. ⭐ Top rated series")
+    print(Fore.CYAN + "2. 👓 Most watchlisted")
+    print(Fore.CYAN + "3. 🏁 Most completed")
+    print(Fore.CYAN + "4. 🔥 Trending by genre")
+    choice = input("Select a leaderboard or 'b' to go back: ").strip()
+
+    if choice == "1":
+        rows = [(i, t, g, f"{avg:.1f}") for i, t, g, avg in leaderboards.top_rated(session)]
+        headers = ["Series ID", "Title", "Genre", "Avg Rating"]
+    elif choice == "2":
+        rows = leaderboards.most_watchlisted(session)
+        headers = ["Series ID", "Title", "Genre", "Watchlisted By"]
+    elif choice == "3":
+        rows = leaderboards.most_completed(session)
+        headers = ["Series ID", "Title", "Genre", "Completed By"]
+    elif choice == "4":
+        print("Genres: " + ", ".join(g.title() for g in leaderboards.genres(session)))
+        genre = input("Enter a genre: ").strip()
+        rows = leaderboards.trending_by_genre(session, genre)
+        headers = ["Series ID", "Title", "Genre", "Watching Now"]
+    else:
+        return
+
+    if not rows:
+        print("Nothing to show yet.")
+        return
+    print(tabulate(rows, headers=headers, tablefmt="fancy_grid"))
+
+def hours(minutes):
+    return f"{minutes / 60:,.1f} h"
+
+@instrument.track
+def show_dashboard(session, user):
+    summary = User.dashboard(session, user.id)
+    if not summary.tracked:
+        print("\n📭 You're not tracking any series yet. Add some to your watchlist first.")
+        return
+
+    print(Fore.LIGHTGREEN_EX + f"\n📊 {user.username}'s dashboard")
+    counts = ", ".join(f"{getattr(summary, status.name.lower())} {status.label}" for status in WatchStatus)
+    print(f"Tracking {summary.tracked} series: {counts}")
+    print(f"Episodes watched: {summary.watched_episodes:,} of {summary.episodes:,}")
+    print(f"Time watched: {hours(summary.watched_mins)}, left to watch: {hours(summary.remaining_mins)}")
+    if summary.reviews:
+        print(f"Reviews written: {summary.reviews}, average rating given: {summary.rating_average:.1f}/10")
+
+    rows = [
+        (series_id, title, watch_status.label, f"{watched}/{episodes}", hours(watched_mins), hours(remaining_mins))
+        for series_id, title, watch_status, episodes, _, watched, watched_mins, remaining_mins
+        in User.watch_time(session, user.id, limit=DASHBOARD_ROWS)
+    ]
+    print("\nMost time left:")
+    print(tabulate(rows, headers=["Series ID", "Title", "Status", "Episodes", "Watched", "Left"], tablefmt="fancy_grid"))
+
 def run_cli(user):
     while True:
         print(Fore.LIGHTGREEN_EX + f"\nWhat would you like to do, {user.username}?")
@@ -398,39 +554,57 @@ def run_cli(user):
         print(Fore.CYAN + "9.🎥➕ Add series to watchlist")
         print(Fore.CYAN + "10.🏌🏾 Remove series from watchlist")
         print(Fore.CYAN + "11.🗑️📦 Delete a series you created")
-        print(Fore.CYAN + "12.🚪 Exit")
+        print(Fore.CYAN + "12.🏆 Leaderboards")
+        print(Fore.CYAN + "13.🔎 Search series")
+        print(Fore.CYAN + "14.🎞️ Track episode progress")
+        print(Fore.CYAN + "15.✨ Recommended for you")
+        print(Fore.CYAN + "16.📊 Your dashboard")
+        print(Fore.CYAN + "17.🚪 Exit")
 
         choice = input(Fore.LIGHTGREEN_EX + "Select an option: ").strip()
 
-        if choice == "1":
-            list_all_series()
-        elif choice == "2":
-            view_series_details(user)
-        elif choice == "3":
-            add_review(user)
-        elif choice == "4":
-            update_watch_status(user)
-        elif choice == "5":
-            create_series(user)
-        elif choice == "6":
-            add_season_to_series(user)
-        elif choice == "7":
-            add_episode_to_season(user)
-        elif choice == "8":
-            view_watchlist(user)
-        elif choice == "9":
-            add_series_to_watchlist(user)
-        elif choice == "10":
-            remove_series_from_watchlist(user)
-        elif choice == "11":
-            delete_series(user)
-        elif choice == "12":
-            print(Fore.BLUE + "👋 Goodbye!")
-            break
-        else:
-            print(Fore.RED + "Invalid choice. Please enter a number between 1-12.")
+        # Each menu action gets its own session, released when the action ends.
+        with session_scope() as session:
+            if choice == "1":
+                list_all_series(session)
+            elif choice == "2":
+                view_series_details(session, user)
+            elif choice == "3":
+                add_review(session, user)
+            elif choice == "4":
+                update_watch_status(session, user)
+            elif choice == "5":
+                create_series(session, user)
+            elif choice == "6":
+                add_season_to_series(session, user)
+            elif choice == "7":
+                add_episode_to_season(session, user)
+            elif choice == "8":
+                view_watchlist(session, user)
+            elif choice == "9":
+                add_series_to_watchlist(session, user)
+            elif choice == "10":
+                remove_series_from_watchlist(session, user)
+            elif choice == "11":
+                delete_series(session, user)
+            elif choice == "12":
+                show_leaderboards(session)
+            elif choice == "13":
+                search_series(session)
+            elif choice == "14":
+                track_progress(session, user)
+            elif choice == "15":
+                show_recommendations(session, user)
+            elif choice == "16":
+                show_dashboard(session, user)
+            elif choice == "17":
+                print(Fore.BLUE + "👋 Goodbye!")
+                break
+            else:
+                print(Fore.RED + "Invalid choice. Please enter a number between 1-17.")
 
 if __name__ == "__main__":
     greet()
-    user = select_user()
+    with session_scope() as session:
+        user = select_user(session)
     run_cli(user)
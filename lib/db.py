@@ -1,20 +1,116 @@
-from sqlalchemy import create_engine
+import os
+from contextlib import contextmanager
+from sqlalchemy import create_engine, event
 from sqlalchemy.orm import sessionmaker
-from models import Base
+from lib.models import Base
+from lib import instrument
 
-# Define database path (SQLite file in the root directory)
-DATABASE_URL = "sqlite:///tv_series.db"
+# Define database path (SQLite file in the root directory); override with
+# TV_TRACKER_DATABASE_URL.
+DEFAULT_DATABASE_URL = "sqlite:///tv_series.db"
 
-# Create engine and bind it to the Base
-engine = create_engine(DATABASE_URL)
-Base.metadata.bind = engine
+# Applied to every new SQLite connection. Each one can be overridden with
+# TV_TRACKER_PRAGMA_<NAME>, e.g. TV_TRACKER_PRAGMA_MMAP_SIZE=0.
+SQLITE_PRAGMAS = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+    "cache_size": "-64000",  # in KiB, so 64 MB
+    "mmap_size": "268435456",  # 256 MB
+    "temp_store": "MEMORY",
+    "foreign_keys": "ON",
+}
 
-# Create all tables
-Base.metadata.create_all(engine)
 
-# Create a session factory
-Session = sessionmaker(bind=engine)
-session = Session()
+def sqlite_pragmas():
+    return {
+        name: os.environ.get(f"TV_TRACKER_PRAGMA_{name.upper()}", value)
+        for name, value in SQLITE_PRAGMAS.items()
+    }
+
+
+def engine_options(url, echo=None):
+    # create_engine() keyword arguments shared by the sync and async engines.
+    if echo is None:
+        echo = os.environ.get("TV_TRACKER_ECHO") == "1"
+    options = {"echo": echo}
+    if ":memory:" not in url and not url.endswith("://"):
+        options.update(
+            pool_size=int(os.environ.get("TV_TRACKER_POOL_SIZE", 5)),
+            max_overflow=int(os.environ.get("TV_TRACKER_POOL_MAX_OVERFLOW", 10)),
+            pool_timeout=float(os.environ.get("TV_TRACKER_POOL_TIMEOUT", 30)),
+        )
+    return options
+
+
+def install_pragmas(engine, pragmas=None):
+    # `engine` is a sync Engine; for an AsyncEngine pass engine.sync_engine.
+    if engine.dialect.name != "sqlite":
+        return
+    pragmas = sqlite_pragmas() if pragmas is None else pragmas
+
+    @event.listens_for(engine, "connect")
+    def set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for name, value in pragmas.items():
+            cursor.execute(f"PRAGMA {name}={value}")
+        cursor.close()
+
+
+def make_engine(url=None, echo=None, pragmas=None):
+    url = url or os.environ.get("TV_TRACKER_DATABASE_URL", DEFAULT_DATABASE_URL)
+    engine = create_engine(url, **engine_options(url, echo))
+    install_pragmas(engine, pragmas)
+    instrument.install(engine)
+    return engine
+
+
+# Nothing touches the database at import time: the engine is created on first
+# use and the schema only by init_db() (python lib/manage.py init-db).
+_engine = None
+
+# Session factory, bound to the engine by get_engine(). expire_on_commit is off
+# so objects handed back from a finished session_scope() stay readable.
+Session = sessionmaker(expire_on_commit=False)
+
+
+def get_engine():
+    global _engine
+    if _engine is None:
+        _engine = make_engine()
+        Session.configure(bind=_engine)
+    return _engine
+
+
+def __getattr__(name):
+    # `from lib.db import engine` keeps working, lazily.
+    if name == "engine":
+        return get_engine()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+@contextmanager
+def session_scope():
+    # One session per operation: committed on success, rolled back on error
+    # and always closed, so its identity map is released afterwards.
+    get_engine()
+    session = Session()
+    try:
+        yield session
+        session.commit()
+    except Exception:
+        session.rollback()
+        raise
+    finally:
+        session.close()
+
+
+def init_db(engine=None):
+    from lib import search
+
+    engine = engine or get_engine()
+    Base.metadata.create_all(engine)
+    search.install(engine)
+
 
 # Export for use in seed and cli
-__all__ = ["engine", "Session", "session"]
+__all__ = ["Base", "Session", "engine_options", "get_engine", "init_db", "install_pragmas", "make_engine", "session_scope"]
@@ -0,0 +1,140 @@
+import csv
+import json
+import os
+import time
+from sqlalchemy import select
+from lib.models import User, Series, Season, Episode, Review, Status
+from lib.importer import open_text
+
+# Writes the same records lib/importer.py reads, so an export can be loaded
+# straight back in. Rows are streamed from the database `batch_size` at a
+# time and encoded one by one; nothing holds more than a batch in memory.
+CSV_FIELDS = [
+    "type", "key", "username", "title", "genre", "description", "creator", "series",
+    "season_number", "episode_number", "duration_mins", "rating", "content", "watch_status",
+]
+
+
+def series_reference(external_key, title):
+    # How the importer finds a series again: its external key where it has
+    # one, otherwise its title. Only keys that exist are written, so a file
+    # re-imported into its own database matches every series it came from.
+    return external_key or title
+
+
+def catalog_records(conn, batch_size):
+    def stream(query):
+        return conn.execution_options(stream_results=True, yield_per=batch_size).execute(query)
+
+    for (username,) in stream(select(User.username).order_by(User.id)):
+        yield {"type": "user", "username": username}
+
+    creators = select(
+        Series.external_key, Series.title, Series.genre, Series.description, User.username
+    ).outerjoin(User, User.id == Series.user_id).order_by(Series.id)
+    for external_key, title, genre, description, creator in stream(creators):
+        yield {"type": "series", "key": external_key, "title": title, "genre": genre,
+               "description": description, "creator": creator}
+
+    seasons = select(Series.external_key, Series.title, Season.season_number).join(
+        Season, Season.series_id == Series.id).order_by(Season.id)
+    for external_key, series_title, season_number in stream(seasons):
+        yield {"type": "season", "series": series_reference(external_key, series_title),
+               "season_number": season_number}
+
+    episodes = (
+        select(Series.external_key, Series.title, Season.season_number, Episode.episode_number,
+               Episode.title, Episode.duration_mins)
+        .join(Season, Season.id == Episode.season_id)
+        .join(Series, Series.id == Season.series_id)
+        .order_by(Episode.id)
+    )
+    for external_key, series_title, season_number, episode_number, title, duration in stream(episodes):
+        yield {"type": "episode", "series": series_reference(external_key, series_title),
+               "season_number": season_number,
+               "episode_number": episode_number, "title": title, "duration_mins": duration}
+
+    yield from user_activity_records(conn, batch_size)
+
+
+def user_activity_records(conn, batch_size, user_id=None):
+    def stream(query):
+        if user_id is not None:
+            query = query.where(User.id == user_id)
+        return conn.execution_options(stream_results=True, yield_per=batch_size).execute(query)
+
+    reviews = (
+        select(User.username, Series.external_key, Series.title, Review.rating, Review.content)
+        .join(User, User.id == Review.user_id)
+        .join(Series, Series.id == Review.series_id)
+        .order_by(Review.id)
+    )
+    for username, external_key, series_title, rating, content in stream(reviews):
+        yield {"type": "review", "username": username, "series": series_reference(external_key, series_title),
+               "rating": rating, "content": content}
+
+    statuses = (
+        select(User.username, Series.external_key, Series.title, Status.watch_status)
+        .join(User, User.id == Status.user_id)
+        .join(Series, Series.id == Status.series_id)
+        .order_by(Status.id)
+    )
+    for username, external_key, series_title, watch_status in stream(statuses):
+        yield {"type": "status", "username": username, "series": series_reference(external_key, series_title),
+               "watch_status": watch_status.label}
+
+
+def user_records(conn, batch_size, username):
+    # One user's reviews and watchlist, plus the series they point at so the
+    # file imports cleanly into a database that lacks them.
+    user_id = conn.execute(select(User.id).where(User.username == username)).scalar()
+    if user_id is None:
+        raise ValueError(f"User '{username}' not found.")
+    yield {"type": "user", "username": username}
+
+    touched = select(Status.series_id).where(Status.user_id == user_id).union(
+        select(Review.series_id).where(Review.user_id == user_id)
+    ).subquery()
+    series = (
+        select(Series.external_key, Series.title, Series.genre, Series.description)
+        .where(Series.id.in_(select(touched.c.series_id)))
+        .order_by(Series.id)
+    )
+    for external_key, title, genre, description in conn.execution_options(
+            stream_results=True, yield_per=batch_size).execute(series):
+        yield {"type": "series", "key": external_key, "title": title, "genre": genre,
+               "description": description}
+
+    yield from user_activity_records(conn, batch_size, user_id=user_id)
+
+
+def write_records(records, path):
+    # Format follows the file name: .csv or anything else as JSON Lines, plus
+    # gzip when it ends in .gz.
+    count = 0
+    with open_text(path, "wt") as handle:
+        if ".csv" in os.path.basename(path):
+            writer = csv.DictWriter(handle, fieldnames=CSV_FIELDS, extrasaction="ignore")
+            writer.writeheader()
+            for record in records:
+                writer.writerow(record)
+                count += 1
+        else:
+            for record in records:
+                handle.write(json.dumps({k: v for k, v in record.items() if v is not None}, ensure_ascii=False))
+                handle.write("\n")
+                count += 1
+    return count
+
+
+def export_catalog(engine, path, username=None, batch_size=5_000, report=print):
+    start = time.perf_counter()
+    with engine.connect() as conn:
+        if username:
+            records = user_records(conn, batch_size, username)
+        else:
+            records = catalog_records(conn, batch_size)
+        count = write_records(records, path)
+    elapsed = time.perf_counter() - start
+    report(f"Exported {count:,} records to {path} in {elapsed:.1f}s ({count / max(elapsed, 1e-9):,.0f} records/sec).")
+    return count
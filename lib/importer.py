@@ -0,0 +1,301 @@
+import csv
+import gzip
+import json
+import os
+import time
+from sqlalchemy import select, func, bindparam
+from sqlalchemy.dialects.sqlite import insert
+from sqlalchemy.orm import Session
+from lib.models import User, Series, Season, Episode, Review, Status, SeriesStats, Genre, WatchStatus
+from lib import cache, search
+
+# Catalog records, one per JSON line or CSV row, told apart by "type":
+#   user     username
+#   series   key?, title, genre, description, creator?   (creator = username)
+#   season   series, season_number                       (series = key or title)
+#   episode  series, season_number, episode_number, title, duration_mins
+#   review   username, series, rating, content
+#   status   username, series, watch_status              (label, e.g. "Plan to Watch")
+# Parents must appear before the records that refer to them.
+RECORD_TYPES = ("user", "series", "season", "episode", "review", "status")
+
+# Batches are written parents first so pre-assigned IDs always resolve.
+INSERT_ORDER = ("user", "series", "season", "episode", "review", "status")
+
+
+# Lookups run once per unseen reference, so they are built once up front.
+USER_LOOKUP = select(User.id).where(User.username == bindparam("username"))
+SERIES_LOOKUP = (
+    select(Series.id)
+    .where((Series.external_key == bindparam("reference")) | (Series.title == bindparam("reference")))
+    .limit(1)
+)
+SEASON_LOOKUP = (
+    select(Season.id)
+    .where(Season.series_id == bindparam("series_id"), Season.season_number == bindparam("season_number"))
+    .limit(1)
+)
+EPISODE_NUMBERS = select(Episode.episode_number).where(Episode.season_id == bindparam("season_id"))
+# IS rather than =, so reviews without a rating are matched too. Empty and
+# NULL text are the same review: the API stores "" and CSV reads it back as
+# NULL.
+REVIEW_EXISTS = select(Review.id).where(
+    Review.user_id == bindparam("user_id"), Review.series_id == bindparam("series_id"),
+    Review.rating.is_not_distinct_from(bindparam("rating")),
+    func.coalesce(Review.content, "") == func.coalesce(bindparam("content"), ""),
+).limit(1)
+
+
+def open_text(path, mode="rt"):
+    if path.endswith(".gz"):
+        return gzip.open(path, mode, encoding="utf-8", newline="")
+    return open(path, mode[0], encoding="utf-8", newline="")
+
+
+def read_records(path):
+    # Yields one dict per record without reading the whole file.
+    with open_text(path) as handle:
+        if ".csv" in os.path.basename(path):
+            for row in csv.DictReader(handle):
+                yield {field: value for field, value in row.items() if value != ""}
+        else:
+            for line in handle:
+                line = line.strip()
+                if line:
+                    yield json.loads(line)
+
+
+def as_int(value):
+    return None if value in (None, "") else int(value)
+
+
+class CatalogImporter:
+
+    def __init__(self, engine, batch_size=5_000):
+        self.engine = engine
+        self.batch_size = batch_size
+        self.pending = {kind: [] for kind in INSERT_ORDER}
+        self.buffered = 0
+        self.counts = {kind: 0 for kind in RECORD_TYPES}
+        self.skipped = 0
+        # External reference -> database ID. Misses fall back to a DB lookup,
+        # which is also how a resumed import finds what an earlier run wrote.
+        self.user_ids = {}
+        self.series_ids = {}
+        self.season_ids = {}
+        # Rows created by this run need no duplicate checks; for anything that
+        # was already in the database, episodes and reviews are deduped so a
+        # re-import or a resumed import does not repeat them.
+        self.new_series = set()
+        self.new_seasons = set()
+        self.existing_episodes = {}
+        # Series that gained episodes, whose totals are recounted at the end.
+        self.episode_series = set()
+        with Session(engine) as session:
+            self.next_id = {
+                "user": (session.scalar(select(func.max(User.id))) or 0) + 1,
+                "series": (session.scalar(select(func.max(Series.id))) or 0) + 1,
+                "season": (session.scalar(select(func.max(Season.id))) or 0) + 1,
+            }
+
+    def _assign(self, kind):
+        value = self.next_id[kind]
+        self.next_id[kind] += 1
+        return value
+
+    def _lookup(self, conn, cache, key, query, **params):
+        if key not in cache:
+            found = conn.execute(query, params).scalar()
+            if found is None:
+                return None
+            cache[key] = found
+        return cache[key]
+
+    def user_id(self, conn, username, create=True):
+        if not username:
+            return None
+        found = self._lookup(conn, self.user_ids, username, USER_LOOKUP, username=username)
+        if found is None and create:
+            found = self.user_ids[username] = self._assign("user")
+            self._queue("user", {"id": found, "username": username})
+        return found
+
+    def series_id(self, conn, reference):
+        if not reference:
+            return None
+        return self._lookup(conn, self.series_ids, reference, SERIES_LOOKUP, reference=reference)
+
+    def season_id(self, conn, series_id, season_number):
+        key = (series_id, season_number)
+        if series_id in self.new_series:
+            found = self.season_ids.get(key)
+        else:
+            found = self._lookup(conn, self.season_ids, key, SEASON_LOOKUP,
+                                 series_id=series_id, season_number=season_number)
+        if found is None:
+            found = self.season_ids[key] = self._assign("season")
+            self.new_seasons.add(found)
+            self._queue("season", {"id": found, "series_id": series_id, "season_number": season_number})
+        return found
+
+    def episode_exists(self, conn, season_id, episode_number):
+        if season_id in self.new_seasons:
+            return False
+        if season_id not in self.existing_episodes:
+            self.existing_episodes[season_id] = set(conn.execute(EPISODE_NUMBERS, {"season_id": season_id}).scalars())
+        return episode_number in self.existing_episodes[season_id]
+
+    def _queue(self, kind, row):
+        self.pending[kind].append(row)
+        self.counts[kind] += 1
+        self.buffered += 1
+
+    def add(self, conn, record):
+        kind = record.get("type")
+        if kind == "user":
+            self.user_id(conn, record.get("username"))
+        elif kind == "series":
+            reference = record.get("key") or record.get("title")
+            if not record.get("title") or self.series_id(conn, reference) is not None:
+                self.skipped += 1
+                return
+            series_id = self.series_ids[reference] = self._assign("series")
+            self.new_series.add(series_id)
+            self._queue("series", {
+                "id": series_id, "title": record["title"], "genre": record.get("genre"),
+                "description": record.get("description"), "external_key": record.get("key"),
+                "user_id": self.user_id(conn, record.get("creator")),
+            })
+        elif kind == "season":
+            series_id = self.series_id(conn, record.get("series"))
+            if series_id is None:
+                self.skipped += 1
+                return
+            self.season_id(conn, series_id, as_int(record.get("season_number")))
+        elif kind == "episode":
+            series_id = self.series_id(conn, record.get("series"))
+            if series_id is None:
+                self.skipped += 1
+                return
+            season_id = self.season_id(conn, series_id, as_int(record.get("season_number")))
+            episode_number = as_int(record.get("episode_number"))
+            if self.episode_exists(conn, season_id, episode_number):
+                self.skipped += 1
+                return
+            self.episode_series.add(series_id)
+            self._queue("episode", {
+                "season_id": season_id, "episode_number": episode_number, "title": record.get("title"),
+                "duration_mins": as_int(record.get("duration_mins")),
+            })
+        elif kind in ("review", "status"):
+            series_id = self.series_id(conn, record.get("series"))
+            user_id = self.user_id(conn, record.get("username"))
+            if series_id is None or user_id is None:
+                self.skipped += 1
+                return
+            if kind == "review":
+                row = {"user_id": user_id, "series_id": series_id,
+                       "rating": as_int(record.get("rating")), "content": record.get("content")}
+                if series_id not in self.new_series and conn.execute(REVIEW_EXISTS, row).first():
+                    self.skipped += 1
+                    return
+                self._queue("review", row)
+            else:
+                try:
+                    watch_status = WatchStatus.parse(record.get("watch_status"))
+                except ValueError:
+                    self.skipped += 1
+                    return
+                self._queue("status", {"user_id": user_id, "series_id": series_id, "watch_status": watch_status})
+        else:
+            self.skipped += 1
+
+    def flush(self, conn):
+        tables = {"user": User, "series": Series, "season": Season, "episode": Episode, "review": Review}
+        for kind in INSERT_ORDER:
+            rows = self.pending[kind]
+            if not rows:
+                continue
+            if kind == "status":
+                stmt = insert(Status.__table__)
+                stmt = stmt.on_conflict_do_update(
+                    index_elements=["user_id", "series_id"],
+                    set_={"watch_status": stmt.excluded.watch_status},
+                )
+                conn.execute(stmt, rows)
+            else:
+                conn.execute(tables[kind].__table__.insert(), rows)
+            if kind == "series":
+                Genre.tag(conn, [(row["id"], row["genre"]) for row in rows], replace=False)
+            self.pending[kind] = []
+        self.buffered = 0
+
+
+def checkpoint_path(path):
+    return f"{path}.checkpoint"
+
+
+def read_checkpoint(path):
+    try:
+        with open(checkpoint_path(path), encoding="utf-8") as handle:
+            return json.load(handle)["records"]
+    except (OSError, ValueError, KeyError):
+        return 0
+
+
+def write_checkpoint(path, records):
+    temporary = checkpoint_path(path) + ".tmp"
+    with open(temporary, "w", encoding="utf-8") as handle:
+        json.dump({"records": records}, handle)
+    os.replace(temporary, checkpoint_path(path))
+
+
+def import_catalog(engine, path, batch_size=5_000, resume=True, report=print):
+    # Streams `path` into the database in batches of `batch_size` records, one
+    # transaction per batch. After each batch the record count is saved next
+    # to the file, so an interrupted import picks up where it stopped.
+    importer = CatalogImporter(engine, batch_size=batch_size)
+    done = read_checkpoint(path) if resume else 0
+    if done:
+        report(f"Resuming after {done:,} records.")
+
+    start = time.perf_counter()
+    seen = 0
+    records = read_records(path)
+    conn = engine.connect()
+    try:
+        transaction = conn.begin()
+        for record in records:
+            seen += 1
+            if seen <= done:
+                continue
+            importer.add(conn, record)
+            if importer.buffered >= batch_size:
+                importer.flush(conn)
+                transaction.commit()
+                write_checkpoint(path, seen)
+                elapsed = time.perf_counter() - start
+                report(f"  {seen:,} records, {(seen - done) / elapsed:,.0f} records/sec")
+                transaction = conn.begin()
+        importer.flush(conn)
+        transaction.commit()
+    finally:
+        conn.close()
+
+    # Core inserts bypass the mapper events that maintain these.
+    if importer.episode_series:
+        with engine.begin() as conn:
+            Series.refresh_episode_totals(conn, importer.episode_series)
+    if importer.counts["review"] or importer.counts["status"]:
+        with Session(engine) as session:
+            SeriesStats.rebuild(session)
+    search.reset_fallback()
+    cache.clear_all()
+
+    if os.path.exists(checkpoint_path(path)):
+        os.remove(checkpoint_path(path))
+    elapsed = time.perf_counter() - start
+    imported = seen - done
+    report(f"Imported {imported:,} records in {elapsed:.1f}s ({imported / max(elapsed, 1e-9):,.0f} records/sec), "
+           f"skipped {importer.skipped:,}.")
+    return importer.counts
@@ -0,0 +1,221 @@
+import atexit
+import bisect
+import contextvars
+import functools
+import logging
+import os
+import re
+import signal
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from sqlalchemy import event
+
+# SQL instrumentation: per-statement latency histograms, query counts per
+# CLI/API action (a statement repeated many times within one action is
+# flagged as a likely N+1), and a log of statements slower than SLOW_MS.
+#
+# Off unless TV_TRACKER_PROFILE=1. Disabled, no engine listeners are
+# installed and @track returns the function untouched, so the cost is nil.
+# Enabled, a summary goes to stderr at exit, on SIGUSR1 where available, or
+# whenever summary() is called.
+ENABLED = os.environ.get("TV_TRACKER_PROFILE") == "1"
+SLOW_MS = float(os.environ.get("TV_TRACKER_SLOW_MS", 100))
+
+# A statement run more often than this within one action call is reported.
+REPEAT_THRESHOLD = 5
+
+# Histogram bucket upper bounds in milliseconds; the last bucket is open.
+BUCKETS_MS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500)
+
+log = logging.getLogger("tv_tracker.sql")
+
+# Reentrant: the SIGUSR1 handler takes it too, and may run on the main thread
+# while that thread is inside _after_cursor_execute holding it.
+_lock = threading.RLock()
+_statements = {}
+_actions = {}
+_repeats = {}
+_current = contextvars.ContextVar("tv_tracker_action", default=None)
+
+
+class StatementStats:
+
+    def __init__(self):
+        self.count = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.histogram = [0] * (len(BUCKETS_MS) + 1)
+
+    def add(self, elapsed_ms):
+        self.count += 1
+        self.total_ms += elapsed_ms
+        self.max_ms = max(self.max_ms, elapsed_ms)
+        self.histogram[bisect.bisect_left(BUCKETS_MS, elapsed_ms)] += 1
+
+    def percentile(self, fraction):
+        # Upper bound of the bucket holding the requested rank (the max for
+        # the open-ended last bucket).
+        rank = fraction * self.count
+        seen = 0
+        for bucket, hits in enumerate(self.histogram):
+            seen += hits
+            if hits and seen >= rank:
+                return BUCKETS_MS[bucket] if bucket < len(BUCKETS_MS) else self.max_ms
+        return self.max_ms
+
+
+class ActionStats:
+
+    def __init__(self):
+        self.calls = 0
+        self.queries = 0
+        self.total_ms = 0.0
+        self.max_queries = 0
+
+
+@functools.lru_cache(maxsize=4096)
+def normalize(statement):
+    # Expanded IN lists and multi-row VALUES differ only in their number of
+    # placeholders; fold them so they aggregate as one statement.
+    statement = " ".join(statement.split())
+    statement = re.sub(r"\?(?:, \?)+", "?, ...", statement)
+    return re.sub(r"\(\?(?:, \?)*\)(?:, \(\?(?:, \?)*\))+", "(...), ...", statement)
+
+
+class _Action:
+    __slots__ = ("name", "queries", "total_ms", "seen")
+
+    def __init__(self, name):
+        self.name = name
+        self.queries = 0
+        self.total_ms = 0.0
+        self.seen = {}
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed_ms = (time.perf_counter() - conn.info["query_start"].pop()) * 1000
+    key = normalize(statement)
+    with _lock:
+        stats = _statements.get(key)
+        if stats is None:
+            stats = _statements[key] = StatementStats()
+        stats.add(elapsed_ms)
+    current = _current.get()
+    if current is not None:
+        current.queries += 1
+        current.total_ms += elapsed_ms
+        current.seen[key] = current.seen.get(key, 0) + 1
+    if elapsed_ms >= SLOW_MS:
+        log.warning("slow query (%.1f ms): %s %.200r", elapsed_ms, key, parameters)
+
+
+def _handle_error(exception_context):
+    starts = exception_context.connection.info.get("query_start") if exception_context.connection else None
+    if starts:
+        starts.pop()
+
+
+def install(engine):
+    # `engine` is a sync Engine (pass AsyncEngine.sync_engine). No-op unless enabled.
+    if not ENABLED:
+        return engine
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+    event.listen(engine, "handle_error", _handle_error)
+    return engine
+
+
+@contextmanager
+def action(name):
+    # Attributes every statement run inside the block to `name`. Nested
+    # actions count towards the outermost one.
+    if not ENABLED or _current.get() is not None:
+        yield
+        return
+    current = _Action(name)
+    token = _current.set(current)
+    try:
+        yield
+    finally:
+        _current.reset(token)
+        with _lock:
+            stats = _actions.get(name)
+            if stats is None:
+                stats = _actions[name] = ActionStats()
+            stats.calls += 1
+            stats.queries += current.queries
+            stats.total_ms += current.total_ms
+            stats.max_queries = max(stats.max_queries, current.queries)
+            for key, count in current.seen.items():
+                if count > REPEAT_THRESHOLD and count > _repeats.get((name, key), 0):
+                    _repeats[(name, key)] = count
+
+
+def track(func):
+    # Decorator form of action(), named after the function.
+    if not ENABLED:
+        return func
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        with action(func.__name__):
+            return func(*args, **kwargs)
+    return wrapper
+
+
+def reset():
+    with _lock:
+        _statements.clear()
+        _actions.clear()
+        _repeats.clear()
+
+
+def summary(top=15):
+    with _lock:
+        statements = sorted(_statements.items(), key=lambda item: item[1].total_ms, reverse=True)
+        actions = sorted(_actions.items(), key=lambda item: item[1].queries, reverse=True)
+        repeats = sorted(_repeats.items(), key=lambda item: item[1], reverse=True)
+
+    count = sum(stats.count for _, stats in statements)
+    total_ms = sum(stats.total_ms for _, stats in statements)
+    lines = [f"SQL summary: {count:,} statements, {len(statements):,} distinct, {total_ms:,.1f} ms in total"]
+    if statements:
+        lines.append(f"{'count':>8}{'total ms':>11}{'mean ms':>9}{'p50':>8}{'p99':>8}{'max ms':>9}  statement")
+        for key, stats in statements[:top]:
+            lines.append(f"{stats.count:>8,}{stats.total_ms:>11.1f}{stats.total_ms / stats.count:>9.2f}"
+                         f"{stats.percentile(0.5):>8g}{stats.percentile(0.99):>8g}{stats.max_ms:>9.1f}  {key[:100]}")
+    if actions:
+        lines.append("")
+        lines.append(f"{'action':<32}{'calls':>7}{'queries':>9}{'per call':>10}{'max/call':>10}{'ms':>10}")
+        for name, stats in actions:
+            lines.append(f"{name:<32}{stats.calls:>7,}{stats.queries:>9,}{stats.queries / stats.calls:>10.1f}"
+                         f"{stats.max_queries:>10,}{stats.total_ms:>10.1f}")
+    if repeats:
+        lines.append("")
+        lines.append(f"Repeated within a single action call (more than {REPEAT_THRESHOLD}x; likely N+1):")
+        for (name, key), times in repeats[:top]:
+            lines.append(f"  {name}: {times}x {key[:100]}")
+
+    from lib import cache
+    lines.append("")
+    for name, stats in cache.cache_stats().items():
+        lines.append(f"cache {name:<14} size={stats['size']:<6} hits={stats['hits']:<8} misses={stats['misses']:<8} "
+                     f"hit rate={stats['hit_rate']:.1%}")
+    return "\n".join(lines)
+
+
+def print_summary(*_):
+    print(summary(), file=sys.stderr)
+
+
+if ENABLED:
+    logging.basicConfig()
+    atexit.register(print_summary)
+    if hasattr(signal, "SIGUSR1") and threading.current_thread() is threading.main_thread():
+        signal.signal(signal.SIGUSR1, print_summary)
@@ -0,0 +1,60 @@
+from sqlalchemy import select
+from lib.models import Series, SeriesStats, Genre
+from lib import cache
+
+# Leaderboards read the indexed counters on series_stats, so each one is a
+# short index walk rather than a sort over reviews/statuses. Results live in
+# cache.leaderboard_cache: dropped when SeriesStats reports a change and again
+# when that transaction commits, and expired after the cache TTL so writes
+# from other processes (the API server, an import) show up too.
+
+
+def invalidate(series_id=None):
+    cache.forget(cache.leaderboard_cache)
+
+
+SeriesStats.listeners.append(invalidate)
+
+
+def _cached(key, compute):
+    return cache.leaderboard_cache.get_or_load(key, compute)
+
+
+def _ranked(session, column, limit, *conditions):
+    query = (
+        select(Series.id, Series.title, Series.genre, column)
+        .join(SeriesStats, SeriesStats.series_id == Series.id)
+        .where(column > 0, *conditions)
+        .order_by(column.desc(), Series.id)
+        .limit(limit)
+    )
+    return [tuple(row) for row in session.execute(query)]
+
+
+def top_rated(session, limit=10, min_reviews=1):
+    return _cached(
+        ("top_rated", limit, min_reviews),
+        lambda: _ranked(session, SeriesStats.rating_average, limit, SeriesStats.review_count >= min_reviews),
+    )
+
+
+def most_watchlisted(session, limit=10):
+    return _cached(("most_watchlisted", limit), lambda: _ranked(session, SeriesStats.watchers_count, limit))
+
+
+def most_completed(session, limit=10):
+    return _cached(("most_completed", limit), lambda: _ranked(session, SeriesStats.completed_count, limit))
+
+
+def trending_by_genre(session, genre, limit=10):
+    # "Trending" is the number of users currently watching a series. The
+    # genre's series come from its series_genres range ("Sci-Fi/Thriller"
+    # counts for both genres).
+    return _cached(
+        ("trending", genre.strip().lower(), limit),
+        lambda: _ranked(session, SeriesStats.watching_count, limit, Series.id.in_(Genre.series_ids(genre))),
+    )
+
+
+def genres(session):
+    return Genre.names(session)
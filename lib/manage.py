@@ -0,0 +1,157 @@
+import sys
+import os
+import argparse
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from lib.db import get_engine, init_db, session_scope
+from lib.models import SeriesStats, User, Genre
+from lib.builder import SeriesBuilder
+from lib import api, migrate, recommend, reports, search
+from lib.importer import import_catalog
+from lib.exporter import export_catalog
+from lib.snapshot import CatalogSnapshot
+
+
+def cmd_init_db(args):
+    init_db()
+    print("✅ Database schema created.")
+
+
+def cmd_migrate(args):
+    migrate.upgrade(get_engine())
+    print("✅ Database schema is up to date.")
+
+
+def cmd_rebuild_stats(args):
+    with session_scope() as session:
+        SeriesStats.rebuild(session)
+    print("✅ Series rating and watch aggregates rebuilt.")
+
+
+def cmd_rebuild_genres(args):
+    with get_engine().begin() as conn:
+        Genre.rebuild(conn)
+    print("✅ Genre tags rebuilt.")
+
+
+def cmd_rebuild_search(args):
+    if search.install(get_engine(), rebuild=True):
+        print("✅ Search index rebuilt.")
+    else:
+        print("⚠️ SQLite was built without FTS5; searches use the in-memory index instead.")
+
+
+def cmd_rebuild_recommendations(args):
+    recommend.refresh_neighbors(get_engine(), series_ids=args.series or None, workers=args.workers)
+
+
+def cmd_create_series(args):
+    with session_scope() as session:
+        user_id = None
+        if args.user:
+            user = session.query(User).filter_by(username=args.user).first()
+            if user is None:
+                print(f"❌ User '{args.user}' not found.")
+                return
+            user_id = user.id
+        try:
+            builder = SeriesBuilder.from_file(args.spec, user_id=user_id)
+        except (OSError, ValueError, KeyError) as e:
+            print(f"❌ Could not read spec: {e}")
+            return
+        series = builder.save(session)
+        print(f"✅ Created '{series.title}' (ID {series.id}): {len(builder.seasons)} seasons, "
+              f"{builder.episode_count} episodes.")
+
+
+def cmd_import(args):
+    import_catalog(get_engine(), args.path, batch_size=args.batch_size, resume=not args.restart)
+
+
+def cmd_export(args):
+    try:
+        export_catalog(get_engine(), args.path, username=args.user, batch_size=args.batch_size)
+    except ValueError as e:
+        print(f"❌ {e}")
+
+
+def cmd_snapshot(args):
+    snapshot = CatalogSnapshot.build(get_engine())
+    snapshot.save(args.path)
+    print(f"✅ Wrote a snapshot of {len(snapshot):,} series to {args.path} ({os.path.getsize(args.path) / 1024:,.0f} KiB).")
+
+
+def cmd_reports(args):
+    try:
+        reports.write_reports(str(get_engine().url), args.directory, names=args.report, workers=args.workers,
+                              fmt=args.format)
+    except ValueError as e:
+        print(f"❌ {e}")
+
+
+def cmd_serve(args):
+    argv = ["--host", args.host, "--port", str(args.port)] + (["--quiet"] if args.quiet else [])
+    api.main(argv)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="TV Series Tracker maintenance commands")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    commands.add_parser("init-db", help="create any missing tables in the configured database")
+    commands.add_parser("migrate", help="add missing tables, indexes and constraints to an existing database")
+    commands.add_parser("rebuild-stats", aliases=["rebuild-ratings"],
+                        help="recompute the per-series rating and watch aggregates from reviews and statuses")
+    commands.add_parser("rebuild-genres", help="re-tag every series with the genres in its genre string")
+    commands.add_parser("rebuild-search", help="drop and rebuild the full-text search index")
+    recommendations = commands.add_parser("rebuild-recommendations",
+                                          help="recompute the similar-series table behind 'Recommended for you'")
+    recommendations.add_argument("--series", type=int, nargs="+",
+                                 help="only refresh these series (and the lists that mention them)")
+    recommendations.add_argument("--workers", type=int, help="worker processes (defaults to the CPU count)")
+    create_series = commands.add_parser("create-series", help="create a series with its seasons and episodes from a JSON/CSV spec")
+    create_series.add_argument("spec", help="path to a .json or .csv spec file")
+    create_series.add_argument("--user", help="username to record as the series creator")
+    importer = commands.add_parser("import", help="stream a JSON Lines or CSV catalog (optionally .gz) into the database")
+    importer.add_argument("path", help="catalog file: .jsonl, .csv, .jsonl.gz or .csv.gz")
+    importer.add_argument("--batch-size", type=int, default=5_000, help="records per transaction")
+    importer.add_argument("--restart", action="store_true", help="ignore any checkpoint and start from the top")
+    exporter = commands.add_parser("export", help="stream the catalog, or one user's data, to JSON Lines or CSV")
+    exporter.add_argument("path", help="output file: .jsonl or .csv, add .gz to compress")
+    exporter.add_argument("--user", help="only export this user's reviews and watchlist")
+    exporter.add_argument("--batch-size", type=int, default=5_000, help="rows fetched from the database at a time")
+    snapshot = commands.add_parser("snapshot", help="write a compact read-only catalog snapshot for analytics jobs")
+    snapshot.add_argument("path", help="output file, opened with lib.snapshot.CatalogSnapshot.open()")
+    nightly = commands.add_parser("reports", help="compute the nightly reports in parallel and write them to a directory")
+    nightly.add_argument("directory", help="output directory, one file per report")
+    nightly.add_argument("--report", nargs="+", choices=sorted(reports.REPORTS), help="only these reports")
+    nightly.add_argument("--workers", type=int, help="worker processes (defaults to the CPU count)")
+    nightly.add_argument("--format", choices=["csv", "json", "csv.gz", "json.gz"], default="csv")
+
+    serve = commands.add_parser("serve", help="run the HTTP/JSON API (see lib/api.py for the endpoints)")
+    serve.add_argument("--host", default="127.0.0.1")
+    serve.add_argument("--port", type=int, default=8000)
+    serve.add_argument("--quiet", action="store_true", help="do not log each request")
+
+    args = parser.parse_args(argv)
+    handlers = {
+        "init-db": cmd_init_db,
+        "migrate": cmd_migrate,
+        "rebuild-stats": cmd_rebuild_stats,
+        "rebuild-ratings": cmd_rebuild_stats,
+        "rebuild-genres": cmd_rebuild_genres,
+        "rebuild-search": cmd_rebuild_search,
+        "rebuild-recommendations": cmd_rebuild_recommendations,
+        "create-series": cmd_create_series,
+        "import": cmd_import,
+        "export": cmd_export,
+        "snapshot": cmd_snapshot,
+        "reports": cmd_reports,
+        "serve": cmd_serve,
+    }
+    handlers[args.command](args)
+
+
+if __name__ == "__main__":
+    main()
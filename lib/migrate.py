@@ -0,0 +1,190 @@
+from sqlalchemy import select, delete, update, func, inspect, text
+from sqlalchemy.schema import CreateTable
+from sqlalchemy.orm import Session
+from lib.models import Base, Series, Status, SeriesStats, Genre, WatchStatus, WATCH_STATUS_LABELS, series_genres
+from lib import search
+
+
+def dedupe_statuses(conn):
+    # Keep the newest status per (user, series) so the unique index can be built.
+    keep = select(func.max(Status.id)).group_by(Status.user_id, Status.series_id)
+    result = conn.execute(delete(Status.__table__).where(Status.id.not_in(keep)))
+    return result.rowcount
+
+
+def create_indexes(conn):
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(conn, checkfirst=True)
+
+
+def add_missing_columns(conn):
+    # SQLite can only ADD COLUMN; returns the names of the tables it widened.
+    inspector = inspect(conn)
+    widened = set()
+    for table in Base.metadata.sorted_tables:
+        existing = {column["name"] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name in existing:
+                continue
+            ddl = f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column.type.compile(conn.dialect)}"
+            if column.server_default is not None:
+                if not column.nullable:
+                    ddl += " NOT NULL"
+                ddl += f" DEFAULT '{column.server_default.arg}'"
+            conn.execute(text(ddl))
+            widened.add(table.name)
+    return widened
+
+
+def merge_legacy_watchlist(conn):
+    # The old `watchlist` association table duplicated what statuses record.
+    # Its rows become "Plan to Watch" statuses where the user has none, and
+    # the table goes.
+    if not inspect(conn).has_table("watchlist"):
+        return None
+    merged = conn.execute(text(
+        "INSERT INTO statuses (user_id, series_id, watch_status) "
+        f"SELECT user_id, series_id, {int(WatchStatus.PLAN_TO_WATCH)} FROM watchlist WHERE true "
+        "ON CONFLICT (user_id, series_id) DO NOTHING"
+    )).rowcount
+    conn.execute(text("DROP TABLE watchlist"))
+    return merged
+
+
+def watch_status_codes(column):
+    # Old text statuses ("Watching", "plan to watch ") to their WatchStatus
+    # codes; NULL for anything unrecognised.
+    normalized = f"lower(trim(replace({column}, '_', ' ')))"
+    cases = " ".join(f"WHEN '{label.lower()}' THEN {int(status)}" for status, label in WATCH_STATUS_LABELS.items())
+    known = f"typeof({column}) = 'integer' AND {column} BETWEEN {int(min(WatchStatus))} AND {int(max(WatchStatus))}"
+    return f"CASE WHEN {known} THEN {column} ELSE (CASE {normalized} {cases} END) END"
+
+
+# Columns whose stored representation changed, with the SQL that converts an
+# old value while the table is rebuilt. Rows converting to NULL are dropped.
+CONVERSIONS = {
+    ("statuses", "watch_status"): watch_status_codes,
+}
+
+
+def ondelete_actions(foreign_keys):
+    return {(tuple(columns), (action or "NO ACTION").upper()) for columns, action in foreign_keys}
+
+
+def stale_tables(engine):
+    # Tables whose foreign keys differ from the models' ON DELETE actions or
+    # whose column types differ from the models'.
+    inspector = inspect(engine)
+    dialect = engine.dialect
+    stale = []
+    for table in Base.metadata.sorted_tables:
+        existing = ondelete_actions((fk["constrained_columns"], fk["options"].get("ondelete"))
+                                    for fk in inspector.get_foreign_keys(table.name))
+        wanted = ondelete_actions(([fk.parent.name], fk.ondelete) for fk in table.foreign_keys)
+        types = {column["name"]: column["type"].compile(dialect) for column in inspector.get_columns(table.name)}
+        retyped = any(column.name in types and types[column.name] != column.type.compile(dialect)
+                      for column in table.columns)
+        if existing != wanted or retyped:
+            stale.append(table)
+    return stale
+
+
+def remove_orphans(conn, table):
+    # Rows pointing at parents that no longer exist get what ON DELETE would
+    # have done to them, so the rebuilt table passes foreign_key_check.
+    removed = 0
+    for fk in table.foreign_keys:
+        column, parent = fk.parent, fk.column
+        orphaned = column.is_not(None) & column.not_in(select(parent))
+        if (fk.ondelete or "").upper() == "SET NULL":
+            stmt = update(table).where(orphaned).values({column.name: None})
+        else:
+            stmt = delete(table).where(orphaned)
+        removed += conn.execute(stmt).rowcount
+    return removed
+
+
+def rebuild_tables(engine):
+    # SQLite cannot alter a constraint or a column type, so tables whose
+    # foreign keys lack the models' ON DELETE actions or whose columns changed
+    # type are rebuilt the documented way: foreign keys off, copy into a table
+    # created from the model (through CONVERSIONS where the values change),
+    # drop, rename, check. Indexes come back through create_indexes() and the
+    # search triggers through search.install(). Returns the names of the
+    # rebuilt tables.
+    tables = stale_tables(engine)
+    if not tables:
+        return []
+    with engine.connect() as conn:
+        conn.exec_driver_sql("PRAGMA foreign_keys=OFF")
+        conn.commit()
+        try:
+            with conn.begin():
+                # pysqlite only opens a transaction before DML; the DDL has to
+                # be inside it too.
+                conn.exec_driver_sql("BEGIN")
+                for table in tables:
+                    existing = {column["name"] for column in inspect(conn).get_columns(table.name)}
+                    names = [column.name for column in table.columns if column.name in existing]
+                    values = [CONVERSIONS.get((table.name, name), str)(name) for name in names]
+                    converted = [value for name, value in zip(names, values) if (table.name, name) in CONVERSIONS]
+                    where = " AND ".join(f"({value}) IS NOT NULL" for value in converted) or "true"
+                    ddl = str(CreateTable(table).compile(dialect=conn.dialect))
+                    conn.exec_driver_sql(ddl.replace(f"CREATE TABLE {table.name} ", f"CREATE TABLE _rebuild_{table.name} ", 1))
+                    copied = conn.exec_driver_sql(f"INSERT INTO _rebuild_{table.name} ({', '.join(names)}) "
+                                                  f"SELECT {', '.join(values)} FROM {table.name} WHERE {where}").rowcount
+                    dropped = conn.exec_driver_sql(f"SELECT count(*) FROM {table.name}").scalar() - copied
+                    if dropped:
+                        print(f"Dropped {dropped} rows from {table.name} with values that could not be converted.")
+                    conn.exec_driver_sql(f"DROP TABLE {table.name}")
+                    conn.exec_driver_sql(f"ALTER TABLE _rebuild_{table.name} RENAME TO {table.name}")
+                for table in tables:
+                    removed = remove_orphans(conn, table)
+                    if removed:
+                        print(f"Fixed {removed} rows in {table.name} that referred to deleted rows.")
+                violations = conn.exec_driver_sql("PRAGMA foreign_key_check").all()
+                if violations:
+                    raise RuntimeError(f"foreign key violations after rebuilding tables: {violations[:10]}")
+        finally:
+            conn.exec_driver_sql("PRAGMA foreign_keys=ON")
+            conn.commit()
+    return [table.name for table in tables]
+
+
+def upgrade(engine):
+    # Bring an existing tv_series.db up to the current schema. Safe to re-run.
+    inspector = inspect(engine)
+    existing = set(inspector.get_table_names())
+    # Columns before the upgrade: a rebuilt table gains its new columns in
+    # rebuild_tables() rather than add_missing_columns().
+    columns = {name: {column["name"] for column in inspector.get_columns(name)} for name in existing}
+    Base.metadata.create_all(engine)
+    rebuilt = rebuild_tables(engine)
+    if rebuilt:
+        print(f"Rebuilt {', '.join(rebuilt)} to the current column types and ON DELETE actions.")
+    with engine.begin() as conn:
+        widened = add_missing_columns(conn)
+        widened.update(table.name for table in Base.metadata.sorted_tables
+                       if table.name in existing and not set(table.columns.keys()) <= columns[table.name])
+        removed = dedupe_statuses(conn)
+        if removed:
+            print(f"Removed {removed} duplicate statuses.")
+        create_indexes(conn)
+        merged = merge_legacy_watchlist(conn)
+        if merged is not None:
+            print(f"Merged the watchlist table into statuses ({merged} new statuses).")
+
+        if series_genres.name not in existing:
+            Genre.rebuild(conn)
+        if "episode_count" not in columns.get(Series.__tablename__, {"episode_count"}):
+            Series.refresh_episode_totals(conn)
+
+    # Summary tables that are new or gained columns start from the current
+    # data, as they do after statuses were added or dropped behind their back.
+    with Session(engine) as session:
+        if (SeriesStats.__tablename__ not in existing or SeriesStats.__tablename__ in widened or merged
+                or Status.__tablename__ in rebuilt):
+            SeriesStats.rebuild(session)
+
+    search.install(engine)
@@ -1,15 +1,82 @@
-from sqlalchemy import Table, Column, Integer, String, ForeignKey
-from sqlalchemy.orm import relationship, Session
+import enum
+from sqlalchemy import (Table, Column, Integer, String, Float, LargeBinary, ForeignKey, Index, event, update, select,
+                        delete, func, case, union, bindparam)
+from sqlalchemy.dialects.sqlite import insert
+from sqlalchemy.orm import (relationship, selectinload, column_property, Session, attributes, validates,
+                            object_session)
 from sqlalchemy.ext.declarative import declarative_base
+from sqlalchemy.types import TypeDecorator
 
 Base = declarative_base()
 
-watchlist = Table(
-    'watchlist',
-    Base.metadata,
-    Column('user_id', ForeignKey('users.id'), primary_key=True),
-    Column('series_id', ForeignKey('series.id'), primary_key=True)
-)
+
+class WatchStatus(enum.IntEnum):
+    # Stored as these integers in statuses.watch_status; str() is the label.
+    WATCHING = 1
+    COMPLETED = 2
+    PLAN_TO_WATCH = 3
+    DROPPED = 4
+
+    @property
+    def label(self):
+        return WATCH_STATUS_LABELS[self]
+
+    def __str__(self):
+        return self.label
+
+    @classmethod
+    def parse(cls, value):
+        # A member from a member, its integer or its label in any case and
+        # spacing ("watching ", "plan_to_watch"); ValueError for anything else.
+        if isinstance(value, cls):
+            return value
+        if isinstance(value, int) and not isinstance(value, bool) and value in cls._value2member_map_:
+            return cls(value)
+        if isinstance(value, str):
+            member = _WATCH_STATUS_NAMES.get(normalize_label(value))
+            if member is not None:
+                return member
+        raise ValueError(f"Unknown watch status {value!r}; expected one of: {', '.join(WATCH_STATUS_LABELS.values())}.")
+
+
+WATCH_STATUS_LABELS = {
+    WatchStatus.WATCHING: "Watching",
+    WatchStatus.COMPLETED: "Completed",
+    WatchStatus.PLAN_TO_WATCH: "Plan to Watch",
+    WatchStatus.DROPPED: "Dropped",
+}
+
+
+def normalize_label(value):
+    # "Plan_To-Watch " -> "plan to watch"; also used for genre names.
+    return " ".join(value.replace("_", " ").lower().split())
+
+
+_WATCH_STATUS_NAMES = {normalize_label(label): status for status, label in WATCH_STATUS_LABELS.items()}
+
+
+class WatchStatusType(TypeDecorator):
+    # WatchStatus in Python, its integer in the database. Labels are accepted
+    # on the way in, so filters like `Status.watch_status == "Watching"` work.
+    impl = Integer
+    cache_ok = True
+
+    def process_bind_param(self, value, dialect):
+        return None if value is None else int(WatchStatus.parse(value))
+
+    def process_result_value(self, value, dialect):
+        return None if value is None else WatchStatus(value)
+
+
+# IDs per IN (...) list in bulk statements, well under SQLite's bound
+# parameter limit.
+ID_BATCH = 10_000
+
+
+def batches(ids):
+    ids = list(ids)
+    for start in range(0, len(ids), ID_BATCH):
+        yield ids[start:start + ID_BATCH]
 
 
 class User(Base):
@@ -18,10 +85,16 @@ class User(Base):
     id = Column(Integer, primary_key=True)
     username = Column(String, unique=True, nullable=False)
 
-    reviews = relationship("Review", back_populates="user")
-    created_series = relationship("Series", back_populates="user")
-    statuses = relationship("Status", back_populates="user")
-    watchlisted_series = relationship('Series', secondary=watchlist, back_populates='watchlisted_users')
+    # Dependent rows are removed by the database (ON DELETE CASCADE, or SET
+    # NULL for series the user created); passive_deletes stops the ORM from
+    # loading them first.
+    reviews = relationship("Review", back_populates="user", cascade="all, delete-orphan", passive_deletes=True)
+    created_series = relationship("Series", back_populates="user", passive_deletes=True)
+    statuses = relationship("Status", back_populates="user", cascade="all, delete-orphan", passive_deletes=True)
+    # A user's watchlist is their statuses; see Status.watchlist() for the
+    # one-query listing.
+    watchlisted_series = relationship('Series', secondary='statuses', back_populates='watchlisted_users',
+                                      viewonly=True)
 
 
     def __repr__(self):
@@ -40,28 +113,129 @@ class User(Base):
 
     @classmethod
     def delete(cls, session: Session, user_id):
-        user = cls.get_by_id(session, user_id)
-        if user:
-            session.delete(user)
-            session.commit()
-            return True
-        return False
+        return cls.delete_many(session, [user_id]) == 1
+
+    @classmethod
+    def delete_many(cls, session: Session, user_ids):
+        # One DELETE per batch of IDs. Their reviews, statuses and progress go
+        # with them inside SQLite and series they created lose their creator,
+        # none of it loaded. Deleting a user through session.delete() would
+        # skip the recount below, so go through here.
+        touched, orphaned, deleted = set(), set(), 0
+        for batch in batches(sorted(set(user_ids))):
+            touched.update(session.scalars(union(
+                select(Review.series_id).where(Review.user_id.in_(batch)),
+                select(Status.series_id).where(Status.user_id.in_(batch)),
+            )))
+            orphaned.update(session.scalars(select(Series.id).where(Series.user_id.in_(batch))))
+            deleted += session.execute(delete(cls).where(cls.id.in_(batch))).rowcount
+        session.commit()
+        # The cascade skipped the Review/Status events, so the aggregates of
+        # the series those rows counted towards are recomputed.
+        touched.discard(None)
+        for batch in batches(sorted(touched)):
+            SeriesStats.rebuild(session, batch)
+        if orphaned:
+            Series.changed(sorted(orphaned), deleted=False)
+        return deleted
+
+    @staticmethod
+    def watch_time_query(user_id):
+        # One row per series the user has a status for: (series_id, title,
+        # watch_status, episode_count, total_mins, watched_episodes,
+        # watched_mins, remaining_mins). Totals come from the precomputed
+        # Series columns; watched episodes from the progress bitsets (all of
+        # them once Completed), valued at the series' average episode length.
+        # Dropped series have nothing remaining.
+        progress = (
+            select(Season.series_id, func.sum(EpisodeProgress.watched_count).label("watched"))
+            .join(Season, Season.id == EpisodeProgress.season_id)
+            .where(EpisodeProgress.user_id == user_id)
+            .group_by(Season.series_id)
+            .subquery()
+        )
+        completed = Status.watch_status == WatchStatus.COMPLETED
+        watched_episodes = case(
+            (completed, Series.episode_count),
+            else_=func.min(func.coalesce(progress.c.watched, 0), Series.episode_count),
+        )
+        watched_mins = case(
+            (Series.episode_count == 0, 0),
+            (completed, Series.total_duration_mins),
+            else_=watched_episodes * Series.total_duration_mins // Series.episode_count,
+        )
+        return (
+            select(
+                Status.series_id, Series.title, Status.watch_status,
+                Series.episode_count, Series.total_duration_mins.label("total_mins"),
+                watched_episodes.label("watched_episodes"), watched_mins.label("watched_mins"),
+                case((Status.watch_status == WatchStatus.DROPPED, 0),
+                     else_=Series.total_duration_mins - watched_mins).label("remaining_mins"),
+            )
+            .join(Series, Series.id == Status.series_id)
+            .outerjoin(progress, progress.c.series_id == Status.series_id)
+            .where(Status.user_id == user_id)
+        )
+
+    @classmethod
+    def watch_time(cls, session: Session, user_id, limit=None):
+        # watch_time_query() rows, most time remaining first.
+        query = cls.watch_time_query(user_id).subquery()
+        rows = select(query).order_by(query.c.remaining_mins.desc(), query.c.series_id).limit(limit)
+        return session.execute(rows).all()
+
+    @classmethod
+    def dashboard(cls, session: Session, user_id):
+        # The user's totals in one aggregate statement: series per status,
+        # episodes and minutes (total, watched, remaining) over their tracked
+        # series, and the number and average of the ratings they gave.
+        rows = cls.watch_time_query(user_id).subquery()
+        ratings = select(Review.rating).where(Review.user_id == user_id, Review.rating.between(1, 10)).subquery()
+        counts = [func.count(case((rows.c.watch_status == status, 1))).label(status.name.lower())
+                  for status in WatchStatus]
+        query = select(
+            func.count().label("tracked"), *counts,
+            func.coalesce(func.sum(rows.c.episode_count), 0).label("episodes"),
+            func.coalesce(func.sum(rows.c.watched_episodes), 0).label("watched_episodes"),
+            func.coalesce(func.sum(rows.c.total_mins), 0).label("total_mins"),
+            func.coalesce(func.sum(rows.c.watched_mins), 0).label("watched_mins"),
+            func.coalesce(func.sum(rows.c.remaining_mins), 0).label("remaining_mins"),
+            select(func.count()).select_from(ratings).scalar_subquery().label("reviews"),
+            select(func.avg(ratings.c.rating)).scalar_subquery().label("rating_average"),
+        ).select_from(rows)
+        return session.execute(query).one()
 
 class Series(Base):
     __tablename__ = 'series'
 
     id = Column(Integer, primary_key=True)
-    title = Column(String, nullable=False)
+    title = Column(String, nullable=False, index=True)
+    # As entered, e.g. "Sci-Fi/Thriller"; filters go through the genre tags
+    # (Genre, series_genres) kept in step with it.
     genre = Column(String)
     description = Column(String)
-    user_id = Column(Integer, ForeignKey('users.id'))
+    user_id = Column(Integer, ForeignKey('users.id', ondelete='SET NULL'), index=True)
+    # Identifier from an imported catalog, used to dedupe re-imports.
+    external_key = Column(String, unique=True, index=True)
+    # Across all seasons; kept current in SQL by the Episode/Season events
+    # below, so read them with a query rather than from a cached instance.
+    episode_count = Column(Integer, nullable=False, default=0, server_default='0')
+    total_duration_mins = Column(Integer, nullable=False, default=0, server_default='0')
 
     user = relationship("User", back_populates="created_series")
-    watchlisted_users = relationship('User', secondary=watchlist, back_populates='watchlisted_series')
+    watchlisted_users = relationship('User', secondary='statuses', back_populates='watchlisted_series',
+                                     viewonly=True)
+
+    # Removed with the series by ON DELETE CASCADE; passive_deletes keeps the
+    # ORM from loading every season, episode, review and status to do it.
+    seasons = relationship("Season", back_populates="series", cascade="all, delete-orphan", passive_deletes=True)
+    reviews = relationship("Review", back_populates="series", cascade="all, delete-orphan", passive_deletes=True)
+    statuses = relationship("Status", back_populates="series", cascade="all, delete-orphan", passive_deletes=True)
 
-    seasons = relationship("Season", back_populates="series", cascade="all, delete-orphan")
-    reviews = relationship("Review", back_populates="series", cascade="all, delete-orphan")
-    statuses = relationship("Status", back_populates="series", cascade="all, delete-orphan")
+    # Callables run with a list of series IDs after a bulk statement deleted
+    # them (deleted=False: changed them), since bulk statements skip the
+    # mapper events that keep caches and the search index current.
+    listeners = []
 
     def __repr__(self):
         return f"<Series(id={self.id}, title='{self.title}', genre='{self.genre}')>"
@@ -77,24 +251,116 @@ class Series(Base):
     def get_by_id(cls, session: Session, series_id):
         return session.query(cls).get(series_id)
 
+    @classmethod
+    def list_page(cls, session: Session, after_id=None, before_id=None, limit=20, genre=None, title=None):
+        # Keyset pagination on id: only (id, title, genre) for one page is
+        # fetched, so the cost is the same on page 1 and page 10,000. A genre
+        # filter walks that genre's (genre_id, series_id) keys in order;
+        # "Drama/Comedy" means series tagged with both.
+        query = session.query(cls.id, cls.title, cls.genre)
+        key = cls.id
+        names = Genre.split(genre)
+        if names:
+            key = series_genres.c.series_id
+            query = query.join(series_genres, key == cls.id).filter(series_genres.c.genre_id == Genre.id_of(names[0]))
+            for name in names[1:]:
+                query = query.filter(key.in_(Genre.series_ids(name)))
+        if title:
+            query = query.filter(cls.title.ilike(f"%{title}%"))
+
+        if before_id is not None:
+            rows = query.filter(key < before_id).order_by(key.desc()).limit(limit).all()
+            return rows[::-1]
+        if after_id is not None:
+            query = query.filter(key > after_id)
+        return query.order_by(key).limit(limit).all()
+
+    @classmethod
+    def load_detail(cls, session: Session, series_id, reviews=True):
+        # Seasons -> episodes and reviews -> user are loaded up front, so the
+        # detail view costs the same number of queries for any series size.
+        # reviews=False skips them, for callers that page reviews separately.
+        options = [selectinload(cls.seasons).selectinload(Season.episodes)]
+        if reviews:
+            options.append(selectinload(cls.reviews).joinedload(Review.user))
+        return session.query(cls).options(*options).filter(cls.id == series_id).first()
+
     @classmethod
     def delete(cls, session: Session, series_id):
-        series = cls.get_by_id(session, series_id)
-        if series:
-            session.delete(series)
-            session.commit()
-            return True
-        return False
+        return cls.delete_many(session, [series_id]) == 1
+
+    @classmethod
+    def delete_many(cls, session: Session, series_ids):
+        # One DELETE per batch of IDs; seasons, episodes, reviews, statuses,
+        # progress, aggregates and neighbour lists follow inside SQLite.
+        series_ids = sorted(set(series_ids))
+        deleted = 0
+        for batch in batches(series_ids):
+            deleted += session.execute(delete(cls).where(cls.id.in_(batch))).rowcount
+        session.commit()
+        for series_id in series_ids:
+            SeriesStats.changed(series_id)
+        cls.changed(series_ids)
+        return deleted
+
+    @classmethod
+    def changed(cls, series_ids, deleted=True):
+        for listener in cls.listeners:
+            listener(series_ids, deleted)
+
+    @classmethod
+    def apply_episodes(cls, connection, changes):
+        # Adds {series_id: (episodes, minutes)} deltas to the totals, one
+        # executemany for all of them.
+        rows = [{"series": series_id, "episodes": episodes, "minutes": minutes}
+                for series_id, (episodes, minutes) in changes.items() if episodes or minutes]
+        if not rows:
+            return
+        table = cls.__table__
+        connection.execute(
+            update(table).where(table.c.id == bindparam("series")).values(
+                episode_count=table.c.episode_count + bindparam("episodes"),
+                total_duration_mins=table.c.total_duration_mins + bindparam("minutes"),
+            ),
+            rows,
+        )
+
+    @classmethod
+    def refresh_episode_totals(cls, connection, series_ids=None):
+        # Recounts the totals from `episodes`, for rows written behind the
+        # events' back (bulk seeding, imports, migrations).
+        table = cls.__table__
+        totals = (
+            select(Season.series_id, func.count(Episode.id).label("episodes"),
+                   func.coalesce(func.sum(Episode.duration_mins), 0).label("minutes"))
+            .join(Episode, Episode.season_id == Season.id)
+            .group_by(Season.series_id)
+        )
+        scopes = [None] if series_ids is None else batches(sorted(series_ids))
+        for batch in scopes:
+            reset, grouped = update(table), totals
+            if batch is not None:
+                reset = reset.where(table.c.id.in_(batch))
+                grouped = grouped.where(Season.series_id.in_(batch))
+            connection.execute(reset.values(episode_count=0, total_duration_mins=0))
+            grouped = grouped.subquery()
+            connection.execute(
+                update(table).where(table.c.id == grouped.c.series_id)
+                .values(episode_count=grouped.c.episodes, total_duration_mins=grouped.c.minutes)
+            )
 
 class Season(Base):
     __tablename__ = 'seasons'
 
     id = Column(Integer, primary_key=True)
     season_number = Column(Integer, nullable=False)
-    series_id = Column(Integer, ForeignKey('series.id'))
+    # active_history: the episode totals events need the old value even when
+    # it was not loaded (expired, or set through `season.series`).
+    series_id = column_property(Column(Integer, ForeignKey('series.id', ondelete='CASCADE'), index=True),
+                                active_history=True)
 
     series = relationship("Series", back_populates="seasons")
-    episodes = relationship("Episode", back_populates="season", cascade="all, delete-orphan")
+    episodes = relationship("Episode", back_populates="season", cascade="all, delete-orphan", passive_deletes=True)
 
     def __repr__(self):
         return f"<Season(id={self.id}, season_number={self.season_number}, series_id={self.series_id})>"
@@ -125,8 +391,10 @@ class Episode(Base):
     id = Column(Integer, primary_key=True)
     title = Column(String)
     episode_number = Column(Integer)
-    duration_mins = Column(Integer)
-    season_id = Column(Integer, ForeignKey('seasons.id'))
+    # Old values loaded on change, for the episode totals (see Season.series_id).
+    duration_mins = column_property(Column(Integer), active_history=True)
+    season_id = column_property(Column(Integer, ForeignKey('seasons.id', ondelete='CASCADE'), index=True),
+                                active_history=True)
 
     season = relationship("Season", back_populates="episodes")
 
@@ -158,9 +426,11 @@ class Review(Base):
 
     id = Column(Integer, primary_key=True)
     content = Column(String)
-    rating = Column(Integer)
-    user_id = Column(Integer, ForeignKey('users.id'))
-    series_id = Column(Integer, ForeignKey('series.id'))
+    # Old values loaded on change, for the SeriesStats update event.
+    rating = column_property(Column(Integer), active_history=True)
+    user_id = Column(Integer, ForeignKey('users.id', ondelete='CASCADE'), index=True)
+    series_id = column_property(Column(Integer, ForeignKey('series.id', ondelete='CASCADE'), index=True),
+                                active_history=True)
 
     user = relationship("User", back_populates="reviews")
     series = relationship("Series", back_populates="reviews")
@@ -186,12 +456,20 @@ class Review(Base):
 
 class Status(Base):
     __tablename__ = 'statuses'
+    # One status per (user, series); the unique index also serves the
+    # per-user lookups, so user_id needs no index of its own. Per-series
+    # counts by status read only the (series_id, watch_status) index.
+    __table_args__ = (
+        Index('uq_statuses_user_series', 'user_id', 'series_id', unique=True),
+        Index('ix_statuses_series_status', 'series_id', 'watch_status'),
+    )
 
     id = Column(Integer, primary_key=True)
-    watch_status = Column(String)
+    # Old values loaded on change, for the SeriesStats update event.
+    watch_status = column_property(Column(WatchStatusType, nullable=False), active_history=True)
 
-    user_id = Column(Integer, ForeignKey('users.id'))
-    series_id = Column(Integer, ForeignKey('series.id'))
+    user_id = Column(Integer, ForeignKey('users.id', ondelete='CASCADE'))
+    series_id = column_property(Column(Integer, ForeignKey('series.id', ondelete='CASCADE')), active_history=True)
 
     user = relationship("User", back_populates="statuses")
     series = relationship("Series", back_populates="statuses")
@@ -199,6 +477,10 @@ class Status(Base):
     def __repr__(self):
         return f"<Status(id={self.id}, user_id={self.user_id}, series_id={self.series_id}, watch_status='{self.watch_status}')>"
 
+    @validates("watch_status")
+    def validate_watch_status(self, key, value):
+        return WatchStatus.parse(value)
+
     @classmethod
     def create(cls, session: Session, watch_status, user_id, series_id):
         status = cls(watch_status=watch_status, user_id=user_id, series_id=series_id)
@@ -214,3 +496,566 @@ class Status(Base):
             session.commit()
             return True
         return False
+
+    @classmethod
+    def upsert(cls, session: Session, user_id, series_id, watch_status):
+        # Core statements skip the mapper events, so the series aggregates are
+        # adjusted here from the previous status (if any).
+        watch_status = WatchStatus.parse(watch_status)
+        previous = session.execute(
+            select(cls.watch_status).where(cls.user_id == user_id, cls.series_id == series_id)
+        ).first()
+        stmt = insert(cls).values(user_id=user_id, series_id=series_id, watch_status=watch_status)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[cls.user_id, cls.series_id],
+            set_={"watch_status": stmt.excluded.watch_status},
+        )
+        session.execute(stmt)
+        connection = session.connection()
+        if previous:
+            SeriesStats.apply_status(connection, series_id, previous.watch_status, -1)
+        SeriesStats.apply_status(connection, series_id, watch_status, 1)
+        session.commit()
+
+    @classmethod
+    def add_to_watchlist(cls, session: Session, user_id, series_id, watch_status=WatchStatus.PLAN_TO_WATCH):
+        # Single INSERT .. ON CONFLICT DO NOTHING; False means it was already there.
+        watch_status = WatchStatus.parse(watch_status)
+        stmt = insert(cls).values(user_id=user_id, series_id=series_id, watch_status=watch_status)
+        result = session.execute(stmt.on_conflict_do_nothing(index_elements=[cls.user_id, cls.series_id]))
+        added = result.rowcount == 1
+        if added:
+            SeriesStats.apply_status(session.connection(), series_id, watch_status, 1)
+        session.commit()
+        return added
+
+    @classmethod
+    def remove_from_watchlist(cls, session: Session, user_id, series_id):
+        # Single DELETE .. RETURNING; False means it was not there. The
+        # returned status is what comes off the series aggregates.
+        removed = session.execute(
+            delete(cls).where(cls.user_id == user_id, cls.series_id == series_id).returning(cls.watch_status)
+        ).first()
+        if removed:
+            SeriesStats.apply_status(session.connection(), series_id, removed.watch_status, -1)
+        session.commit()
+        return removed is not None
+
+    @classmethod
+    def watchlist_query(cls, user_id, watch_status=None):
+        # (series_id, title, watch_status) rows in the order they were added,
+        # optionally only those with one status.
+        query = (
+            select(cls.series_id, Series.title, cls.watch_status)
+            .join(Series, Series.id == cls.series_id)
+            .where(cls.user_id == user_id)
+            .order_by(cls.id)
+        )
+        if watch_status is not None:
+            query = query.where(cls.watch_status == WatchStatus.parse(watch_status))
+        return query
+
+    @classmethod
+    def watchlist(cls, session: Session, user_id, watch_status=None):
+        return session.execute(cls.watchlist_query(user_id, watch_status)).all()
+
+def set_bits(bits, first, last, value=True):
+    # Episodes first..last (1-based, inclusive) on or off in an int bitset.
+    mask = ((1 << (last - first + 1)) - 1) << (first - 1)
+    return bits | mask if value else bits & ~mask
+
+
+def first_clear_bit(bits, size):
+    # 1-based position of the first 0 among the low `size` bits, or None.
+    unset = ~bits & ((1 << size) - 1)
+    if not unset:
+        return None
+    return (unset & -unset).bit_length()
+
+
+class EpisodeProgress(Base):
+    __tablename__ = 'episode_progress'
+
+    # One row per (user, season): bit n-1 of `watched` is episode n. A
+    # 30-episode season costs 4 bytes instead of 30 rows.
+    user_id = Column(Integer, ForeignKey('users.id', ondelete='CASCADE'), primary_key=True)
+    season_id = Column(Integer, ForeignKey('seasons.id', ondelete='CASCADE'), primary_key=True, index=True)
+    watched = Column(LargeBinary, nullable=False, default=b'')
+    watched_count = Column(Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return f"<EpisodeProgress(user_id={self.user_id}, season_id={self.season_id}, watched_count={self.watched_count})>"
+
+    @property
+    def bits(self):
+        return int.from_bytes(self.watched or b'', 'little')
+
+    @bits.setter
+    def bits(self, value):
+        self.watched = value.to_bytes((value.bit_length() + 7) // 8, 'little')
+        self.watched_count = bin(value).count("1")
+
+    def is_watched(self, episode_number):
+        return bool(self.bits >> (episode_number - 1) & 1)
+
+    @classmethod
+    def mark_watched(cls, session: Session, user_id, season_id, first, last=None, watched=True):
+        # Mark episodes first..last of a season as watched (or unwatched).
+        last = first if last is None else last
+        if first < 1 or last < first:
+            raise ValueError("Episode range must be 1-based and ascending.")
+        progress = session.get(cls, (user_id, season_id))
+        if progress is None:
+            progress = cls(user_id=user_id, season_id=season_id)
+            session.add(progress)
+        progress.bits = set_bits(progress.bits, first, last, watched)
+        session.commit()
+        return progress
+
+    @classmethod
+    def season_overview(cls, session: Session, user_id, series_id):
+        # (season_id, season_number, episode_count, watched_bits) per season in
+        # order. Episode counts come from the season_id index, not Episode rows.
+        episode_count = (
+            select(func.count()).where(Episode.season_id == Season.id).correlate(Season).scalar_subquery()
+        )
+        query = (
+            select(Season.id, Season.season_number, episode_count, cls.watched)
+            .outerjoin(cls, (cls.season_id == Season.id) & (cls.user_id == user_id))
+            .where(Season.series_id == series_id)
+            .order_by(Season.season_number)
+        )
+        return [
+            (season_id, number, count, int.from_bytes(watched or b'', 'little'))
+            for season_id, number, count, watched in session.execute(query)
+        ]
+
+    @classmethod
+    def next_unwatched(cls, session: Session, user_id, series_id):
+        # (season_number, episode_number) of the first unwatched episode, or None.
+        for _, number, count, bits in cls.season_overview(session, user_id, series_id):
+            episode = first_clear_bit(bits, count)
+            if episode is not None:
+                return number, episode
+        return None
+
+    @classmethod
+    def series_progress(cls, session: Session, user_id, series_id):
+        # (watched, total, percent) over the episodes that exist.
+        watched = total = 0
+        for _, _, count, bits in cls.season_overview(session, user_id, series_id):
+            total += count
+            watched += bin(bits & ((1 << count) - 1)).count("1")
+        percent = watched / total * 100 if total else 0.0
+        return watched, total, percent
+
+
+class SeriesStats(Base):
+    __tablename__ = 'series_stats'
+
+    # Per-series aggregates kept current by the Review/Status mapper events
+    # below (and by Status.upsert/add_to_watchlist), so showing or ranking
+    # ratings and watch counts never scans `reviews` or `statuses`. Only
+    # ratings on the 1-10 scale are counted.
+    series_id = Column(Integer, ForeignKey('series.id', ondelete='CASCADE'), primary_key=True)
+    review_count = Column(Integer, nullable=False, default=0, server_default='0')
+    rating_total = Column(Integer, nullable=False, default=0, server_default='0')
+    rating_average = Column(Float, index=True)
+    rating_min = Column(Integer)
+    rating_max = Column(Integer)
+    rating_1 = Column(Integer, nullable=False, default=0, server_default='0')
+    rating_2 = Column(Integer, nullable=False, default=0, server_default='0')
+    rating_3 = Column(Integer, nullable=False, default=0, server_default='0')
+    rating_4 = Column(Integer, nullable=False, default=0, server_default='0')
+    rating_5 = Column(Integer, nullable=False, default=0, server_default='0')
+    rating_6 = Column(Integer, nullable=False, default=0, server_default='0')
+    rating_7 = Column(Integer, nullable=False, default=0, server_default='0')
+    rating_8 = Column(Integer, nullable=False, default=0, server_default='0')
+    rating_9 = Column(Integer, nullable=False, default=0, server_default='0')
+    rating_10 = Column(Integer, nullable=False, default=0, server_default='0')
+    watchers_count = Column(Integer, nullable=False, default=0, server_default='0', index=True)
+    watching_count = Column(Integer, nullable=False, default=0, server_default='0', index=True)
+    completed_count = Column(Integer, nullable=False, default=0, server_default='0', index=True)
+
+    RATINGS = range(1, 11)
+
+    # Callables run with the affected series_id (None for "all") whenever the
+    # aggregates change, e.g. to drop cached leaderboards.
+    listeners = []
+
+    def __repr__(self):
+        return f"<SeriesStats(series_id={self.series_id}, review_count={self.review_count}, average={self.average})>"
+
+    @property
+    def average(self):
+        return self.rating_average
+
+    @property
+    def histogram(self):
+        return {rating: getattr(self, f"rating_{rating}") for rating in self.RATINGS}
+
+    @classmethod
+    def for_series(cls, session: Session, series_id):
+        return session.get(cls, series_id)
+
+    @classmethod
+    def changed(cls, series_id=None):
+        for listener in cls.listeners:
+            listener(series_id)
+
+    @classmethod
+    def _bump(cls, connection, series_id, delta, counters):
+        # Upsert on the way up; on the way down only update, so a row already
+        # removed together with its series is left alone.
+        table = cls.__table__
+        if delta > 0:
+            stmt = insert(table).values(series_id=series_id, **{name: amount for name, amount in counters.items()})
+            connection.execute(stmt.on_conflict_do_update(
+                index_elements=[table.c.series_id],
+                set_={name: table.c[name] + amount for name, amount in counters.items()},
+            ))
+        else:
+            connection.execute(
+                update(table)
+                .where(table.c.series_id == series_id)
+                .values({name: table.c[name] - amount for name, amount in counters.items()})
+            )
+        cls.changed(series_id)
+
+    @classmethod
+    def _refresh_ratings(cls, connection, series_id=None, series_ids=None):
+        # Average and extremes follow from the totals and the histogram.
+        table = cls.__table__
+        stmt = update(table).values(
+            rating_average=case((table.c.review_count > 0, table.c.rating_total * 1.0 / table.c.review_count), else_=None),
+            rating_min=case(*[(table.c[f"rating_{r}"] > 0, r) for r in cls.RATINGS], else_=None),
+            rating_max=case(*[(table.c[f"rating_{r}"] > 0, r) for r in reversed(cls.RATINGS)], else_=None),
+        )
+        if series_id is not None:
+            stmt = stmt.where(table.c.series_id == series_id)
+        elif series_ids is not None:
+            stmt = stmt.where(table.c.series_id.in_(series_ids))
+        connection.execute(stmt)
+
+    @classmethod
+    def apply(cls, connection, series_id, rating, delta):
+        # Add (delta=1) or remove (delta=-1) one rating.
+        if series_id is None or rating not in cls.RATINGS:
+            return
+        cls._bump(connection, series_id, delta, {
+            "review_count": 1,
+            "rating_total": rating,
+            f"rating_{rating}": 1,
+        })
+        cls._refresh_ratings(connection, series_id)
+
+    @classmethod
+    def apply_status(cls, connection, series_id, watch_status, delta):
+        # Add (delta=1) or remove (delta=-1) one user's status for a series.
+        if series_id is None:
+            return
+        counters = {"watchers_count": 1}
+        watch_status = WatchStatus.parse(watch_status)
+        if watch_status == WatchStatus.WATCHING:
+            counters["watching_count"] = 1
+        elif watch_status == WatchStatus.COMPLETED:
+            counters["completed_count"] = 1
+        cls._bump(connection, series_id, delta, counters)
+
+    @classmethod
+    def rebuild(cls, session: Session, series_ids=None):
+        # Recompute everything from `reviews` and `statuses` in two grouped passes.
+        table = cls.__table__
+        reviews = Review.__table__
+        statuses = Status.__table__
+        ratings = (
+            select(
+                reviews.c.series_id,
+                func.count(),
+                func.sum(reviews.c.rating),
+                *[func.sum(case((reviews.c.rating == r, 1), else_=0)) for r in cls.RATINGS],
+            )
+            .where(reviews.c.rating.between(1, 10), reviews.c.series_id.is_not(None))
+            .group_by(reviews.c.series_id)
+        )
+        watchers = (
+            select(
+                statuses.c.series_id,
+                func.count(),
+                func.sum(case((statuses.c.watch_status == WatchStatus.WATCHING, 1), else_=0)),
+                func.sum(case((statuses.c.watch_status == WatchStatus.COMPLETED, 1), else_=0)),
+            )
+            .where(statuses.c.series_id.is_not(None))
+            .group_by(statuses.c.series_id)
+        )
+        clear = delete(table)
+        if series_ids is not None:
+            series_ids = list(series_ids)
+            ratings = ratings.where(reviews.c.series_id.in_(series_ids))
+            watchers = watchers.where(statuses.c.series_id.in_(series_ids))
+            clear = clear.where(table.c.series_id.in_(series_ids))
+
+        session.execute(clear)
+        rating_columns = ["series_id", "review_count", "rating_total"] + [f"rating_{r}" for r in cls.RATINGS]
+        session.execute(insert(table).from_select(rating_columns, ratings))
+        watcher_columns = ["series_id", "watchers_count", "watching_count", "completed_count"]
+        stmt = insert(table).from_select(watcher_columns, watchers)
+        session.execute(stmt.on_conflict_do_update(
+            index_elements=[table.c.series_id],
+            set_={name: stmt.excluded[name] for name in watcher_columns[1:]},
+        ))
+        cls._refresh_ratings(session.connection(), series_ids=series_ids)
+        session.commit()
+        if series_ids is None:
+            cls.changed()
+        else:
+            for series_id in series_ids:
+                cls.changed(series_id)
+
+
+series_genres = Table(
+    'series_genres',
+    Base.metadata,
+    Column('genre_id', ForeignKey('genres.id', ondelete='CASCADE'), primary_key=True),
+    Column('series_id', ForeignKey('series.id', ondelete='CASCADE'), primary_key=True, index=True),
+    # Clustered on (genre_id, series_id): one genre's series are a single
+    # ordered range, which is what genre filters and keyset pages walk.
+    sqlite_with_rowid=False,
+)
+
+
+class Genre(Base):
+    __tablename__ = 'genres'
+
+    # One row per genre name, normalised ("Sci-Fi/Thriller" tags a series
+    # with "sci-fi" and "thriller"). Kept in step with Series.genre by the
+    # Series events below; bulk loads call Genre.rebuild().
+    id = Column(Integer, primary_key=True)
+    name = Column(String, unique=True, nullable=False)
+
+    def __repr__(self):
+        return f"<Genre(id={self.id}, name='{self.name}')>"
+
+    @staticmethod
+    def split(value):
+        names = []
+        for part in (value or "").replace(",", "/").split("/"):
+            name = normalize_label(part)
+            if name and name not in names:
+                names.append(name)
+        return names
+
+    @classmethod
+    def id_of(cls, name):
+        # Scalar subquery for the ID of genre `name`, for filters.
+        return select(cls.id).where(cls.name == normalize_label(name)).scalar_subquery()
+
+    @classmethod
+    def series_ids(cls, name):
+        # IDs of the series tagged with genre `name`, for IN filters.
+        return select(series_genres.c.series_id).where(series_genres.c.genre_id == cls.id_of(name))
+
+    @classmethod
+    def names(cls, session: Session):
+        # Genres that tag at least one series, alphabetically.
+        used = select(series_genres.c.genre_id).where(series_genres.c.genre_id == cls.id).exists()
+        return session.scalars(select(cls.name).where(used).order_by(cls.name)).all()
+
+    @classmethod
+    def tag(cls, connection, rows, replace=True):
+        # Tags each series in `rows` ((series_id, genre string) pairs) from its
+        # genre string, creating genres as needed.
+        rows = [(series_id, cls.split(genre)) for series_id, genre in rows]
+        if replace:
+            for batch in batches(series_id for series_id, _ in rows):
+                connection.execute(delete(series_genres).where(series_genres.c.series_id.in_(batch)))
+        names = sorted({name for _, tags in rows for name in tags})
+        if not names:
+            return
+        connection.execute(insert(cls.__table__).on_conflict_do_nothing(index_elements=["name"]),
+                           [{"name": name} for name in names])
+        ids = {}
+        for batch in batches(names):
+            ids.update(connection.execute(select(cls.name, cls.id).where(cls.name.in_(batch))).all())
+        connection.execute(series_genres.insert(), [
+            {"series_id": series_id, "genre_id": ids[name]} for series_id, tags in rows for name in tags
+        ])
+
+    @classmethod
+    def rebuild(cls, connection, series_ids=None, batch_size=ID_BATCH):
+        # Re-tags every series (or just `series_ids`) from series.genre.
+        table = Series.__table__
+        if series_ids is None:
+            connection.execute(delete(series_genres))
+            rows = connection.execute(select(table.c.id, table.c.genre).execution_options(yield_per=batch_size))
+            for partition in rows.partitions():
+                cls.tag(connection, partition, replace=False)
+            return
+        for batch in batches(sorted(series_ids)):
+            cls.tag(connection, connection.execute(select(table.c.id, table.c.genre).where(table.c.id.in_(batch))).all())
+
+
+class SeriesNeighbor(Base):
+    __tablename__ = 'series_neighbors'
+
+    # The most similar series to each series by who watches and rates them,
+    # written in bulk by lib/recommend.py. WITHOUT ROWID clusters the rows
+    # on the primary key, so a series' neighbours (scores included) sit
+    # together and a recommendation reads them without a second lookup.
+    __table_args__ = {'sqlite_with_rowid': False}
+
+    series_id = Column(Integer, ForeignKey('series.id', ondelete='CASCADE'), primary_key=True)
+    neighbor_id = Column(Integer, ForeignKey('series.id', ondelete='CASCADE'), primary_key=True)
+    score = Column(Float, nullable=False)
+
+    def __repr__(self):
+        return f"<SeriesNeighbor(series_id={self.series_id}, neighbor_id={self.neighbor_id}, score={self.score:.3f})>"
+
+
+@event.listens_for(Series, "after_insert")
+def tag_series(mapper, connection, series):
+    Genre.tag(connection, [(series.id, series.genre)], replace=False)
+
+
+@event.listens_for(Series, "after_update")
+def retag_series(mapper, connection, series):
+    if attributes.get_history(series, "genre").has_changes():
+        Genre.tag(connection, [(series.id, series.genre)])
+
+
+def previous(instance, key):
+    # The value `key` had before this flush. Columns the update events read
+    # are active_history, so a changed value always has its old one loaded;
+    # a change with no old value was from None.
+    history = attributes.get_history(instance, key)
+    if history.deleted:
+        return history.deleted[0]
+    return None if history.added else getattr(instance, key)
+
+
+# Episode changes are summed per series while a flush runs and written to
+# the series totals in one statement when it ends, so saving a series with
+# thousands of episodes costs one UPDATE rather than one per episode.
+def queue_episodes(connection, instance, season_id, episodes, minutes, series_id=None):
+    if season_id is None:
+        return
+    info = object_session(instance).info
+    if series_id is None:
+        # Each season's series is looked up once per flush.
+        seasons = info.setdefault("episode_seasons", {})
+        if season_id not in seasons:
+            seasons[season_id] = connection.execute(select(Season.series_id).where(Season.id == season_id)).scalar()
+        series_id = seasons[season_id]
+    if series_id is None:
+        return
+    pending = info.setdefault("episode_totals", {})
+    count, total = pending.get(series_id, (0, 0))
+    pending[series_id] = (count + episodes, total + minutes)
+
+
+@event.listens_for(Episode, "after_insert")
+def add_episode_to_totals(mapper, connection, episode):
+    queue_episodes(connection, episode, episode.season_id, 1, episode.duration_mins or 0)
+
+
+@event.listens_for(Episode, "after_delete")
+def remove_episode_from_totals(mapper, connection, episode):
+    queue_episodes(connection, episode, episode.season_id, -1, -(episode.duration_mins or 0))
+
+
+@event.listens_for(Episode, "after_update")
+def move_episode_in_totals(mapper, connection, episode):
+    duration = attributes.get_history(episode, "duration_mins")
+    season_id = attributes.get_history(episode, "season_id")
+    if not (duration.has_changes() or season_id.has_changes()):
+        return
+    old_duration, old_season_id = previous(episode, "duration_mins"), previous(episode, "season_id")
+    queue_episodes(connection, episode, old_season_id, -1, -(old_duration or 0))
+    queue_episodes(connection, episode, episode.season_id, 1, episode.duration_mins or 0)
+
+
+@event.listens_for(Season, "before_delete")
+def remove_season_from_totals(mapper, connection, season):
+    # Episodes still in the table go by ON DELETE CASCADE without events
+    # (any the session deleted itself were queued above).
+    episodes, minutes = connection.execute(
+        select(func.count(Episode.id), func.coalesce(func.sum(Episode.duration_mins), 0))
+        .where(Episode.season_id == season.id)
+    ).one()
+    queue_episodes(connection, season, season.id, -episodes, -minutes, series_id=season.series_id)
+
+
+@event.listens_for(Season, "after_update")
+def move_season_in_totals(mapper, connection, season):
+    if not attributes.get_history(season, "series_id").has_changes():
+        return
+    old_series_id = previous(season, "series_id")
+    episodes, minutes = connection.execute(
+        select(func.count(Episode.id), func.coalesce(func.sum(Episode.duration_mins), 0))
+        .where(Episode.season_id == season.id)
+    ).one()
+    if old_series_id is not None:
+        queue_episodes(connection, season, season.id, -episodes, -minutes, series_id=old_series_id)
+    queue_episodes(connection, season, season.id, episodes, minutes, series_id=season.series_id)
+
+
+@event.listens_for(Session, "before_flush")
+def reset_episode_totals(session, flush_context, instances):
+    # Left over from a flush that failed part way.
+    session.info.pop("episode_totals", None)
+    session.info.pop("episode_seasons", None)
+
+
+@event.listens_for(Session, "after_flush")
+def write_episode_totals(session, flush_context):
+    session.info.pop("episode_seasons", None)
+    pending = session.info.pop("episode_totals", None)
+    if pending:
+        Series.apply_episodes(session.connection(), pending)
+
+
+@event.listens_for(Series, "after_delete")
+def drop_series_stats(mapper, connection, series):
+    # Its aggregates row went with it by ON DELETE CASCADE, without the
+    # Review/Status events that would have reported the change.
+    SeriesStats.changed(series.id)
+
+
+@event.listens_for(Review, "after_insert")
+def add_review_to_stats(mapper, connection, review):
+    SeriesStats.apply(connection, review.series_id, review.rating, 1)
+
+
+@event.listens_for(Review, "after_delete")
+def remove_review_from_stats(mapper, connection, review):
+    SeriesStats.apply(connection, review.series_id, review.rating, -1)
+
+
+@event.listens_for(Review, "after_update")
+def move_review_in_stats(mapper, connection, review):
+    rating = attributes.get_history(review, "rating")
+    series_id = attributes.get_history(review, "series_id")
+    if not (rating.has_changes() or series_id.has_changes()):
+        return
+    SeriesStats.apply(connection, previous(review, "series_id"), previous(review, "rating"), -1)
+    SeriesStats.apply(connection, review.series_id, review.rating, 1)
+
+
+@event.listens_for(Status, "after_insert")
+def add_status_to_stats(mapper, connection, status):
+    SeriesStats.apply_status(connection, status.series_id, status.watch_status, 1)
+
+
+@event.listens_for(Status, "after_delete")
+def remove_status_from_stats(mapper, connection, status):
+    SeriesStats.apply_status(connection, status.series_id, status.watch_status, -1)
+
+
+@event.listens_for(Status, "after_update")
+def move_status_in_stats(mapper, connection, status):
+    watch_status = attributes.get_history(status, "watch_status")
+    series_id = attributes.get_history(status, "series_id")
+    if not (watch_status.has_changes() or series_id.has_changes()):
+        return
+    SeriesStats.apply_status(connection, previous(status, "series_id"), previous(status, "watch_status"), -1)
+    SeriesStats.apply_status(connection, status.series_id, status.watch_status, 1)
@@ -0,0 +1,199 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+from sqlalchemy import select, delete, func, case, union_all
+from lib.models import Series, Review, Status, SeriesNeighbor, WatchStatus
+
+# Item-item collaborative filtering. Every user is a sparse row of interest
+# weights over series: their rating (scaled to 0-1) where they left one,
+# otherwise a weight for their watch status. Two series are similar when the
+# same users care about both: cosine over their columns of the user x series
+# matrix, damped by SHRINK so a pair shared by one or two users does not
+# score like a pair shared by thousands.
+#
+# The NEIGHBORS best matches per series are stored in series_neighbors.
+# Recommending for a user then only reads the neighbour lists of the series
+# they already have, which is a few indexed lookups however large the
+# catalog is. NumPy/SciPy are only needed to refresh that table.
+STATUS_WEIGHTS = {WatchStatus.COMPLETED: 1.0, WatchStatus.WATCHING: 0.8, WatchStatus.PLAN_TO_WATCH: 0.5,
+                  WatchStatus.DROPPED: 0.0}
+NEIGHBORS = 50
+SHRINK = 10.0
+
+# Series per similarity block. A block's product is at most BLOCK_SIZE x
+# n_series, so this bounds the memory each worker needs.
+BLOCK_SIZE = 500
+
+
+def _weights_query():
+    # (user_id, series_id, weight) from statuses and from ratings; where a
+    # user has both for a series, the rating wins.
+    status_weight = case(
+        *[(Status.watch_status == status, weight) for status, weight in STATUS_WEIGHTS.items()], else_=0.0
+    )
+    statuses = select(Status.user_id, Status.series_id, status_weight.label("weight")).where(
+        Status.user_id.is_not(None), Status.series_id.is_not(None))
+    ratings = (
+        select(Review.user_id, Review.series_id, (func.avg(Review.rating) / 10.0).label("weight"))
+        .where(Review.rating.between(1, 10), Review.user_id.is_not(None), Review.series_id.is_not(None))
+        .group_by(Review.user_id, Review.series_id)
+    )
+    return statuses, ratings
+
+
+def recommend(session, user_id, limit=10):
+    # Returns (id, title, genre, score) rows, best first: series the user has
+    # no status or review for, scored by the similarity-weighted sum over the
+    # series they have. It is one statement; SQLite sums the neighbour rows
+    # and only the winners come back.
+    statuses, ratings = _weights_query()
+    rated = select(Review.series_id).where(Review.user_id == user_id, Review.rating.between(1, 10))
+    profile = union_all(
+        ratings.where(Review.user_id == user_id),
+        statuses.where(Status.user_id == user_id, Status.series_id.not_in(rated)),
+    ).subquery("profile")
+    seen = union_all(
+        select(Status.series_id).where(Status.user_id == user_id),
+        select(Review.series_id).where(Review.user_id == user_id),
+    )
+    score = func.sum(SeriesNeighbor.score * profile.c.weight).label("score")
+    ranked = (
+        select(SeriesNeighbor.neighbor_id, score)
+        .join(profile, profile.c.series_id == SeriesNeighbor.series_id)
+        .where(profile.c.weight > 0, SeriesNeighbor.neighbor_id.not_in(seen))
+        .group_by(SeriesNeighbor.neighbor_id)
+        .order_by(score.desc(), SeriesNeighbor.neighbor_id)
+        .limit(limit)
+        .subquery()
+    )
+    rows = session.connection().execute(
+        select(Series.id, Series.title, Series.genre, ranked.c.score)
+        .join(ranked, ranked.c.neighbor_id == Series.id)
+        .order_by(ranked.c.score.desc(), Series.id)
+    )
+    return [tuple(row) for row in rows]
+
+
+def load_matrix(conn, batch_size=100_000):
+    # The user x series matrix as CSR, indexed by database IDs. Ratings
+    # replace the status weight for the same (user, series).
+    import numpy as np
+    from scipy import sparse
+
+    def read(query):
+        chunks = [np.array([tuple(row) for row in rows], dtype=np.float64) for rows in
+                  conn.execution_options(stream_results=True, yield_per=batch_size).execute(query).partitions()]
+        return np.concatenate(chunks) if chunks else np.empty((0, 3))
+
+    statuses, ratings = _weights_query()
+    status_rows, rating_rows = read(statuses), read(ratings)
+    n_users = int(max(status_rows[:, 0].max(initial=0), rating_rows[:, 0].max(initial=0))) + 1
+    n_series = (conn.execute(select(func.max(Series.id))).scalar() or 0) + 1
+
+    def to_csr(rows):
+        return sparse.csr_matrix((rows[:, 2], (rows[:, 0].astype(np.int64), rows[:, 1].astype(np.int64))),
+                                 shape=(n_users, n_series))
+
+    by_status, by_rating = to_csr(status_rows), to_csr(rating_rows)
+    rated = by_rating.copy()
+    rated.data[:] = 1.0
+    matrix = (by_status - by_status.multiply(rated) + by_rating).tocsr()
+    matrix.eliminate_zeros()
+    return matrix
+
+
+# Worker state, set once per process by _init_worker.
+_matrix = None
+_columns = None
+_norms = None
+_k = NEIGHBORS
+_shrink = SHRINK
+
+
+def _init_worker(matrix, k, shrink):
+    global _matrix, _columns, _norms, _k, _shrink
+    import numpy as np
+    _matrix = matrix
+    _columns = matrix.T.tocsr()
+    _norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=0)).ravel())
+    _k, _shrink = k, shrink
+
+
+def _neighbors_for(series_ids):
+    # Top-k neighbours of each series in `series_ids` as three parallel arrays.
+    import numpy as np
+    block = (_columns[series_ids] @ _matrix).tocsr()
+    sources, targets, scores = [], [], []
+    for row, series_id in enumerate(series_ids):
+        start, end = block.indptr[row], block.indptr[row + 1]
+        candidates = block.indices[start:end]
+        similarity = block.data[start:end] / (_norms[series_id] * _norms[candidates] + _shrink)
+        keep = (candidates != series_id) & (similarity > 0)
+        candidates, similarity = candidates[keep], similarity[keep]
+        if len(candidates) > _k:
+            top = np.argpartition(-similarity, _k - 1)[:_k]
+            candidates, similarity = candidates[top], similarity[top]
+        sources.append(np.full(len(candidates), series_id))
+        targets.append(candidates)
+        scores.append(similarity)
+    if not sources:
+        return np.empty(0, np.int64), np.empty(0, np.int64), np.empty(0)
+    return np.concatenate(sources), np.concatenate(targets), np.concatenate(scores)
+
+
+def compute_neighbors(matrix, series_ids, k=NEIGHBORS, shrink=SHRINK, workers=1):
+    # Yields (series_ids, neighbor_ids, scores) array triples, one per block.
+    # With workers > 1 the blocks are spread over a process pool; each worker
+    # receives the matrix once.
+    series_ids = sorted(series_ids)
+    blocks = [series_ids[i:i + BLOCK_SIZE] for i in range(0, len(series_ids), BLOCK_SIZE)]
+    if workers <= 1 or len(blocks) <= 1:
+        _init_worker(matrix, k, shrink)
+        for block in blocks:
+            yield _neighbors_for(block)
+        return
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(matrix, k, shrink)) as pool:
+        yield from pool.map(_neighbors_for, blocks)
+
+
+def refresh_neighbors(engine, series_ids=None, k=NEIGHBORS, workers=None, report=print):
+    # series_ids=None recomputes the whole table. Given a set of changed
+    # series, their lists are recomputed along with every list that already
+    # names one of them, since those scores moved too. Other lists pick a
+    # changed series up at the next full refresh.
+    workers = workers or os.cpu_count() or 1
+    table = SeriesNeighbor.__table__
+    with engine.connect() as conn:
+        matrix = load_matrix(conn)
+        if series_ids is None:
+            targets = [int(series_id) for series_id in
+                       (matrix.getnnz(axis=0) > 0).nonzero()[0]]
+        else:
+            series_ids = [series_id for series_id in series_ids if series_id is not None]
+            listing = conn.execute(
+                select(table.c.series_id).distinct().where(table.c.neighbor_id.in_(series_ids))
+            ).scalars()
+            targets = [series_id for series_id in set(series_ids).union(listing) if series_id < matrix.shape[1]]
+
+    written = 0
+    with engine.begin() as conn:
+        if series_ids is None:
+            conn.execute(delete(table))
+        else:
+            stale = sorted(set(series_ids).union(targets))
+            for start in range(0, len(stale), 10_000):
+                conn.execute(delete(table).where(table.c.series_id.in_(stale[start:start + 10_000])))
+        for sources, neighbors, scores in compute_neighbors(matrix, targets, k=k, workers=workers):
+            if not len(sources):
+                continue
+            # Millions of rows on a full refresh: plain tuples straight to the
+            # driver skip building a parameter dict per row.
+            conn.exec_driver_sql(
+                f"INSERT INTO {table.name} (series_id, neighbor_id, score) VALUES (?, ?, ?)",
+                list(zip(sources.tolist(), neighbors.tolist(), scores.tolist())),
+            )
+            written += len(sources)
+    report(f"Refreshed neighbours for {len(targets):,} series ({written:,} pairs, "
+           f"{matrix.nnz:,} user/series signals, {workers} worker{'s' if workers != 1 else ''}).")
+    return written
+
@@ -0,0 +1,249 @@
+import csv
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from urllib.parse import quote
+from sqlalchemy import select, func, case
+from sqlalchemy.engine import make_url
+from lib.db import make_engine
+from lib.models import User, Series, Review, Status, WatchStatus, Genre, series_genres
+from lib.importer import open_text
+
+# Nightly reports, computed in parallel. Each report splits the id range of
+# `series` or `users` into partitions; worker processes aggregate one
+# partition at a time in SQL over their own read-only SQLite connection and
+# send back a small partial ({key: counts}), which the parent sums. SQLite
+# readers do not block each other, so the partitions really do run at once.
+#
+#   genre-ratings      rating distribution (1-10) per genre tag
+#   series-completion  completion and drop rates per series
+#   reviewer-activity  reviews, ratings and statuses per user
+
+# More partitions than workers, so one dense id range does not leave the
+# other workers idle at the end.
+PARTITIONS_PER_WORKER = 4
+
+# Connection settings for report readers: the usual caches, and SQLite
+# refuses any write.
+READ_PRAGMAS = {"cache_size": "-64000", "mmap_size": "268435456", "temp_store": "MEMORY", "query_only": "ON"}
+
+
+def read_only_url(url):
+    # sqlite:///tv_series.db -> sqlite:///file:/abs/path/tv_series.db?mode=ro&uri=true
+    url = make_url(url)
+    if url.get_backend_name() != "sqlite" or not url.database or url.database == ":memory:":
+        raise ValueError("Reports need an SQLite database file.")
+    return f"sqlite:///file:{quote(os.path.abspath(url.database))}?mode=ro&uri=true"
+
+
+def partitions(conn, column, count):
+    # Up to `count` contiguous (low, high) id ranges covering `column`.
+    low, high = conn.execute(select(func.min(column), func.max(column))).one()
+    if low is None:
+        return []
+    step = max(1, -(-(high - low + 1) // count))
+    return [(start, min(start + step - 1, high)) for start in range(low, high + 1, step)]
+
+
+class Report:
+    # Subclasses define partial(conn, low, high), run in a worker for one id
+    # range of `key` and returning {group: [counts]}, and finish(conn, totals),
+    # which turns the merged totals into rows of `columns`. merge() sums the
+    # partials' counts group by group.
+    name = None
+    key = None
+    columns = ()
+
+    @classmethod
+    def merge(cls, totals, partial):
+        for key, values in partial.items():
+            current = totals.get(key)
+            totals[key] = values if current is None else [a + b for a, b in zip(current, values)]
+
+
+def rate(part, whole):
+    return round(part / whole, 4) if whole else None
+
+
+class GenreRatings(Report):
+    name = "genre-ratings"
+    key = Series.id
+    columns = ("genre", "reviews", "rating_average") + tuple(f"rating_{rating}" for rating in range(1, 11))
+
+    @classmethod
+    def partial(cls, conn, low, high):
+        # Counted per series first, so each genre tag joins one row per
+        # (series, rating) instead of one per review.
+        per_series = (
+            select(Review.series_id, Review.rating, func.count().label("reviews"))
+            .where(Review.series_id.between(low, high), Review.rating.between(1, 10))
+            .group_by(Review.series_id, Review.rating)
+            .subquery()
+        )
+        rows = conn.execute(
+            select(series_genres.c.genre_id, per_series.c.rating, func.sum(per_series.c.reviews))
+            .join(per_series, per_series.c.series_id == series_genres.c.series_id)
+            .group_by(series_genres.c.genre_id, per_series.c.rating)
+        )
+        result = {}
+        for genre_id, rating, reviews in rows:
+            result.setdefault(genre_id, [0] * 10)[rating - 1] = reviews
+        return result
+
+    @classmethod
+    def finish(cls, conn, totals):
+        names = dict(conn.execute(select(Genre.id, Genre.name)).all())
+        rows = []
+        for genre_id, counts in totals.items():
+            reviews = sum(counts)
+            average = sum(rating * count for rating, count in enumerate(counts, 1)) / reviews
+            rows.append((names.get(genre_id, genre_id), reviews, round(average, 2), *counts))
+        return sorted(rows, key=lambda row: str(row[0]))
+
+
+class SeriesCompletion(Report):
+    # Rates are over the watchers who started the series (watching, completed
+    # or dropped); plan-to-watch entries are counted but not in the rates.
+    name = "series-completion"
+    key = Series.id
+    columns = ("series_id", "title", "watchers", "watching", "completed", "plan_to_watch", "dropped",
+               "completion_rate", "drop_rate")
+    STATUSES = (WatchStatus.WATCHING, WatchStatus.COMPLETED, WatchStatus.PLAN_TO_WATCH, WatchStatus.DROPPED)
+
+    @classmethod
+    def partial(cls, conn, low, high):
+        # Grouped on ix_statuses_series_status alone, then joined for titles.
+        counts = (
+            select(Status.series_id,
+                   *[func.sum(case((Status.watch_status == status, 1), else_=0)) for status in cls.STATUSES])
+            .where(Status.series_id.between(low, high))
+            .group_by(Status.series_id)
+            .subquery()
+        )
+        rows = conn.execute(
+            select(counts.c.series_id, Series.title, *list(counts.c)[1:]).join(Series, Series.id == counts.c.series_id)
+        )
+        return {(series_id, title): list(values) for series_id, title, *values in rows}
+
+    @classmethod
+    def finish(cls, conn, totals):
+        rows = []
+        for (series_id, title), (watching, completed, plan_to_watch, dropped) in sorted(totals.items()):
+            started = watching + completed + dropped
+            rows.append((series_id, title, started + plan_to_watch, watching, completed, plan_to_watch, dropped,
+                         rate(completed, started), rate(dropped, started)))
+        return rows
+
+
+class ReviewerActivity(Report):
+    name = "reviewer-activity"
+    key = User.id
+    columns = ("user_id", "username", "reviews", "rated", "rating_average", "statuses", "completed", "dropped")
+
+    @classmethod
+    def partial(cls, conn, low, high):
+        rated = Review.rating.between(1, 10)
+        reviews = conn.execute(
+            select(Review.user_id, func.count(), func.sum(case((rated, 1), else_=0)),
+                   func.coalesce(func.sum(case((rated, Review.rating), else_=0)), 0))
+            .where(Review.user_id.between(low, high))
+            .group_by(Review.user_id)
+        )
+        statuses = conn.execute(
+            select(Status.user_id, func.count(),
+                   func.sum(case((Status.watch_status == WatchStatus.COMPLETED, 1), else_=0)),
+                   func.sum(case((Status.watch_status == WatchStatus.DROPPED, 1), else_=0)))
+            .where(Status.user_id.between(low, high))
+            .group_by(Status.user_id)
+        )
+        activity = {}
+        for user_id, count, rated_count, rating_total in reviews:
+            activity[user_id] = [count, rated_count, rating_total, 0, 0, 0]
+        for user_id, count, completed, dropped in statuses:
+            activity.setdefault(user_id, [0, 0, 0, 0, 0, 0])[3:] = [count, completed, dropped]
+        names = dict(conn.execute(select(User.id, User.username).where(User.id.between(low, high))).all())
+        return {(user_id, names.get(user_id)): values for user_id, values in activity.items()}
+
+    @classmethod
+    def finish(cls, conn, totals):
+        rows = []
+        for (user_id, username), (reviews, rated, rating_total, statuses, completed, dropped) in sorted(totals.items()):
+            average = round(rating_total / rated, 2) if rated else None
+            rows.append((user_id, username, reviews, rated, average, statuses, completed, dropped))
+        return rows
+
+
+REPORTS = {report.name: report for report in (GenreRatings, SeriesCompletion, ReviewerActivity)}
+
+
+# One read-only engine per worker process and database.
+_engines = {}
+
+
+def _engine(url):
+    engine = _engines.get(url)
+    if engine is None:
+        engine = _engines[url] = make_engine(url, pragmas=READ_PRAGMAS)
+    return engine
+
+
+def _run_partition(task):
+    name, url, low, high = task
+    with _engine(url).connect() as conn:
+        return REPORTS[name].partial(conn, low, high)
+
+
+def run_reports(url, names=None, workers=None):
+    # {name: (columns, rows)}. The partitions of every requested report share
+    # one pool; workers=1 runs them in this process.
+    workers = workers or os.cpu_count() or 1
+    url = read_only_url(url)
+    names = list(names or REPORTS)
+    with _engine(url).connect() as conn:
+        tasks = [(name, url, low, high) for name in names
+                 for low, high in partitions(conn, REPORTS[name].key, workers * PARTITIONS_PER_WORKER)]
+    totals = {name: {} for name in names}
+    if workers <= 1:
+        for task in tasks:
+            REPORTS[task[0]].merge(totals[task[0]], _run_partition(task))
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            for task, partial in zip(tasks, pool.map(_run_partition, tasks)):
+                REPORTS[task[0]].merge(totals[task[0]], partial)
+    with _engine(url).connect() as conn:
+        return {name: (REPORTS[name].columns, REPORTS[name].finish(conn, totals[name])) for name in names}
+
+
+def write_report(path, columns, rows):
+    # .csv, or .json as a list of objects; add .gz to compress. Rows are
+    # encoded one at a time.
+    with open_text(path, "wt") as handle:
+        if ".csv" in os.path.basename(path):
+            writer = csv.writer(handle)
+            writer.writerow(columns)
+            writer.writerows(rows)
+            return
+        handle.write("[")
+        for index, row in enumerate(rows):
+            handle.write(",\n" if index else "\n")
+            handle.write(json.dumps(dict(zip(columns, row)), ensure_ascii=False))
+        handle.write("\n]\n")
+
+
+def write_reports(url, directory, names=None, workers=None, fmt="csv", report=print):
+    # Writes <directory>/<name>.<fmt> for each report; returns the paths.
+    os.makedirs(directory, exist_ok=True)
+    start = time.perf_counter()
+    results = run_reports(url, names, workers)
+    elapsed = time.perf_counter() - start
+    paths = []
+    for name, (columns, rows) in results.items():
+        path = os.path.join(directory, f"{name}.{fmt}")
+        write_report(path, columns, rows)
+        paths.append(path)
+        report(f"{name}: {len(rows):,} rows -> {path}")
+    workers = workers or os.cpu_count() or 1
+    report(f"Computed {len(results)} report{'s' if len(results) != 1 else ''} in {elapsed:.1f}s "
+           f"({workers} worker{'s' if workers != 1 else ''}).")
+    return paths
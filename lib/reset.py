@@ -1,11 +1,18 @@
+import sys
 import os
-from lib.db import engine, Base
-from lib import seed
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
-# Delete old DB file
-if os.path.exists("tv_series.db"):
-    os.remove("tv_series.db")
-    print("Deleted old tv_series.db")
+from lib.db import get_engine, init_db
 
-Base.metadata.create_all(engine)
-print("Database reset complete.")
\ No newline at end of file
+# Delete old DB file (plus any WAL side files)
+engine = get_engine()
+db_path = engine.url.database
+engine.dispose()
+if db_path and os.path.exists(db_path):
+    for path in (db_path, f"{db_path}-wal", f"{db_path}-shm"):
+        if os.path.exists(path):
+            os.remove(path)
+    print(f"Deleted old {db_path}")
+
+init_db(engine)
+print("Database reset complete.")
@@ -0,0 +1,213 @@
+import bisect
+import heapq
+import re
+from collections import defaultdict
+from sqlalchemy import event, inspect, select, text
+from lib.models import Series
+
+# Full-text search over series titles, genres and descriptions. The primary
+# index is an FTS5 external-content table that SQLite keeps in sync through
+# triggers, so ORM and Core writes alike are covered. Where SQLite was built
+# without FTS5, an in-process inverted index is used instead.
+FTS_TABLE = "series_fts"
+
+# bm25 weights per column, and the matching weights for the fallback index.
+FIELD_WEIGHTS = {"title": 10.0, "genre": 5.0, "description": 1.0}
+
+FTS_DDL = [
+    f"""CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(
+        title, genre, description, content='series', content_rowid='id', prefix='2 3 4'
+    )""",
+    f"""CREATE TRIGGER IF NOT EXISTS series_fts_insert AFTER INSERT ON series BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, title, genre, description)
+        VALUES (new.id, new.title, new.genre, new.description);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS series_fts_delete AFTER DELETE ON series BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, title, genre, description)
+        VALUES ('delete', old.id, old.title, old.genre, old.description);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS series_fts_update AFTER UPDATE OF title, genre, description ON series BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, title, genre, description)
+        VALUES ('delete', old.id, old.title, old.genre, old.description);
+        INSERT INTO {FTS_TABLE}(rowid, title, genre, description)
+        VALUES (new.id, new.title, new.genre, new.description);
+    END""",
+]
+
+DROP_DDL = [
+    "DROP TRIGGER IF EXISTS series_fts_insert",
+    "DROP TRIGGER IF EXISTS series_fts_delete",
+    "DROP TRIGGER IF EXISTS series_fts_update",
+    f"DROP TABLE IF EXISTS {FTS_TABLE}",
+]
+
+
+def tokenize(value):
+    return re.findall(r"\w+", (value or "").lower())
+
+
+def fts5_available(connection):
+    try:
+        connection.execute(text("CREATE VIRTUAL TABLE IF NOT EXISTS temp.fts5_probe USING fts5(x)"))
+        connection.execute(text("DROP TABLE temp.fts5_probe"))
+        return True
+    except Exception:
+        return False
+
+
+def install(engine, rebuild=False):
+    # Create the FTS table and triggers if missing (filling them from `series`);
+    # rebuild=True drops and re-creates them. Returns False without FTS5.
+    with engine.begin() as conn:
+        if conn.dialect.name != "sqlite" or not fts5_available(conn):
+            return False
+        if rebuild:
+            for ddl in DROP_DDL:
+                conn.execute(text(ddl))
+        created = not inspect(conn).has_table(FTS_TABLE)
+        for ddl in FTS_DDL:
+            conn.execute(text(ddl))
+        if created:
+            conn.execute(text(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')"))
+    return True
+
+
+def has_fts(session):
+    return inspect(session.connection()).has_table(FTS_TABLE)
+
+
+def fts_query(value):
+    # Every word must match, each as a prefix: "brea bad" -> "brea"* "bad"*
+    return " ".join(f'"{token}"*' for token in tokenize(value))
+
+
+def search(session, value, limit=20):
+    # Returns (id, title, genre) rows, best match first.
+    if not tokenize(value):
+        return []
+    if has_fts(session):
+        weights = ", ".join(str(weight) for weight in FIELD_WEIGHTS.values())
+        rows = session.execute(
+            text(
+                f"SELECT series.id, series.title, series.genre FROM {FTS_TABLE} "
+                f"JOIN series ON series.id = {FTS_TABLE}.rowid "
+                f"WHERE {FTS_TABLE} MATCH :query "
+                f"ORDER BY bm25({FTS_TABLE}, {weights}) LIMIT :limit"
+            ),
+            {"query": fts_query(value), "limit": limit},
+        )
+        return [tuple(row) for row in rows]
+    return fallback_index(session).search(value, limit)
+
+
+def search_like(session, value, limit=None):
+    # The LIKE '%q%' scan the FTS index replaces; kept for benchmarking.
+    pattern = f"%{value}%"
+    query = (
+        select(Series.id, Series.title, Series.genre)
+        .where(Series.title.like(pattern) | Series.genre.like(pattern) | Series.description.like(pattern))
+        .limit(limit)
+    )
+    return [tuple(row) for row in session.execute(query)]
+
+
+class InvertedIndex:
+    # token -> {series_id: weight}, with a sorted vocabulary for prefix lookups.
+
+    def __init__(self):
+        self.postings = defaultdict(dict)
+        self.documents = {}
+        self._vocabulary = None
+
+    def add(self, series_id, title, genre, description):
+        self.remove(series_id)
+        tokens = set()
+        for field, value in (("title", title), ("genre", genre), ("description", description)):
+            for token in tokenize(value):
+                weights = self.postings[token]
+                weights[series_id] = weights.get(series_id, 0.0) + FIELD_WEIGHTS[field]
+                tokens.add(token)
+        self.documents[series_id] = (title, genre, tokens)
+        self._vocabulary = None
+
+    def remove(self, series_id):
+        document = self.documents.pop(series_id, None)
+        if document is None:
+            return
+        for token in document[2]:
+            weights = self.postings[token]
+            weights.pop(series_id, None)
+            if not weights:
+                del self.postings[token]
+        self._vocabulary = None
+
+    def _expand(self, prefix):
+        if self._vocabulary is None:
+            self._vocabulary = sorted(self.postings)
+        start = bisect.bisect_left(self._vocabulary, prefix)
+        for term in self._vocabulary[start:]:
+            if not term.startswith(prefix):
+                break
+            yield term
+
+    def search(self, value, limit=20):
+        scores = None
+        for prefix in tokenize(value):
+            matched = defaultdict(float)
+            for term in self._expand(prefix):
+                for series_id, weight in self.postings[term].items():
+                    matched[series_id] += weight
+            if scores is None:
+                scores = matched
+            else:
+                scores = {series_id: score + matched[series_id] for series_id, score in scores.items() if series_id in matched}
+            if not scores:
+                return []
+        best = heapq.nlargest(limit, (scores or {}).items(), key=lambda item: (item[1], -item[0]))
+        return [(series_id, *self.documents[series_id][:2]) for series_id, _ in best]
+
+
+_fallback = None
+
+
+def fallback_index(session):
+    # Built on first use in one streaming pass, then kept current by the
+    # Series mapper events below.
+    global _fallback
+    if _fallback is None:
+        index = InvertedIndex()
+        rows = session.execute(
+            select(Series.id, Series.title, Series.genre, Series.description).execution_options(yield_per=10_000)
+        )
+        for row in rows:
+            index.add(*row)
+        _fallback = index
+    return _fallback
+
+
+def reset_fallback():
+    # For bulk loads that bypass the ORM: the index is rebuilt on next search.
+    global _fallback
+    _fallback = None
+
+
+@event.listens_for(Series, "after_insert")
+@event.listens_for(Series, "after_update")
+def index_series(mapper, connection, series):
+    if _fallback is not None:
+        _fallback.add(series.id, series.title, series.genre, series.description)
+
+
+@event.listens_for(Series, "after_delete")
+def unindex_series(mapper, connection, series):
+    if _fallback is not None:
+        _fallback.remove(series.id)
+
+
+def unindex_bulk(series_ids, deleted=True):
+    if deleted and _fallback is not None:
+        for series_id in series_ids:
+            _fallback.remove(series_id)
+
+
+Series.listeners.append(unindex_bulk)
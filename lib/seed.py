@@ -2,30 +2,17 @@ import sys
 import os
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
+import argparse
+import random
+import time
 from faker import Faker
-from random import choice, randint
-from lib.models import Series, Season, Episode, User, Review, Status
-from lib.db import session
+from sqlalchemy.orm import Session
+from lib.models import Series, Season, Episode, User, Review, Status, SeriesStats, Genre, WatchStatus
+from lib.db import get_engine, session_scope
 
 fake = Faker()
 
-# Clear old data
-session.query(Status).delete()
-session.query(Review).delete()
-session.query(Episode).delete()
-session.query(Season).delete()
-session.query(Series).delete()
-session.query(User).delete()
-
-# Users
-users = [
-    User(username="eddie"),
-    User(username="jane_doe"),
-    User(username="tv_lover92"),
-    User(username="admin"),
-]
-session.add_all(users)
-session.commit()
+WATCH_STATUSES = list(WatchStatus)
 
 # Series with detailed data
 series_data = [
@@ -81,47 +68,185 @@ series_data = [
     },
 ]
 
-series_objects = []
-for s in series_data:
-    new_series = Series(title=s["title"], genre=s["genre"], description=s["description"])
-    session.add(new_series)
-    session.flush()  # to get the ID
-    series_objects.append(new_series)
-session.commit()
-
-# Seasons and Episodes
-for series in series_objects:
-    for season_num in range(1, 3):  # 2 seasons each
-        season = Season(series_id=series.id, season_number=season_num)
-        session.add(season)
-        session.flush()
-        for ep_num in range(1, 11):  # 10 episodes per season
-            episode = Episode(season_id=season.id, title=f"Episode {ep_num}", duration_mins=45)
-            session.add(episode)
-session.commit()
-
-# Statuses
-statuses = [
-    Status(user_id=users[0].id, series_id=series_objects[0].id, watch_status="Watching"),
-    Status(user_id=users[1].id, series_id=series_objects[1].id, watch_status="Completed"),
-    Status(user_id=users[2].id, series_id=series_objects[2].id, watch_status="Plan to Watch"),
-    Status(user_id=users[3].id, series_id=series_objects[3].id, watch_status="Watching"),
-    Status(user_id=users[0].id, series_id=series_objects[4].id, watch_status="Dropped"),
-    Status(user_id=users[1].id, series_id=series_objects[5].id, watch_status="Watching"),
-]
-session.add_all(statuses)
-session.commit()
-
-# Reviews
-reviews = [
-    Review(user_id=users[0].id, series_id=series_objects[0].id, rating=8, content="Amazing concept!"),
-    Review(user_id=users[1].id, series_id=series_objects[1].id, rating=9, content="Loved the fantasy elements."),
-    Review(user_id=users[2].id, series_id=series_objects[2].id, rating=7, content="Weird but intriguing."),
-    Review(user_id=users[3].id, series_id=series_objects[3].id, rating=10, content="Best time travel show ever."),
-    Review(user_id=users[0].id, series_id=series_objects[4].id, rating=6, content="Started great, lost steam."),
-    Review(user_id=users[1].id, series_id=series_objects[5].id, rating=8, content="Underrated crime drama."),
-]
-session.add_all(reviews)
-session.commit()
+def seed_demo(session):
+    # Clear old data (children first, foreign keys are enforced)
+    session.query(Status).delete()
+    session.query(Review).delete()
+    session.query(Episode).delete()
+    session.query(Season).delete()
+    session.query(Series).delete()
+    session.query(User).delete()
+
+    # Users
+    users = [
+        User(username="eddie"),
+        User(username="jane_doe"),
+        User(username="tv_lover92"),
+        User(username="admin"),
+    ]
+    session.add_all(users)
+    session.commit()
+
+    series_objects = []
+    for s in series_data:
+        new_series = Series(title=s["title"], genre=s["genre"], description=s["description"])
+        session.add(new_series)
+        session.flush()  # to get the ID
+        series_objects.append(new_series)
+    session.commit()
+
+    # Seasons and Episodes
+    for series in series_objects:
+        for season_num in range(1, 3):  # 2 seasons each
+            season = Season(series_id=series.id, season_number=season_num)
+            session.add(season)
+            session.flush()
+            for ep_num in range(1, 11):  # 10 episodes per season
+                episode = Episode(season_id=season.id, episode_number=ep_num, title=f"Episode {ep_num}", duration_mins=45)
+                session.add(episode)
+    session.commit()
+
+    # Statuses
+    statuses = [
+        Status(user_id=users[0].id, series_id=series_objects[0].id, watch_status=WatchStatus.WATCHING),
+        Status(user_id=users[1].id, series_id=series_objects[1].id, watch_status=WatchStatus.COMPLETED),
+        Status(user_id=users[2].id, series_id=series_objects[2].id, watch_status=WatchStatus.PLAN_TO_WATCH),
+        Status(user_id=users[3].id, series_id=series_objects[3].id, watch_status=WatchStatus.WATCHING),
+        Status(user_id=users[0].id, series_id=series_objects[4].id, watch_status=WatchStatus.DROPPED),
+        Status(user_id=users[1].id, series_id=series_objects[5].id, watch_status=WatchStatus.WATCHING),
+    ]
+    session.add_all(statuses)
+    session.commit()
+
+    # Reviews
+    reviews = [
+        Review(user_id=users[0].id, series_id=series_objects[0].id, rating=8, content="Amazing concept!"),
+        Review(user_id=users[1].id, series_id=series_objects[1].id, rating=9, content="Loved the fantasy elements."),
+        Review(user_id=users[2].id, series_id=series_objects[2].id, rating=7, content="Weird but intriguing."),
+        Review(user_id=users[3].id, series_id=series_objects[3].id, rating=10, content="Best time travel show ever."),
+        Review(user_id=users[0].id, series_id=series_objects[4].id, rating=6, content="Started great, lost steam."),
+        Review(user_id=users[1].id, series_id=series_objects[5].id, rating=8, content="Underrated crime drama."),
+    ]
+    session.add_all(reviews)
+    session.commit()
+
+
+def insert_batches(conn, table, rows, batch_size):
+    # Core executemany in fixed-size batches; rows is a generator so memory
+    # stays at one batch no matter how many rows are produced.
+    batch = []
+    count = 0
+    for row in rows:
+        batch.append(row)
+        if len(batch) == batch_size:
+            conn.execute(table.insert(), batch)
+            count += len(batch)
+            batch = []
+    if batch:
+        conn.execute(table.insert(), batch)
+        count += len(batch)
+    return count
+
+
+def seed_bulk(engine, users=1_000, series=10_000, seasons_per_series=3, episodes_per_season=10,
+              reviews=50_000, statuses=50_000, seed=42, batch_size=20_000):
+    # IDs are assigned up front, so children never need a flush to learn
+    # their parent's key and the whole dataset is a function of `seed`.
+    rng = random.Random(seed)
+    Faker.seed(seed)
+    fake.seed_instance(seed)
+
+    # Faker is slow per call, so draw pools once and sample from them.
+    usernames = [fake.user_name() for _ in range(2_000)]
+    titles = [fake.catch_phrase() for _ in range(2_000)]
+    genres = sorted({s["genre"] for s in series_data})
+    descriptions = [fake.sentence(nb_words=12) for _ in range(2_000)]
+    episode_titles = [fake.sentence(nb_words=3).rstrip(".") for _ in range(2_000)]
+    review_texts = [fake.sentence(nb_words=8) for _ in range(2_000)]
+
+    n_seasons = series * seasons_per_series
+    n_episodes = n_seasons * episodes_per_season
+    statuses = min(statuses, users * series)
+
+    def status_rows():
+        # Walk each user's series from a per-user offset so (user, series)
+        # pairs never repeat and the unique index is never violated.
+        for i in range(statuses):
+            user_id = i % users + 1
+            offset = (user_id * 2654435761) % series
+            series_id = (offset + i // users) % series + 1
+            yield {"id": i + 1, "user_id": user_id, "series_id": series_id,
+                   "watch_status": rng.choice(WATCH_STATUSES)}
+
+    plan = [
+        (User.__table__, ({"id": i, "username": f"{rng.choice(usernames)}_{i}"} for i in range(1, users + 1))),
+        (Series.__table__, (
+            {"id": i, "title": f"{rng.choice(titles)} {i}", "genre": rng.choice(genres),
+             "description": rng.choice(descriptions), "user_id": rng.randint(1, users)}
+            for i in range(1, series + 1)
+        )),
+        (Season.__table__, (
+            {"id": i, "season_number": (i - 1) % seasons_per_series + 1,
+             "series_id": (i - 1) // seasons_per_series + 1}
+            for i in range(1, n_seasons + 1)
+        )),
+        (Episode.__table__, (
+            {"id": i, "title": rng.choice(episode_titles), "episode_number": (i - 1) % episodes_per_season + 1,
+             "duration_mins": rng.randint(20, 60), "season_id": (i - 1) // episodes_per_season + 1}
+            for i in range(1, n_episodes + 1)
+        )),
+        (Review.__table__, (
+            {"id": i, "content": rng.choice(review_texts), "rating": rng.randint(1, 10),
+             "user_id": rng.randint(1, users), "series_id": rng.randint(1, series)}
+            for i in range(1, reviews + 1)
+        )),
+        (Status.__table__, status_rows()),
+    ]
+
+    totals = {}
+    for table, rows in plan:
+        start = time.perf_counter()
+        with engine.begin() as conn:
+            totals[table.name] = insert_batches(conn, table, rows, batch_size)
+        elapsed = time.perf_counter() - start
+        print(f"  {table.name}: {totals[table.name]:,} rows in {elapsed:.1f}s")
+
+    # Core inserts bypass the ORM events, so derive the genre tags, episode
+    # totals and aggregates in one pass each.
+    with engine.begin() as conn:
+        Genre.rebuild(conn)
+        Series.refresh_episode_totals(conn)
+    with Session(engine) as session:
+        SeriesStats.rebuild(session)
+    return totals
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Seed the TV Series Tracker database")
+    parser.add_argument("--bulk", action="store_true", help="generate a large synthetic dataset into an empty database")
+    parser.add_argument("--users", type=int, default=1_000)
+    parser.add_argument("--series", type=int, default=10_000)
+    parser.add_argument("--seasons-per-series", type=int, default=3)
+    parser.add_argument("--episodes-per-season", type=int, default=10)
+    parser.add_argument("--reviews", type=int, default=50_000)
+    parser.add_argument("--statuses", type=int, default=50_000)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--batch-size", type=int, default=20_000)
+    args = parser.parse_args(argv)
+
+    if args.bulk:
+        start = time.perf_counter()
+        totals = seed_bulk(
+            get_engine(), users=args.users, series=args.series, seasons_per_series=args.seasons_per_series,
+            episodes_per_season=args.episodes_per_season, reviews=args.reviews, statuses=args.statuses,
+            seed=args.seed, batch_size=args.batch_size,
+        )
+        print(f"✅ Seeded {sum(totals.values()):,} rows in {time.perf_counter() - start:.1f}s")
+    else:
+        with session_scope() as session:
+            seed_demo(session)
+        print("✅ Database seeded successfully!")
+
 
-print("✅ Database seeded successfully!")
+if __name__ == "__main__":
+    main()
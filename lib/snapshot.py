@@ -0,0 +1,247 @@
+import json
+import mmap
+import sys
+import time
+from sqlalchemy import select, func
+from lib.models import Series, Season, Genre, normalize_label
+
+# A read-only, column-oriented copy of the catalog for analytics jobs that
+# only need (id, title, genre, seasons, episodes, minutes) per series: one
+# NumPy array per column, titles as one UTF-8 buffer plus offsets, and each
+# distinct genre string stored once with the rows holding its index. A
+# 100k-series catalog is a few MB, against hundreds of MB for the ORM graph.
+#
+# save() writes the arrays to a single file that open() memory-maps, so any
+# number of worker processes share one copy through the page cache and
+# opening is O(1). A snapshot is a point in time; build a new one to pick up
+# changes. NumPy is imported on first use, as in lib/recommend.py.
+MAGIC = b"TVSNAP1\n"
+ALIGN = 64
+
+# Fixed-width columns, in file order.
+COLUMNS = (
+    ("id", "<i8"),
+    ("genre", "<i4"),
+    ("seasons", "<i4"),
+    ("episodes", "<i4"),
+    ("minutes", "<i8"),
+)
+
+
+def _padding(offset):
+    return -offset % ALIGN
+
+
+class CatalogSnapshot:
+
+    def __init__(self, columns, titles, title_offsets, genres, created=None, source=None):
+        self.columns = columns
+        self.titles = titles
+        self.title_offsets = title_offsets
+        self.genres = genres
+        self.created = created if created is not None else time.time()
+        self._source = source
+
+    def __len__(self):
+        return len(self.columns["id"])
+
+    def __getitem__(self, position):
+        # (id, title, genre, seasons, episodes, minutes) at a row position.
+        columns = self.columns
+        return (int(columns["id"][position]), self.title(position), self.genre(position),
+                int(columns["seasons"][position]), int(columns["episodes"][position]),
+                int(columns["minutes"][position]))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        # Drops the arrays first: a mapping cannot close while views of it
+        # exist, and if the caller still holds some it closes when they go.
+        if self._source is not None:
+            self.columns = self.titles = self.title_offsets = None
+            try:
+                self._source.close()
+            except BufferError:
+                pass
+            self._source = None
+
+    @property
+    def nbytes(self):
+        return (sum(column.nbytes for column in self.columns.values()) + self.titles.nbytes
+                + self.title_offsets.nbytes + sum(len(genre) for genre in self.genres))
+
+    def title(self, position):
+        start, end = self.title_offsets[position], self.title_offsets[position + 1]
+        return bytes(self.titles[start:end]).decode("utf-8")
+
+    def genre(self, position):
+        return self.genres[self.columns["genre"][position]]
+
+    def position(self, series_id):
+        # Row position of `series_id` (rows are in id order), or None.
+        ids = self.columns["id"]
+        position = int(ids.searchsorted(series_id))
+        return position if position < len(ids) and ids[position] == series_id else None
+
+    def rows(self, positions):
+        return [self[position] for position in positions]
+
+    # Queries take and return arrays of row positions, so they compose:
+    # snapshot.top("minutes", snapshot.where(genre="drama"), limit=10).
+
+    def genre_codes(self, name):
+        # Codes of the genre strings tagged with genre `name` ("Sci-Fi/Thriller"
+        # for "thriller"), matched the way Genre tags are.
+        name = normalize_label(name)
+        return [code for code, genre in enumerate(self.genres) if name in Genre.split(genre)]
+
+    def where(self, genre=None, min_episodes=None, max_episodes=None, min_minutes=None, max_minutes=None,
+              positions=None):
+        import numpy as np
+        columns = self.columns
+        mask = np.ones(len(self), dtype=bool)
+        if genre:
+            mask &= np.isin(columns["genre"], self.genre_codes(genre))
+        if min_episodes is not None:
+            mask &= columns["episodes"] >= min_episodes
+        if max_episodes is not None:
+            mask &= columns["episodes"] <= max_episodes
+        if min_minutes is not None:
+            mask &= columns["minutes"] >= min_minutes
+        if max_minutes is not None:
+            mask &= columns["minutes"] <= max_minutes
+        if positions is not None:
+            restrict = np.zeros(len(self), dtype=bool)
+            restrict[positions] = True
+            mask &= restrict
+        return mask.nonzero()[0]
+
+    def top(self, column, positions=None, limit=10, descending=True):
+        # Positions of the `limit` rows with the highest (or lowest) `column`,
+        # ties broken by id; a partial sort, so the cost barely depends on limit.
+        import numpy as np
+        positions = np.arange(len(self)) if positions is None else np.asarray(positions)
+        values = self.columns[column][positions]
+        if descending:
+            values = -values
+        if limit is not None and 0 < limit < len(positions):
+            candidates = np.argpartition(values, limit - 1)[:limit]
+            # Rows tied with the last candidate may sit outside the partition.
+            candidates = (values <= values[candidates].max()).nonzero()[0]
+        else:
+            candidates = np.arange(len(positions))
+        order = candidates[np.lexsort((positions[candidates], values[candidates]))]
+        return positions[order[:limit]]
+
+    def totals(self, positions=None):
+        columns = self.columns
+        if positions is None:
+            return {"series": len(self), "seasons": int(columns["seasons"].sum()),
+                    "episodes": int(columns["episodes"].sum()), "minutes": int(columns["minutes"].sum())}
+        return {"series": len(positions), "seasons": int(columns["seasons"][positions].sum()),
+                "episodes": int(columns["episodes"][positions].sum()),
+                "minutes": int(columns["minutes"][positions].sum())}
+
+    def by_genre(self, positions=None):
+        # {genre: (series, episodes, minutes)}, a series counting towards each
+        # genre it is tagged with. Summed per genre string with bincount, then
+        # spread over that string's tags.
+        import numpy as np
+        codes = self.columns["genre"]
+        episodes, minutes = self.columns["episodes"], self.columns["minutes"]
+        if positions is not None:
+            codes, episodes, minutes = codes[positions], episodes[positions], minutes[positions]
+        size = len(self.genres)
+        series = np.bincount(codes, minlength=size)
+        episodes = np.bincount(codes, weights=episodes, minlength=size)
+        minutes = np.bincount(codes, weights=minutes, minlength=size)
+        result = {}
+        for code, genre in enumerate(self.genres):
+            if not series[code]:
+                continue
+            for name in Genre.split(genre):
+                count, total_episodes, total_minutes = result.get(name, (0, 0, 0))
+                result[name] = (count + int(series[code]), total_episodes + int(episodes[code]),
+                                total_minutes + int(minutes[code]))
+        return dict(sorted(result.items()))
+
+    @classmethod
+    def build(cls, engine, batch_size=50_000):
+        # One streaming pass over `series` in id order; only the arrays for
+        # the current batch exist as Python objects at any time.
+        import numpy as np
+        season_count = (
+            select(func.count()).where(Season.series_id == Series.id).correlate(Series).scalar_subquery()
+        )
+        query = select(Series.id, Series.title, Series.genre, season_count, Series.episode_count,
+                       Series.total_duration_mins).order_by(Series.id)
+        genre_codes = {}
+        parts = {name: [] for name, _ in COLUMNS}
+        titles, lengths = [], []
+        with engine.connect() as conn:
+            result = conn.execution_options(stream_results=True, yield_per=batch_size).execute(query)
+            for rows in result.partitions():
+                ids, names, genres, seasons, episodes, minutes = zip(*rows)
+                encoded = [(title or "").encode("utf-8") for title in names]
+                titles.append(b"".join(encoded))
+                lengths.append(np.fromiter((len(title) for title in encoded), dtype=np.int64, count=len(encoded)))
+                codes = [genre_codes.setdefault(genre or "", len(genre_codes)) for genre in genres]
+                for name, values in (("id", ids), ("genre", codes), ("seasons", seasons),
+                                     ("episodes", episodes), ("minutes", minutes)):
+                    parts[name].append(np.array(values, dtype=dict(COLUMNS)[name]))
+        columns = {name: np.concatenate(arrays) if arrays else np.empty(0, dtype)
+                   for (name, dtype), arrays in zip(COLUMNS, parts.values())}
+        title_offsets = np.zeros(len(columns["id"]) + 1, dtype=np.int64)
+        if lengths:
+            np.cumsum(np.concatenate(lengths), out=title_offsets[1:])
+        return cls(columns, np.frombuffer(b"".join(titles), dtype=np.uint8), title_offsets, list(genre_codes))
+
+    def save(self, path):
+        # Header (JSON: genre strings and where each array starts), then the
+        # arrays, each 64-byte aligned. Little-endian on every platform.
+        arrays = [(name, self.columns[name]) for name, _ in COLUMNS]
+        arrays += [("title_offsets", self.title_offsets), ("titles", self.titles)]
+        layout, offset = {}, 0
+        for name, array in arrays:
+            layout[name] = {"dtype": array.dtype.newbyteorder("<").str, "offset": offset, "length": len(array)}
+            offset += array.nbytes + _padding(array.nbytes)
+        header = json.dumps({"rows": len(self), "created": self.created, "genres": self.genres,
+                             "arrays": layout}).encode("utf-8")
+        start = len(MAGIC) + 8 + len(header)
+        start += _padding(start)
+        with open(path, "wb") as handle:
+            handle.write(MAGIC)
+            handle.write(len(header).to_bytes(8, "little"))
+            handle.write(header)
+            handle.write(b"\0" * (start - handle.tell()))
+            for name, array in arrays:
+                data = array.astype(layout[name]["dtype"], copy=False).tobytes()
+                handle.write(data)
+                handle.write(b"\0" * _padding(len(data)))
+        return path
+
+    @classmethod
+    def open(cls, path):
+        # Memory-maps a saved snapshot: the arrays are read-only views of the
+        # file, paged in as they are touched and shared between processes.
+        import numpy as np
+        with open(path, "rb") as handle:
+            if handle.read(len(MAGIC)) != MAGIC:
+                raise ValueError(f"{path} is not a catalog snapshot.")
+            size = int.from_bytes(handle.read(8), "little")
+            header = json.loads(handle.read(size))
+            start = len(MAGIC) + 8 + size
+            start += _padding(start)
+            mapping = mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ)
+        arrays = {
+            name: np.frombuffer(mapping, dtype=spec["dtype"], count=spec["length"], offset=start + spec["offset"])
+            for name, spec in header["arrays"].items()
+        }
+        if sys.byteorder != "little":
+            arrays = {name: array.astype(array.dtype.newbyteorder("=")) for name, array in arrays.items()}
+        columns = {name: arrays[name] for name, _ in COLUMNS}
+        return cls(columns, arrays["titles"], arrays["title_offsets"], header["genres"], header["created"], mapping)
@@ -0,0 +1,24 @@
+import os
+import sys
+
+import pytest
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from lib.db import make_engine, init_db
+
+
+@pytest.fixture
+def make_db(tmp_path):
+    # Returns a factory for fresh, empty databases under tmp_path.
+    engines = []
+
+    def make(name="test.db"):
+        engine = make_engine(f"sqlite:///{tmp_path / name}")
+        init_db(engine)
+        engines.append(engine)
+        return engine
+
+    yield make
+    for engine in engines:
+        engine.dispose()
@@ -0,0 +1,49 @@
+from sqlalchemy.orm import Session
+
+from lib import cache, leaderboards
+from lib.models import User, Series, Review
+
+
+def test_entries_cached_before_commit_are_dropped_at_commit(make_db):
+    engine = make_db()
+    with Session(engine) as session:
+        series = Series(title="Dark", genre="Sci-Fi")
+        session.add(series)
+        session.commit()
+        series.title = "Dark (2017)"
+        session.flush()
+        # Another thread reads the committed row before this commit lands.
+        cache.series_cache.put(series.id, (series.id, "Dark"))
+        cache.response_cache.put("/series", "stale")
+        session.commit()
+        assert cache.series_cache.get(series.id) is None
+        assert cache.response_cache.get("/series") is None
+
+
+def test_cascaded_reviews_drop_series_responses(make_db):
+    engine = make_db()
+    with Session(engine) as session:
+        user, series = User(username="eddie"), Series(title="Dark", genre="Sci-Fi")
+        session.add_all([user, series])
+        session.flush()
+        session.add(Review(user_id=user.id, series_id=series.id, rating=9, content="Great."))
+        session.commit()
+        cache.response_cache.put(f"/series/{series.id}", "with the review")
+        cache.response_cache.put(f"/series/{series.id}/reviews", "with the review")
+        User.delete_many(session, [user.id])
+        assert len(cache.response_cache) == 0
+
+
+def test_leaderboards_cached_before_commit_are_dropped_at_commit(make_db):
+    engine = make_db()
+    with Session(engine) as session:
+        user, series = User(username="eddie"), Series(title="Dark", genre="Sci-Fi")
+        session.add_all([user, series])
+        session.commit()
+        assert leaderboards.top_rated(session) == []
+        session.add(Review(user_id=user.id, series_id=series.id, rating=9, content="Great."))
+        session.flush()
+        # Another thread ranks the committed rows before this commit lands.
+        cache.leaderboard_cache.put(("top_rated", 10, 1), [])
+        session.commit()
+        assert [row[0] for row in leaderboards.top_rated(session)] == [series.id]
@@ -0,0 +1,58 @@
+from sqlalchemy import select, func
+from sqlalchemy.orm import Session
+
+from lib.exporter import export_catalog
+from lib.importer import import_catalog
+from lib.models import User, Series, Season, Episode, Review, Status, WatchStatus
+from lib.seed import seed_demo
+
+
+def quiet(message):
+    pass
+
+
+def seeded(engine):
+    with Session(engine) as session:
+        seed_demo(session)
+        # One series the importer knows by key, and reviews without text: NULL,
+        # and "" as the API writes it.
+        series = Series(title="Severance", genre="Drama", external_key="tvdb-371980")
+        session.add(series)
+        session.flush()
+        session.add(Season(series_id=series.id, season_number=1))
+        user_id = session.scalar(select(User.id).where(User.username == "eddie"))
+        session.add(Review(user_id=user_id, series_id=series.id, rating=9, content=None))
+        other_id = session.scalar(select(User.id).where(User.username == "jane_doe"))
+        session.add(Review(user_id=other_id, series_id=series.id, rating=7, content=""))
+        session.add(Status(user_id=user_id, series_id=series.id, watch_status=WatchStatus.COMPLETED))
+        session.commit()
+    return engine
+
+
+def row_counts(engine):
+    with engine.connect() as conn:
+        return {model.__name__: conn.execute(select(func.count()).select_from(model)).scalar()
+                for model in (User, Series, Season, Episode, Review, Status)}
+
+
+def test_round_trip_into_empty_database(make_db, tmp_path):
+    source = seeded(make_db("source.db"))
+    first, second = tmp_path / "first.jsonl", tmp_path / "second.jsonl"
+    export_catalog(source, str(first), report=quiet)
+
+    target = make_db("target.db")
+    import_catalog(target, str(first), report=quiet)
+    export_catalog(target, str(second), report=quiet)
+
+    assert second.read_text(encoding="utf-8") == first.read_text(encoding="utf-8")
+    assert row_counts(target) == row_counts(source)
+
+
+def test_reimport_into_source_adds_nothing(make_db, tmp_path):
+    source = seeded(make_db())
+    before = row_counts(source)
+    for name in ("catalog.jsonl", "catalog.csv"):
+        path = tmp_path / name
+        export_catalog(source, str(path), report=quiet)
+        import_catalog(source, str(path), report=quiet)
+        assert row_counts(source) == before
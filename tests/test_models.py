@@ -0,0 +1,99 @@
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from lib.models import User, Series, Season, Episode, Review, Status, SeriesStats, WatchStatus
+
+
+def add_series(session, title, seasons, episodes, reviewers):
+    series = Series(title=title, genre="Drama")
+    session.add(series)
+    session.flush()
+    for season_number in range(1, seasons + 1):
+        season = Season(series_id=series.id, season_number=season_number)
+        session.add(season)
+        session.flush()
+        session.add_all(Episode(season_id=season.id, episode_number=number, title=f"Episode {number}",
+                                duration_mins=45) for number in range(1, episodes + 1))
+    session.add_all(Review(user_id=user.id, series_id=series.id, rating=8, content="Good.") for user in reviewers)
+    return series.id
+
+
+def test_load_detail_query_count_does_not_grow(make_db):
+    engine = make_db()
+    with Session(engine) as session:
+        users = [User(username=f"viewer_{i}") for i in range(30)]
+        session.add_all(users)
+        session.flush()
+        small = add_series(session, "Small", seasons=1, episodes=1, reviewers=users[:1])
+        large = add_series(session, "Large", seasons=8, episodes=12, reviewers=users)
+        session.commit()
+
+    statements = []
+    event.listen(engine, "before_cursor_execute", lambda *args: statements.append(args[2]))
+    counts = {}
+    for series_id in (small, large):
+        statements.clear()
+        with Session(engine) as session:
+            series = Series.load_detail(session, series_id)
+            # Touching everything the detail view shows must not query again.
+            [episode.title for season in series.seasons for episode in season.episodes]
+            [review.user.username for review in series.reviews]
+        counts[series_id] = len(statements)
+    assert counts[small] == counts[large] == 4
+
+
+def test_episode_totals_follow_an_expired_season(make_db):
+    engine = make_db()
+    with Session(engine) as session:
+        first, second = Series(title="First"), Series(title="Second")
+        session.add_all([first, second])
+        session.flush()
+        season = Season(series_id=first.id, season_number=1)
+        session.add(season)
+        session.flush()
+        episode = Episode(season_id=season.id, episode_number=1, duration_mins=30)
+        session.add(episode)
+        session.commit()
+
+        # The old series_id/duration_mins are not loaded when these change.
+        session.expire(season)
+        season.series_id = second.id
+        session.commit()
+        session.expire(episode)
+        episode.duration_mins = 50
+        session.commit()
+        season.series = first
+        session.commit()
+
+        session.expire_all()
+        assert (first.episode_count, first.total_duration_mins) == (1, 50)
+        assert (second.episode_count, second.total_duration_mins) == (0, 0)
+
+
+def test_series_stats_follow_expired_reviews_and_statuses(make_db):
+    engine = make_db()
+    with Session(engine) as session:
+        user, first, second = User(username="eddie"), Series(title="First"), Series(title="Second")
+        session.add_all([user, first, second])
+        session.flush()
+        review = Review(user_id=user.id, series_id=first.id, rating=8, content="Good.")
+        status = Status(user_id=user.id, series_id=first.id, watch_status=WatchStatus.WATCHING)
+        session.add_all([review, status])
+        session.commit()
+
+        session.expire(review)
+        review.series_id = second.id
+        session.expire(status)
+        status.series_id = second.id
+        session.commit()
+        session.expire(review)
+        review.rating = 6
+        session.expire(status)
+        status.watch_status = WatchStatus.COMPLETED
+        session.commit()
+
+        session.expire_all()
+        old, new = SeriesStats.for_series(session, first.id), SeriesStats.for_series(session, second.id)
+        assert (old.review_count, old.watchers_count, old.watching_count) == (0, 0, 0)
+        assert (new.review_count, new.rating_total, new.rating_6, new.rating_8) == (1, 6, 1, 0)
+        assert (new.watchers_count, new.watching_count, new.completed_count) == (1, 0, 1)